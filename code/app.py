@@ -56,7 +56,8 @@ from code.constants.sound import CHANNEL_MUSIC
 #from completionmonitor import CompletionMonitor
 #from dlc import Uploader, Downloader
 
-from code.tools.xml import XMLList, XMLParser, XMLNode
+from code.tools.xml import XMLList, XMLParser, XMLNode, xml_cache
+from code.game.scripting.script import script_cache
 
 from code.tools.uiresponder import UIResponder
 
@@ -89,6 +90,20 @@ class App:
             pygame.mixer.pre_init(44100, -16, 2, 512)
 
 
+        # Check for xml cache flag
+        if ( get_flag_value("xml cache", XMLParser()) == "1" ):
+
+            # Reuse previously parsed copies of unchanged xml files
+            xml_cache.enable(XML_CACHE_PATH)
+
+
+        # Check for script cache flag
+        if ( get_flag_value("script cache", XMLParser()) == "1" ):
+
+            # Reuse previously parsed copies of unchanged scripts
+            script_cache.enable(SCRIPT_CACHE_PATH)
+
+
         # Get pygame rolling
         pygame.init()
 
@@ -0,0 +1,2 @@
+# This directory contains benchmark modules.  Run them from the game folder (e.g. python -m code.benchmarks.xmlparser).
+# DO NOT REMOVE THIS FILE.
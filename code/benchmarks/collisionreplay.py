@@ -0,0 +1,152 @@
+import os
+import sys
+import glob
+import random
+
+from code.tools.headless import HeadlessControlCenter, HeadlessRunner
+from code.tools.xml import XMLParser
+
+from code.constants.common import *
+from code.constants.paths import REPLAYS_PATH
+
+
+# Play back each skill GIF's recorded input (data/replays) twice:  once with each plane's collision sweeper
+# enabled, and once with it disabled (probing the tile data one collision type at a time, as we used to).
+# Both runs must produce the same entity positions / states on every frame.
+#
+#   python -m code.benchmarks.collisionreplay [skill data universe]
+
+
+# Find each GIF (map name, replay file, active skill) in a given universe's skill data
+def get_gifs(name):
+
+    # Track results
+    results = []
+
+    for path in sorted( glob.glob( os.path.join("universes", name, "skill.data", "*.xml") ) ):
+
+        # Read skill data
+        f = open(path, "r")
+        node = XMLParser().create_node_from_xml( f.read() ).get_first_node_by_tag("*")
+        f.close()
+
+        # Every tier shares the same GIF; use the first
+        ref_gif_data = node.get_first_node_by_tag("data").get_first_node_by_tag("texts").find_node_by_tag("gif-data")
+
+        # Validate
+        if (ref_gif_data):
+
+            (map_name, replay_file, skill) = (
+                ref_gif_data.find_node_by_tag("map").innerText,
+                ref_gif_data.find_node_by_tag("replay-file").innerText,
+                ref_gif_data.find_node_by_tag("active-skill").innerText
+            )
+
+            # Some GIFs have no recorded input
+            if ( (replay_file != "") and os.path.isfile( os.path.join(REPLAYS_PATH, replay_file) ) ):
+
+                results.append( (map_name, replay_file, skill) )
+
+    # Return results
+    return results
+
+
+# Play back a given GIF, the way the Gif widget does.  Returns (trace, error), where the trace
+# lists each entity's position / state on each frame.  If playback fails partway, error says why.
+def play(control_center, map_name, replay_file, skill, sweep):
+
+    # Same random numbers for each run
+    random.seed(1)
+
+    # Load the GIF headlessly (without touching the player's session data)
+    runner = HeadlessRunner(control_center).load_gif(map_name, replay_file, skill)
+
+    # Convenience
+    m = runner.map
+
+    # Sweep, or probe?
+    m.master_plane.get_collision_sweeper().set_enabled(sweep)
+
+
+    # Track results
+    (trace, error) = ( [], None )
+
+    for frame in range( 0, len(m.replay_data) ):
+
+        try:
+
+            runner.step()
+
+        except Exception as e:
+
+            error = "frame %d:  %s" % ( frame, repr(e) )
+            break
+
+        # Record every entity
+        trace.append(
+            tuple(
+                ( entity.name, entity.x, entity.y, entity.status, entity.alive )
+                for genus in sorted(m.master_plane.entities)
+                for entity in m.master_plane.entities[genus]
+            )
+        )
+
+    # Return results
+    return (trace, error)
+
+
+def run(name):
+
+    # No window, no sound
+    control_center = HeadlessControlCenter()
+
+
+    print "%-28s %8s  %s" % ("gif", "frames", "result")
+
+    # Track mismatches
+    failures = 0
+
+    for (map_name, replay_file, skill) in get_gifs(name):
+
+        (trace1, error1) = play(control_center, map_name, replay_file, skill, sweep = False)
+        (trace2, error2) = play(control_center, map_name, replay_file, skill, sweep = True)
+
+        # Find the first frame that differs
+        mismatch = None
+
+        for frame in range( 0, max( len(trace1), len(trace2) ) ):
+
+            if ( ( trace1[frame:frame + 1] ) != ( trace2[frame:frame + 1] ) ):
+
+                mismatch = frame
+                break
+
+        if ( (mismatch != None) or (error1 != error2) ):
+
+            result = "MISMATCH at frame %s" % mismatch
+            failures += 1
+
+        else:
+
+            result = "ok"
+
+        # Note any playback error (the same in each run)
+        if (error1):
+
+            result = "%s (stopped at %s)" % (result, error1)
+
+        print "%-28s %8d  %s" % ( map_name, len(trace2), result )
+
+
+    print ""
+    print "mismatches:  %d" % failures
+
+    # Success if every GIF matched
+    return (failures == 0)
+
+
+if (__name__ == "__main__"):
+
+    sys.exit(
+        0 if run( sys.argv[1] if ( len(sys.argv) > 1 ) else "story1" ) else 1
+    )
@@ -0,0 +1,149 @@
+import gc
+import sys
+import copy
+import time
+
+from code.tools.controlcenter import ControlCenter
+
+from code.game.universe import Universe
+from code.game.entities.entities import Enemy, Gold, get_slot_names_for_class
+
+from code.constants.common import MODE_EDITOR, LAYER_FOREGROUND, SCREEN_WIDTH, SCREEN_HEIGHT
+
+
+# Measure how much memory each Enemy / Gold object holds for its attributes, and how long it takes
+# to deepcopy them (on their own, and as part of the map with the most entities, as MapPreview.clone does).
+#
+#   python -m code.benchmarks.entitymemory [universe name] [entity count]
+
+
+# Find a given object's attribute dict, if it has one.  (Reading o.__dict__ would create one for a slotted object.)
+def get_instance_dict(o):
+
+    # Slot values (which might themselves be dicts)
+    values = set( id( getattr(o, name) ) for name in get_slot_names_for_class( type(o) ) if hasattr(o, name) )
+
+    for r in gc.get_referents(o):
+
+        if ( ( type(r) == dict ) and ( not ( id(r) in values ) ) ):
+
+            return r
+
+    # No dict
+    return None
+
+
+# Measure the bytes a given object uses to store its attributes (the object itself, plus any attribute dict)
+def measure_object(o):
+
+    d = get_instance_dict(o)
+
+    return sys.getsizeof(o) + ( sys.getsizeof(d) if (d != None) else 0 )
+
+
+# Measure the bytes a given entity uses to store its attributes, including its AI state
+def measure_entity(entity):
+
+    return measure_object(entity) + measure_object(entity.ai_state)
+
+
+# Create a given number of entities of a given class
+def create_entities(cls, count):
+
+    return [
+        cls().describe({
+            "name": "benchmark-%d" % i,
+            "x": i % 40,
+            "y": i / 40
+        })
+        for i in range(0, count)
+    ]
+
+
+# Time a deepcopy of a given object, returning the best of a given number of runs (in seconds).
+# Like timeit, we pause garbage collection while timing.
+def time_deepcopy(o, repeat = 3):
+
+    # Track best time
+    best = None
+
+    gc.disable()
+
+    for i in range(0, repeat):
+
+        start = time.time()
+
+        copy.deepcopy(o)
+
+        seconds = time.time() - start
+
+        if ( (best == None) or (seconds < best) ):
+
+            best = seconds
+
+    gc.enable()
+
+    # Return best time
+    return best
+
+
+def run(name, count):
+
+    print "%-10s %14s %12s %16s" % ("class", "bytes / entity", "attributes", "deepcopy (ms)")
+
+    for cls in (Enemy, Gold):
+
+        entities = create_entities(cls, count)
+
+        print "%-10s %14d %12d %16.1f" % (
+            cls.__name__,
+            measure_entity( entities[0] ),
+            len( [ slot for slot in get_slot_names_for_class(cls) if hasattr( entities[0], slot ) ] ) + len( get_instance_dict( entities[0] ) or {} ),
+            1000 * time_deepcopy(entities)
+        )
+
+
+    # Debug control center; no window, no sound
+    control_center = ControlCenter(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT, debug = True)
+
+    # Load the universe
+    universe = Universe(name, MODE_EDITOR, control_center)
+
+    # Find the map with the most entities
+    (best_count, best_name) = (-1, None)
+
+    for map_name in sorted( universe.map_data[LAYER_FOREGROUND] ):
+
+        universe.build_map_on_layer_by_name(map_name, LAYER_FOREGROUND, MODE_EDITOR, control_center, ignore_adjacent_maps = True)
+
+        m = universe.get_map_on_layer_by_name(map_name, LAYER_FOREGROUND)
+
+        # Count entities
+        n = sum( len(entities) for entities in m.master_plane.entities.values() )
+
+        if (n > best_count):
+
+            (best_count, best_name) = (n, map_name)
+
+        # Discard the map
+        universe.visible_maps[LAYER_FOREGROUND].clear()
+
+
+    # Rebuild the largest map, then time a few copies
+    universe.build_map_on_layer_by_name(best_name, LAYER_FOREGROUND, MODE_EDITOR, control_center, ignore_adjacent_maps = True)
+
+    m = universe.get_map_on_layer_by_name(best_name, LAYER_FOREGROUND)
+
+    seconds = time_deepcopy(m, repeat = 5)
+
+    print ""
+    print "map:       %s (%d entities)" % (best_name, best_count)
+    print "deepcopy:  %.1f ms" % (1000 * seconds)
+
+
+if (__name__ == "__main__"):
+
+    run(
+        sys.argv[1] if ( len(sys.argv) > 1 ) else "story1",
+        int( sys.argv[2] ) if ( len(sys.argv) > 2 ) else 2000
+    )
@@ -0,0 +1,253 @@
+import os
+import sys
+import time
+import random
+
+from code.tools.controlcenter import ControlCenter
+
+from code.game.universe import Universe
+from code.game.entities.entities import Enemy
+
+from code.constants.common import *
+
+
+# Compare enemy chase AI on a challenge map with each enemy finding its own path (A*) against
+# every enemy sharing one flow field toward the player.  We run the same frames (same map, same
+# enemy positions, same player movement) in each mode and time the enemy logic.  The player
+# jumps to a new tile every so often, which forces fresh paths / a fresh flow field.
+#
+# Enemy logic also includes gravity, collision, etc., which cost the same in either mode (and take most
+# of the frame), so we also time route planning on its own:  every enemy asking for its next tile toward
+# each of the player's positions.  Enemy logic timings vary by 10-20% between runs, so we run each mode
+# a few times and report the best time.
+#
+#   python -m code.benchmarks.flowfield [map name] [enemy count] [frames] [rounds]
+
+
+# How often (in frames) does the player move to a new tile?
+PLAYER_MOVE_INTERVAL = 10
+
+
+# Build the given map as the active map, with a player and a given number of enemies placed on random walkable tiles.
+# Returns the map, plus a list of tiles for the player to visit.
+def setup(control_center, universe, name, enemy_count, seed):
+
+    # Build the map on its own
+    universe.build_map_on_layer_by_name(name, LAYER_FOREGROUND, MODE_EDITOR, control_center, ignore_adjacent_maps = True)
+    universe.set_active_map_by_name(name)
+
+    # Convenience
+    m = universe.get_active_map()
+
+    # Enemies only share flow fields on challenge maps
+    m.set_type("challenge")
+
+
+    # Find the tiles an entity could stand on
+    nav_graph = m.master_plane.get_nav_graph()
+
+    tiles = [
+        (tx, ty)
+        for ty in range( 0, m.master_plane.get_height() )
+        for tx in range( 0, m.master_plane.get_width() )
+        if ( nav_graph.edges.read(tx, ty) & (NAV_EDGE_LEFT | NAV_EDGE_RIGHT | NAV_EDGE_UP) )
+    ]
+
+
+    # For each tile, count how many tiles can reach it
+    reach = dict(
+        ( tile, sum( 1 for distance in nav_graph.get_flow_field(tile).data if (distance >= 0) ) )
+        for tile in tiles
+    )
+
+    # The player will only visit tiles that most of the map can reach
+    targets = [ tile for tile in tiles if ( reach[tile] >= ( max( reach.values() ) / 2 ) ) ]
+
+
+    # Same positions for each mode
+    random.seed(seed)
+
+    # Player route
+    route = [ random.choice(targets) for i in range(0, 64) ]
+
+    # Spawn the player at the start of the route
+    universe.spawn_player_with_name_at_location( "player%s" % universe.get_session_variable("core.player-id").get_value(), route[0][0] * TILE_WIDTH, route[0][1] * TILE_HEIGHT )
+
+    # Place enemies
+    for i in range(0, enemy_count):
+
+        (tx, ty) = random.choice(tiles)
+
+        m.master_plane.entities[GENUS_ENEMY].append(
+            Enemy().describe({
+                "name": "benchmark-enemy-%d" % i,
+                "genus": GENUS_ENEMY,
+                "x": tx,
+                "y": ty
+            })
+        )
+
+    # Return map, player route
+    return (m, route)
+
+
+# Run a given number of frames of enemy logic on a given map, moving the player along a given route.
+# Returns seconds elapsed.
+def time_enemies(control_center, universe, m, route, frames):
+
+    # Convenience
+    plane = m.master_plane
+
+    # Begin timing
+    start = time.time()
+
+    for i in range(0, frames):
+
+        # Time for the player to move?
+        if ( (i % PLAYER_MOVE_INTERVAL) == 0 ):
+
+            (tx, ty) = route[ (i / PLAYER_MOVE_INTERVAL) % len(route) ]
+
+            (plane.entities[GENUS_PLAYER][0].x, plane.entities[GENUS_PLAYER][0].y) = (tx * TILE_WIDTH, ty * TILE_HEIGHT)
+
+        # Same bookkeeping Plane.process does for its entity index
+        plane.entity_index.rebuild(plane.entities).set_tracking(True)
+
+        for enemy in plane.entities[GENUS_ENEMY]:
+
+            enemy.process(control_center, universe)
+            enemy.handle_ai(control_center, universe)
+
+            plane.entity_index.update(enemy)
+
+        plane.entity_index.set_tracking(False)
+
+    # Return time
+    return time.time() - start
+
+
+# Ask for every enemy's next tile toward each tile on the player's route, by A* or by a shared flow field.
+# Returns seconds elapsed.
+def time_planning(m, route, use_flow_field):
+
+    # Convenience
+    nav_graph = m.master_plane.get_nav_graph()
+
+    # Enemy tiles
+    tiles = [ ( int( enemy.get_x() / TILE_WIDTH ), int( enemy.get_y() / TILE_HEIGHT ) ) for enemy in m.master_plane.entities[GENUS_ENEMY] ]
+
+    # Start fresh
+    nav_graph.increment_version()
+
+    # Begin timing
+    start = time.time()
+
+    for goal in route:
+
+        # One flow field serves every enemy
+        if (use_flow_field):
+
+            field = nav_graph.get_flow_field(goal)
+
+            for (tx, ty) in tiles:
+
+                nav_graph.get_next_tile_in_flow_field(field, tx, ty)
+
+        # Each enemy searches for itself
+        else:
+
+            for tile in tiles:
+
+                nav_graph.find_path(tile, goal)
+
+    # Return time
+    return time.time() - start
+
+
+def run(name, enemy_count, frames, rounds):
+
+    # Debug control center; no window, no sound
+    control_center = ControlCenter(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT, debug = True)
+
+    # Load the universe
+    universe = Universe("story1", MODE_EDITOR, control_center)
+
+
+    print "map:       %s" % name
+    print "enemies:   %d" % enemy_count
+    print "frames:    %d" % frames
+    print "rounds:    %d (best of)" % rounds
+    print ""
+    print "%-20s %10s %12s %12s %14s" % ("mode", "seconds", "ms / frame", "flow fields", "planning only")
+
+    # Modes:  each enemy finds its own path, then all enemies share flow fields
+    modes = ( ("a* per enemy", 0), ("shared flow field", 1) )
+
+    # Best times for each mode, as [enemy logic seconds, planning seconds, flow fields calculated]
+    results = [ [None, None, 0] for (label, value) in modes ]
+
+    # Alternate modes each round, so that anything slowing the machine down affects both modes alike
+    for i in range(0, rounds):
+
+        for j in range( 0, len(modes) ):
+
+            # Convenience
+            (label, value) = modes[j]
+
+            # Fresh map
+            (m, route) = setup(control_center, universe, name, enemy_count, seed = 1)
+
+            m.get_wave_tracker().set_wave_param("enemies-share-flow-field", value)
+
+            # Count flow field calculations (after setup)
+            count = [0]
+            f = m.master_plane.nav_graph.calculate_flow_field
+
+            def g(goal):
+                count[0] += 1
+                return f(goal)
+
+            m.master_plane.nav_graph.calculate_flow_field = g
+
+
+            # Time
+            seconds = time_enemies(control_center, universe, m, route, frames)
+
+            # Flow fields calculated during the frames (the same each round)
+            results[j][2] = count[0]
+
+            # Time route planning alone
+            planning = time_planning(m, route, value)
+
+            # Keep the best times
+            if ( (results[j][0] == None) or (seconds < results[j][0]) ):
+                results[j][0] = seconds
+
+            if ( (results[j][1] == None) or (planning < results[j][1]) ):
+                results[j][1] = planning
+
+            # Discard the map before the next mode
+            universe.visible_maps[LAYER_FOREGROUND].clear()
+
+
+    for j in range( 0, len(modes) ):
+
+        (seconds, planning, fields) = results[j]
+
+        print "%-20s %9.3fs %12.3f %12d %13.3fs" % ( modes[j][0], seconds, 1000 * seconds / frames, fields, planning )
+
+    print ""
+    print "speedup:   %.1fx (enemy logic), %.1fx (planning only)" % (
+        results[0][0] / max(0.000001, results[1][0]),
+        results[0][1] / max(0.000001, results[1][1])
+    )
+
+
+if (__name__ == "__main__"):
+
+    run(
+        sys.argv[1] if ( len(sys.argv) > 1 ) else "challenge1",
+        int( sys.argv[2] ) if ( len(sys.argv) > 2 ) else 60,
+        int( sys.argv[3] ) if ( len(sys.argv) > 3 ) else 600,
+        int( sys.argv[4] ) if ( len(sys.argv) > 4 ) else 3
+    )
@@ -0,0 +1,149 @@
+import sys
+import time
+import random
+
+from code.game.particle import Particle, ParticleSystem
+
+from code.constants.common import TILE_WIDTH, TILE_HEIGHT, PARTICLE_SYSTEM_CAPACITY
+
+
+# Simulate a chain of bombs, each blowing up a few tiles (9 particles per tile, as in Map.create_particle_effect),
+# and compare one Particle object per fragment (culled by popping dead particles off the list, as the map used to)
+# against a ParticleSystem.  Reports the average and worst frame time, plus the peak number of live particles.
+#
+#   python -m code.benchmarks.particles [bombs] [tiles per bomb] [frames between bombs]
+
+
+# Total frames to simulate after the last bomb (enough for every particle to fade out)
+SETTLE_FRAMES = 180
+
+
+# Get the list of (x, y) tile positions each bomb destroys, one list per frame (empty when no bomb goes off)
+def get_blasts(bombs, tiles_per_bomb, interval, seed):
+
+    # Same blasts for each mode
+    random.seed(seed)
+
+    # Track blasts by frame
+    blasts = []
+
+    for i in range(0, bombs):
+
+        (x, y) = ( random.randint(0, 40) * TILE_WIDTH, random.randint(0, 20) * TILE_HEIGHT )
+
+        blasts.append(
+            [ ( x + ( random.randint(-2, 2) * TILE_WIDTH ), y + ( random.randint(-2, 2) * TILE_HEIGHT ) ) for j in range(0, tiles_per_bomb) ]
+        )
+
+        # Quiet frames until the next bomb
+        blasts.extend( [ [] for j in range(1, interval) ] )
+
+    # Let everything settle
+    blasts.extend( [ [] for j in range(0, SETTLE_FRAMES) ] )
+
+    # Return blasts
+    return blasts
+
+
+# Run the given blasts using a list of Particle objects.  Returns (frame times, peak count).
+def run_objects(blasts):
+
+    particles = []
+
+    # Track results
+    (times, peak) = ( [], 0 )
+
+    for blast in blasts:
+
+        start = time.time()
+
+        for (x, y) in blast:
+
+            for (ix, iy) in ( (ix, iy) for iy in range(0, 3) for ix in range(0, 3) ):
+
+                particles.append( Particle(x, y, 1, ix, iy) )
+
+        for p in particles:
+
+            p.process(None)
+
+        # Cull lost particles
+        i = 0
+        while ( i < len(particles) ):
+
+            if ( not particles[i].state ):
+                particles.pop(i)
+
+            else:
+                i += 1
+
+        times.append( time.time() - start )
+
+        peak = max( peak, len(particles) )
+
+    # Return results
+    return (times, peak)
+
+
+# Run the given blasts using a ParticleSystem.  Returns (frame times, peak count).
+def run_system(blasts):
+
+    particles = ParticleSystem(PARTICLE_SYSTEM_CAPACITY)
+
+    # Track results
+    (times, peak) = ( [], 0 )
+
+    for blast in blasts:
+
+        start = time.time()
+
+        for (x, y) in blast:
+
+            for (ix, iy) in ( (ix, iy) for iy in range(0, 3) for ix in range(0, 3) ):
+
+                particles.spawn(x, y, 1, ix, iy)
+
+        particles.process()
+
+        times.append( time.time() - start )
+
+        peak = max( peak, particles.get_count() )
+
+    # Return results
+    return (times, peak)
+
+
+def run(bombs, tiles_per_bomb, interval):
+
+    blasts = get_blasts(bombs, tiles_per_bomb, interval, seed = 1)
+
+    print "bombs:     %d (%d tiles each, every %d frames)" % (bombs, tiles_per_bomb, interval)
+    print "frames:    %d" % len(blasts)
+    print ""
+    print "%-20s %14s %14s %12s" % ("mode", "avg ms / frame", "max ms / frame", "peak live")
+
+    # Track results
+    results = []
+
+    for (label, f) in ( ("particle objects", run_objects), ("particle system", run_system) ):
+
+        (times, peak) = f(blasts)
+
+        print "%-20s %14.3f %14.3f %12d" % ( label, 1000 * sum(times) / len(times), 1000 * max(times), peak )
+
+        results.append(times)
+
+    print ""
+    print "speedup:   %.1fx (average), %.1fx (worst frame)" % (
+        sum( results[0] ) / max( 0.000001, sum( results[1] ) ),
+        max( results[0] ) / max( 0.000001, max( results[1] ) )
+    )
+
+
+if (__name__ == "__main__"):
+
+    run(
+        int( sys.argv[1] ) if ( len(sys.argv) > 1 ) else 60,
+        int( sys.argv[2] ) if ( len(sys.argv) > 2 ) else 12,
+        int( sys.argv[3] ) if ( len(sys.argv) > 3 ) else 4
+    )
@@ -0,0 +1,326 @@
+import os
+import sys
+import time
+import json
+import random
+import hashlib
+
+from code.tools.headless import HeadlessControlCenter, HeadlessRunner
+
+from code.game.map import Plane
+from code.game.trigger import Trigger
+from code.game.particle import ParticleSystem, ColorcleSystem, NumbercleSystem
+from code.game.entities import entities
+
+from code.controllers.eventcontroller import EventController
+
+from code.benchmarks.collisionreplay import get_gifs
+
+from code.constants.common import *
+
+
+# Replay each skill GIF's recorded input (data/replays/*.animation.txt) headlessly, from the same random seed,
+# timing each subsystem as we go.  For each GIF we report ticks per second, the time spent in each subsystem,
+# and a hash of the final game state.  Results go out as JSON; given a previous run's JSON, we compare against it
+# and flag any GIF whose final state changed (a determinism break) along with the change in speed.
+#
+#   python -m code.benchmarks.replays [ticks] [output json] [baseline json]
+#
+# A tick count of 0 (default) runs each GIF for the length of its replay.
+
+
+# Same random numbers for every run
+REPLAY_SEED = 1
+
+
+# Subsystem timings are exclusive:  when one timed call runs inside another (e.g. a trigger running a script),
+# we charge the inner call's time to its own subsystem only.  Time outside of every timed call counts as "other."
+class SubsystemTimer:
+
+    def __init__(self):
+
+        # Seconds by subsystem
+        self.totals = {}
+
+        # For each timed call in progress, the time spent in timed calls nested within it
+        self.stack = []
+
+        # Each method we've wrapped (class, method name, original function), so that we can put it back
+        self.wrapped = []
+
+
+    # Time every call to a given class's own (not inherited) method, charging it to a given subsystem
+    def wrap(self, cls, name, key):
+
+        # Original function
+        original = cls.__dict__[name]
+
+        # Convenience
+        timer = self
+
+        def timed(*args, **kwargs):
+
+            timer.stack.append(0.0)
+
+            # Begin timing
+            start = time.time()
+
+            try:
+
+                return original(*args, **kwargs)
+
+            finally:
+
+                elapsed = time.time() - start
+
+                # Don't count nested timed calls
+                nested = timer.stack.pop()
+
+                timer.totals[key] = timer.totals.get(key, 0.0) + (elapsed - nested)
+
+                # Let the enclosing call know about this time
+                if ( len(timer.stack) > 0 ):
+
+                    timer.stack[-1] += elapsed
+
+        setattr(cls, name, timed)
+
+        # Remember original
+        self.wrapped.append( (cls, name, original) )
+
+        # For chaining
+        return self
+
+
+    # Time each subsystem of the simulation
+    def wrap_subsystems(self):
+
+        # Every entity type's own logic
+        for cls in vars(entities).values():
+
+            if ( (type(cls) == type(entities.Entity)) and issubclass(cls, entities.Entity) ):
+
+                for name in ("process", "process_drama", "post_process"):
+
+                    if (name in cls.__dict__):
+
+                        self.wrap(cls, name, "entities")
+
+                if ("handle_ai" in cls.__dict__):
+
+                    self.wrap(cls, "handle_ai", "ai")
+
+        # Dig sites
+        self.wrap(Plane, "process_traps", "traps")
+
+        # Scripts
+        self.wrap(EventController, "process", "scripts")
+        self.wrap(EventController, "loop", "scripts")
+
+        # Triggers
+        self.wrap(Trigger, "process", "triggers")
+
+        # Particles
+        for cls in (ParticleSystem, ColorcleSystem, NumbercleSystem):
+
+            if ("process" in cls.__dict__):
+
+                self.wrap(cls, "process", "particles")
+
+        # For chaining
+        return self
+
+
+    # Put back every method we've wrapped
+    def restore(self):
+
+        while ( len(self.wrapped) > 0 ):
+
+            (cls, name, original) = self.wrapped.pop()
+
+            setattr(cls, name, original)
+
+        # For chaining
+        return self
+
+
+    # Forget all timings
+    def reset(self):
+
+        self.totals = {}
+        self.stack = []
+
+        # For chaining
+        return self
+
+
+# Calculate a hash of a given map's game state:  each entity's position / state, each active dig site, and the gold count
+def get_state_hash(m):
+
+    state = (
+        tuple(
+            ( entity.name, entity.x, entity.y, entity.status, entity.alive, entity.corpsed )
+            for genus in sorted(m.master_plane.entities)
+            for entity in m.master_plane.entities[genus]
+        ),
+        tuple(
+            ( x, y, trap.get_timer(), trap.get_delay() )
+            for (x, y, trap) in m.master_plane.traps.get_active_traps()
+        ),
+        m.remaining_gold_count()
+    )
+
+    # Return hash
+    return hashlib.md5( repr(state) ).hexdigest()
+
+
+# Replay a given GIF for a given number of ticks (0 for the length of its replay), timing each subsystem
+def play(control_center, timer, map_name, replay_file, skill, ticks):
+
+    # Same random numbers for each run
+    random.seed(REPLAY_SEED)
+
+    # Load the GIF
+    runner = HeadlessRunner(control_center).load_gif(map_name, replay_file, skill)
+
+    # Fresh timings
+    timer.reset()
+
+    # Track errors
+    error = None
+
+    try:
+
+        runner.run( ticks if (ticks > 0) else None )
+
+    except Exception as e:
+
+        error = "tick %d:  %s" % ( runner.ticks, repr(e) )
+
+
+    # Subsystem timings
+    subsystems = dict(timer.totals)
+
+    # Whatever we didn't time
+    subsystems["other"] = max( 0.0, runner.elapsed - sum( timer.totals.values() ) )
+
+    # Return results
+    return {
+        "map": map_name,
+        "replay-file": replay_file,
+        "skill": skill,
+        "ticks": runner.ticks,
+        "seconds": runner.elapsed,
+        "ticks-per-second": runner.get_ticks_per_second(),
+        "subsystems": subsystems,
+        "state-hash": get_state_hash(runner.map),
+        "error": error
+    }
+
+
+def run(ticks, output_path, baseline_path):
+
+    # No window, no sound
+    control_center = HeadlessControlCenter()
+
+    # Time each subsystem
+    timer = SubsystemTimer().wrap_subsystems()
+
+    # Previous results, by map name
+    baseline = {}
+
+    if (baseline_path):
+
+        f = open(baseline_path, "r")
+        baseline = dict( ( result["map"], result ) for result in json.load(f)["results"] )
+        f.close()
+
+
+    # Track results
+    results = []
+
+    # Track determinism breaks
+    failures = 0
+
+    print "%-28s %6s %8s  %s" % ("gif", "ticks", "ticks/s", "subsystems (ms)")
+
+    try:
+
+        for (map_name, replay_file, skill) in get_gifs("story1"):
+
+            result = play(control_center, timer, map_name, replay_file, skill, ticks)
+
+            results.append(result)
+
+            # Summary
+            line = "%-28s %6d %8.0f  %s" % (
+                map_name,
+                result["ticks"],
+                result["ticks-per-second"],
+                "  ".join( "%s %.0f" % ( key, 1000 * result["subsystems"][key] ) for key in sorted( result["subsystems"] ) )
+            )
+
+            # Compare with baseline?
+            if (map_name in baseline):
+
+                # Convenience
+                previous = baseline[map_name]
+
+                if ( previous["ticks-per-second"] > 0 ):
+
+                    line += "  (%+.1f%%)" % ( 100 * ( ( result["ticks-per-second"] / previous["ticks-per-second"] ) - 1 ) )
+
+                # Same ticks should always give the same state
+                if ( (previous["ticks"] == result["ticks"]) and (previous["state-hash"] != result["state-hash"]) ):
+
+                    line += "  STATE CHANGED"
+                    failures += 1
+
+            # Playback error?
+            if ( result["error"] ):
+
+                line += "  (stopped at %s)" % result["error"]
+
+            print line
+
+    # Always put back the original methods
+    finally:
+
+        timer.restore()
+
+
+    # Write results
+    if (output_path):
+
+        f = open(output_path, "w")
+        f.write(
+            json.dumps({
+                "ticks": ticks,
+                "seed": REPLAY_SEED,
+                "results": results
+            }, indent = 2, sort_keys = True)
+        )
+        f.close()
+
+        print ""
+        print "wrote %s" % output_path
+
+    # Report determinism breaks
+    if (baseline_path):
+
+        print ""
+        print "state changes:  %d" % failures
+
+    # Success if no state changed
+    return (failures == 0)
+
+
+if (__name__ == "__main__"):
+
+    sys.exit(
+        0 if run(
+            int( sys.argv[1] ) if ( len(sys.argv) > 1 ) else 0,
+            sys.argv[2] if ( len(sys.argv) > 2 ) else None,
+            sys.argv[3] if ( len(sys.argv) > 3 ) else None
+        ) else 1
+    )
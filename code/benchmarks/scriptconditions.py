@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import glob
+import random
+
+from code.tools.xml import XMLParser
+
+from code.game.scripting import script
+from code.game.scripting.script import Script
+
+from code.constants.scripting import *
+
+
+# Check that compiled conditional expressions agree with the way we used to evaluate them (splice each
+# evaluated value into the condition as text, then eval() the result).  We gather every conditional from
+# every script in universes/*/global/scripts.xml and universes/*/maps/*.xml, then evaluate each one against
+# a range of values (the kinds of values script calls return, plus a few that can't compile) both ways.
+# Reports any mismatch, and how long each approach took.
+#
+#   python -m code.benchmarks.scriptconditions [combinations per condition]
+
+
+# Values a script call might return.  Numbers and quoted strings are typical; the rest test the edges.
+SAMPLE_VALUES = (
+    None, "", 0, 1, 3, 7, 10,
+    "0", "1", "2", "5", "12", "1.5", "007", "08", "-1",
+    "'active'", "'inactive'", "'complete'", "'failed'", "'yes'", "''", "\"active\"",
+    "True", "False", "None",
+    "abc", "1+2", "'it\\'s'", "[1, 2]"
+)
+
+
+# Evaluate a given condition against given values the way StatementLink used to
+def legacy_evaluate(condition, values):
+
+    for i in range( 0, len(values) ):
+
+        # Replace the placeholder with the return value
+        if (values[i]):
+
+            condition = condition.replace( "@^statement%d$@" % (i + 1), "%s" % values[i] )
+
+        # Otherwise, throw a 0 in there
+        else:
+
+            condition = condition.replace( "@^statement%d$@" % (i + 1), "0" )
+
+    # Assume
+    result = False
+
+    try:
+        result = eval( condition, vars(script), {} )
+
+    except:
+        pass
+
+    return bool(result)
+
+
+# Find the text of every script in every universe's global scripts and maps
+def get_script_texts():
+
+    # Track results
+    results = []
+
+    for path in sorted( glob.glob( os.path.join("universes", "*", "global", "scripts.xml") ) + glob.glob( os.path.join("universes", "*", "maps", "*.xml") ) ):
+
+        # Read file
+        f = open(path, "r")
+        node = XMLParser().create_node_from_xml( f.read() )
+        f.close()
+
+        # Scripts section
+        ref_scripts = node.find_node_by_tag("scripts")
+
+        # Validate
+        if (ref_scripts):
+
+            for ref_script in ref_scripts.get_nodes_by_tag("script"):
+
+                results.append( ref_script.innerText )
+
+    # Return results
+    return results
+
+
+# Find every conditional link within a given script (including nested subscripts)
+def get_conditional_links(s):
+
+    # Track results
+    results = []
+
+    for statement in s.statements:
+
+        for link in statement.links:
+
+            if (link.type == LINK_TYPE_CONDITIONAL):
+
+                results.append(link)
+
+            # Check subscript
+            if ( isinstance(link.subscript, Script) ):
+
+                results.extend( get_conditional_links(link.subscript) )
+
+    # Return results
+    return results
+
+
+def run(combinations):
+
+    # Gather conditional links
+    links = []
+
+    for text in get_script_texts():
+
+        links.extend( get_conditional_links( Script(text) ) )
+
+
+    # Distinct (condition, placeholder count) pairs
+    conditions = sorted( set( ( link.condition, len(link.parameters) ) for link in links ) )
+
+    # Same values every run
+    random.seed(1)
+
+    # Track results
+    (evaluations, mismatches, legacy_seconds, compiled_seconds) = (0, 0, 0.0, 0.0)
+
+    for (condition, count) in conditions:
+
+        # Compiled form
+        compiled = script.get_compiled_condition(condition, count)
+
+        # Every value in every position, then random combinations
+        cases = [ [value] * count for value in SAMPLE_VALUES ]
+
+        if (count > 1):
+
+            cases.extend( [ [ random.choice(SAMPLE_VALUES) for i in range(0, count) ] for j in range(0, combinations) ] )
+
+
+        for values in cases:
+
+            start = time.time()
+            expected = legacy_evaluate(condition, values)
+            legacy_seconds += (time.time() - start)
+
+            start = time.time()
+            actual = compiled.evaluate(values)
+            compiled_seconds += (time.time() - start)
+
+            evaluations += 1
+
+            if (expected != actual):
+
+                mismatches += 1
+                print "MISMATCH:  %r with %r:  expected %s, got %s" % (condition, values, expected, actual)
+
+
+    print "scripts:               %d" % len( get_script_texts() )
+    print "conditional links:     %d" % len(links)
+    print "distinct conditions:   %d (%d compiled, the rest splice / eval)" % ( len(conditions), sum( 1 for (condition, count) in conditions if ( script.get_compiled_condition(condition, count).code ) ) )
+    print "evaluations:           %d" % evaluations
+    print "legacy:                %.3f seconds" % legacy_seconds
+    print "compiled:              %.3f seconds" % compiled_seconds
+    print ""
+    print "mismatches:            %d" % mismatches
+
+    # Success if everything agreed
+    return (mismatches == 0)
+
+
+if (__name__ == "__main__"):
+
+    sys.exit(
+        0 if run( int( sys.argv[1] ) if ( len(sys.argv) > 1 ) else 200 ) else 1
+    )
@@ -0,0 +1,179 @@
+import sys
+import time
+
+from code.tools.headless import HeadlessRunner
+
+from code.game.scripting import objects
+from code.game.scripting.script import Script
+
+from code.benchmarks.scriptconditions import get_script_texts, get_conditional_links
+
+from code.constants.common import *
+from code.constants.scripting import *
+
+
+# Time the script interpreter's per-statement overhead.  We gather the statements each conditional in
+# every script checks (query chains such as getSessionVariable(...).getValue(), which don't change any state),
+# load a map headlessly, and evaluate each statement many times, two ways:  the way Statement.evaluate used
+# to (a fresh Base query object for each statement, with the frame count written to a session variable as a
+# string) and the way it does now (a callback bound as we parse, with the frame count in the execution context).
+# Both must return the same values.
+#
+#   python -m code.benchmarks.scriptdispatch [rounds] [universe] [map name]
+
+
+# Evaluate a given method statement the way Statement.evaluate used to
+def legacy_evaluate(statement, control_center, universe):
+
+    # Count this evaluation
+    statement.frames += 1
+
+    # Frame count, as a string
+    universe.get_session_variable("tmp.link.frames").set_value("%d" % statement.frames)
+
+    # Fresh Base query object
+    result = objects.Base().evaluate(
+        statement.links[0].method.lstrip("+"),
+        statement.links[0].parameters,
+        control_center,
+        universe
+    )
+
+    # Remaining links
+    i = 1
+
+    while ( (result != None) and (i < len(statement.links)) and (statement.links[i].type == LINK_TYPE_METHOD) ):
+
+        result = result.evaluate(
+            statement.links[i].method,
+            statement.links[i].parameters,
+            control_center,
+            universe
+        )
+
+        i += 1
+
+    # Return result
+    return result
+
+
+# Find every method statement (not sleep) that a conditional checks
+def get_method_statements():
+
+    # Track results
+    results = []
+
+    for text in get_script_texts():
+
+        for link in get_conditional_links( Script(text) ):
+
+            for statement in link.parameters:
+
+                if ( ( len(statement.links) > 0 ) and (statement.links[0].type == LINK_TYPE_METHOD) and (statement.links[0].method != "sleep") ):
+
+                    results.append(statement)
+
+    # Return results
+    return results
+
+
+def run(rounds, universe_name, map_name):
+
+    # Load a map to run against
+    runner = HeadlessRunner().load(universe_name, map_name)
+
+    # Convenience
+    (control_center, universe) = (runner.control_center, runner.universe)
+
+
+    # Representative statements
+    statements = get_method_statements()
+
+    # A statement written for another map might fail on this one; we'll time only the statements that evaluate without raising
+    (valid, mismatches) = ( [], 0 )
+
+    # Silence "Method Warning" complaints while we check
+    handle_error = objects.handle_error
+    objects.handle_error = lambda s: None
+
+    try:
+
+        for statement in statements:
+
+            try:
+
+                (expected, actual) = (
+                    legacy_evaluate(statement, control_center, universe),
+                    statement.evaluate(control_center, universe)
+                )
+
+            except:
+
+                continue
+
+            # Query objects don't compare; compare their types
+            if ( isinstance(expected, objects.Generic) or isinstance(actual, objects.Generic) ):
+
+                (expected, actual) = ( expected.__class__, actual.__class__ )
+
+            if (expected != actual):
+
+                mismatches += 1
+                print "MISMATCH:  %s:  expected %r, got %r" % ( statement.links[0].method, expected, actual )
+
+            else:
+
+                valid.append(statement)
+
+    finally:
+
+        objects.handle_error = handle_error
+
+
+    # Legacy dispatch
+    start = time.time()
+
+    for i in range(0, rounds):
+
+        for statement in valid:
+
+            legacy_evaluate(statement, control_center, universe)
+
+    legacy_seconds = time.time() - start
+
+
+    # Bound dispatch
+    start = time.time()
+
+    for i in range(0, rounds):
+
+        for statement in valid:
+
+            statement.evaluate(control_center, universe)
+
+    bound_seconds = time.time() - start
+
+
+    # Convenience
+    evaluations = rounds * len(valid)
+
+    print "statements:            %d (%d evaluate cleanly on %s/%s)" % ( len(statements), len(valid), universe_name, map_name )
+    print "evaluations:           %d" % evaluations
+    print "legacy:                %.3f seconds (%.2f usec per statement)" % ( legacy_seconds, 1000000 * legacy_seconds / max(1, evaluations) )
+    print "bound:                 %.3f seconds (%.2f usec per statement)" % ( bound_seconds, 1000000 * bound_seconds / max(1, evaluations) )
+    print ""
+    print "mismatches:            %d" % mismatches
+
+    # Success if everything agreed
+    return (mismatches == 0)
+
+
+if (__name__ == "__main__"):
+
+    sys.exit(
+        0 if run(
+            int( sys.argv[1] ) if ( len(sys.argv) > 1 ) else 200,
+            sys.argv[2] if ( len(sys.argv) > 2 ) else "story1",
+            sys.argv[3] if ( len(sys.argv) > 3 ) else "root"
+        ) else 1
+    )
@@ -0,0 +1,191 @@
+import os
+import re
+import sys
+import glob
+import time
+
+from code.tools.headless import HeadlessRunner
+
+from code.game import universe as universe_module
+
+from code.utils.common import xml_decode
+
+
+# Check that translating messages from their tokens (MessageTemplate) agrees with the way we used to translate
+# them (replace each session variable reference, for every session variable, then each input phrase).  We gather
+# the text of every xml file in universes/ and data/ (dialogue lines, news items, quest descriptions, etc.),
+# load a map headlessly, and translate each message both ways:  without a control center, and for each input device.
+# A few extra messages (and session values) test the cases that must cascade.  Reports any mismatch, and how long
+# each approach took.
+#
+#   python -m code.benchmarks.translations [rounds] [universe] [map name]
+
+
+# Messages (with their session values) that only translate correctly by cascading
+CASCADE_CASES = (
+    ( "Hello, $[tmp.translations.a]!", { "tmp.translations.a": "$[core.player1.name]" } ),
+    ( "Press $[tmp.translations.a] to talk.", { "tmp.translations.a": "@enter" } ),
+    ( "Press @$[tmp.translations.a] to dig.", { "tmp.translations.a": "dig-left" } ),
+    ( "$[$[tmp.translations.a]]", { "tmp.translations.a": "core.player1.name" } ),
+    ( "Unknown $[tmp.translations.missing] stays; @enter translates.", {} )
+)
+
+
+# How many messages without references do we sample (alongside every message with references)?
+PLAIN_MESSAGE_SAMPLE_SIZE = 1000
+
+
+# Find the text of every xml file in universes/ and data/ (anything that reads like a sentence).  We keep
+# every message that refers to a session variable / input phrase, plus an even sample of the rest.
+def get_messages():
+
+    # Track results
+    results = set()
+
+    for path in glob.glob( os.path.join("universes", "*", "*.xml") ) + glob.glob( os.path.join("universes", "*", "*", "*.xml") ) + glob.glob( os.path.join("data", "*", "*.xml") ):
+
+        # Read file
+        f = open(path, "r")
+        text = f.read()
+        f.close()
+
+        # Text between tags / quotes
+        for chunk in re.findall( "[^<>'\"]+", text ):
+
+            # Sentences only
+            if ( ( chunk.find(" ") >= 0 ) and ( len( chunk.strip() ) > 3 ) ):
+
+                results.add( xml_decode( chunk.strip() ) )
+
+
+    # Messages with references
+    references = [ message for message in sorted(results) if ( universe_module.MessageTemplate.PATTERN.search(message) ) ]
+
+    # Messages without
+    plain = [ message for message in sorted(results) if ( not universe_module.MessageTemplate.PATTERN.search(message) ) ]
+
+    # Return results
+    return references + plain[ : : max( 1, len(plain) / PLAIN_MESSAGE_SAMPLE_SIZE ) ]
+
+
+# Translate each of a list of messages both ways, returning (mismatches, legacy seconds, template seconds)
+def compare(universe, messages, control_center, rounds):
+
+    # Track mismatches
+    mismatches = 0
+
+    for message in messages:
+
+        (expected, actual) = (
+            universe.replace_session_variable_references(message, control_center),
+            universe.translate_session_variable_references(message, control_center)
+        )
+
+        if (expected != actual):
+
+            mismatches += 1
+            print "MISMATCH:  %r:  expected %r, got %r" % (message, expected, actual)
+
+
+    # Legacy translation
+    start = time.time()
+
+    for i in range(0, rounds):
+
+        for message in messages:
+
+            universe.replace_session_variable_references(message, control_center)
+
+    legacy_seconds = time.time() - start
+
+
+    # Template translation
+    start = time.time()
+
+    for i in range(0, rounds):
+
+        for message in messages:
+
+            universe.translate_session_variable_references(message, control_center)
+
+    template_seconds = time.time() - start
+
+
+    # Return results
+    return (mismatches, legacy_seconds, template_seconds)
+
+
+def run(rounds, universe_name, map_name):
+
+    # Load a map to run against
+    runner = HeadlessRunner().load(universe_name, map_name)
+
+    # Convenience
+    (control_center, universe) = (runner.control_center, runner.universe)
+
+
+    # Representative messages
+    messages = get_messages()
+
+    # Track mismatches
+    failures = 0
+
+    print "messages:              %d (%d refer to session variables / input phrases)" % ( len(messages), sum( 1 for message in messages if ( universe_module.MessageTemplate.PATTERN.search(message) ) ) )
+    print "session variables:     %d" % len(universe.session)
+    print ""
+
+    for device in (None, "keyboard", "gamepad"):
+
+        # Without a control center, we don't translate input phrases
+        if (device):
+
+            control_center.get_input_controller().last_used_device = device
+
+        (mismatches, legacy_seconds, template_seconds) = compare(universe, messages, control_center if (device) else None, rounds)
+
+        failures += mismatches
+
+        print "%-22s %.3f seconds legacy, %.3f seconds template (%.1fx)" % ( "%s:" % (device if (device) else "no input"), legacy_seconds, template_seconds, legacy_seconds / max(0.000001, template_seconds) )
+
+
+    # Cascades
+    for (message, values) in CASCADE_CASES:
+
+        for key in values:
+
+            universe.get_session_variable(key).set_value( values[key] )
+
+        (mismatches, legacy_seconds, template_seconds) = compare(universe, [message], control_center, 1)
+
+        failures += mismatches
+
+
+    # Changing an input's key must show up in the next translation
+    universe.get_session_variable("sys.input.gamepad.interact").set_value("X")
+    before = universe.translate_session_variable_references("@enter", control_center)
+
+    universe.get_session_variable("sys.input.gamepad.interact").set_value("Y")
+    after = universe.translate_session_variable_references("@enter", control_center)
+
+    if ( (before, after) != ("X", "Y") ):
+
+        failures += 1
+        print "MISMATCH:  input change:  expected ('X', 'Y'), got %r" % ( (before, after), )
+
+
+    print ""
+    print "mismatches:            %d" % failures
+
+    # Success if everything agreed
+    return (failures == 0)
+
+
+if (__name__ == "__main__"):
+
+    sys.exit(
+        0 if run(
+            int( sys.argv[1] ) if ( len(sys.argv) > 1 ) else 3,
+            sys.argv[2] if ( len(sys.argv) > 2 ) else "story1",
+            sys.argv[3] if ( len(sys.argv) > 3 ) else "root"
+        ) else 1
+    )
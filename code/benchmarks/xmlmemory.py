@@ -0,0 +1,165 @@
+import os
+import sys
+import time
+
+from code.tools.xml import XMLParser
+
+from code.tools.controlcenter import ControlCenter
+
+from code.game.universe import Universe
+
+from code.constants.common import MODE_EDITOR, SCREEN_WIDTH, SCREEN_HEIGHT
+
+
+# Measure the memory held by the xml trees we parse during a full Universe.load.
+# We load in editor mode so that we don't discard the universe's active session data.
+#
+#   python -m code.benchmarks.xmlmemory [universe name]
+
+
+# Record every tree the parser hands back, keeping each one alive until we measure it
+def record_parsed_trees(trees):
+
+    # Original methods
+    (create_node_from_xml, create_node_from_file) = (
+        XMLParser.create_node_from_xml,
+        XMLParser.create_node_from_file
+    )
+
+    def f_xml(parser, *args, **kwargs):
+
+        node = create_node_from_xml(parser, *args, **kwargs)
+        trees.append(node)
+
+        return node
+
+    def f_file(parser, *args, **kwargs):
+
+        node = create_node_from_file(parser, *args, **kwargs)
+        trees.append(node)
+
+        return node
+
+    XMLParser.create_node_from_xml = f_xml
+    XMLParser.create_node_from_file = f_file
+
+    # Return a function that restores the original methods
+    def f_restore():
+
+        XMLParser.create_node_from_xml = create_node_from_xml
+        XMLParser.create_node_from_file = create_node_from_file
+
+    return f_restore
+
+
+# Add the size of a given object to a running total, counting each object only once
+def measure(o, seen):
+
+    if ( (o != None) and ( not ( id(o) in seen ) ) ):
+
+        seen.add( id(o) )
+
+        return sys.getsizeof(o)
+
+    return 0
+
+
+# Measure a node (and its children).  Returns (node count, bytes held, bytes of innerXml left unread in a shared source).
+def measure_node(node, seen):
+
+    # Node itself, plus its list of children
+    (count, size, unread) = (
+        1,
+        measure(node, seen) + measure(node.nodes, seen),
+        0
+    )
+
+    # Attributes
+    if (node._attributes != None):
+
+        size += measure(node._attributes, seen)
+
+        for key in node._attributes:
+
+            size += measure(key, seen) + measure(node._attributes[key], seen)
+
+    # Hidden data
+    size += measure(node._data, seen)
+
+    # Names
+    size += measure(node.tag_type, seen) + measure(node.tag_namespace, seen)
+
+    # Inner content.  The shared source counts once per document.
+    size += measure(node._innerText, seen) + measure(node._innerXml, seen) + measure(node.source, seen)
+
+    # Track the inner xml we'd otherwise keep as a separate string
+    if (node._innerXml == None):
+
+        unread += node.source_end - node.source_start
+
+
+    # Children
+    for child in node.nodes:
+
+        (a, b, c) = measure_node(child, seen)
+
+        count += a
+        size += b
+        unread += c
+
+    # Return totals
+    return (count, size, unread)
+
+
+def run(name):
+
+    # Debug control center; no window, no sound
+    control_center = ControlCenter(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT, debug = True)
+
+    # Track parsed trees
+    trees = []
+    f_restore = record_parsed_trees(trees)
+
+    # Load the universe
+    start = time.time()
+    universe = Universe(name, MODE_EDITOR, control_center)
+    seconds = time.time() - start
+
+    f_restore()
+
+
+    # Measure
+    seen = set()
+    (count, size, unread) = (0, 0, 0)
+
+    for node in trees:
+
+        if (node):
+
+            (a, b, c) = measure_node(node, seen)
+
+            count += a
+            size += b
+            unread += c
+
+
+    print "universe:              %s" % name
+    print "load time:             %.3fs" % seconds
+    print "documents parsed:      %d" % len(trees)
+    print "nodes:                 %d" % count
+    print "bytes held:            %d (%.1f per node)" % ( size, float(size) / max(1, count) )
+    print "innerXml not copied:   %d bytes" % unread
+
+    # Peak process memory, where available
+    try:
+
+        import resource
+        print "peak rss:              %d KB" % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    except ImportError:
+        pass
+
+
+if (__name__ == "__main__"):
+
+    run( sys.argv[1] if ( len(sys.argv) > 1 ) else "story1" )
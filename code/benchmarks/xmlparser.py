@@ -0,0 +1,242 @@
+import os
+import sys
+import time
+
+from code.tools.xml import XMLParser, XMLNode
+
+from code.utils.common import logn, xml_decode
+
+from code.constants.paths import UNIVERSES_PATH
+
+
+# Compare the single-pass parser (XMLParser.parse_xml) against the legacy
+# recursive parser (parse_xml_recursive, below) on every xml file in the shipped universes.
+
+
+# Legacy parser (formerly XMLParser.parse_xml_recursive), using a given XMLParser for its helpers.  Re-normalizes and
+# re-scans each node's innerXML recursively, which makes parse time grow much faster than document size.
+def parse_xml_recursive(parser, xml, parent, depth = 1, maxdepth = -1):
+
+    # Track whether or not we have valid xml data.  Assume we do, at the beginning.
+    valid = True
+
+
+    # Strip comments, excess whitespace, etc.
+    xml = parser.normalize_xml(xml)
+
+
+    # Begin by finding the first element
+    a = xml.find("<")
+    b = -1
+
+    if (a >= 0):
+
+        b = parser.find_tag_end(xml, a)
+
+        # If we couldn't find the end of the tag, then we invalidate the entire document
+        if (b < 0):
+
+            # Just for posterity
+            valid = False
+
+            # Immediately abandon parsing for this node
+            return False
+
+        # We found the end of the intro tag.
+        while (a >= 0):
+
+            # Check to see if this is a self-closing tag ( e.g. <node /> or <node attribute = '1' /> )
+            self_closing = (xml[b - 1] == "/")
+
+
+            # Get the contents of the XML
+            s = xml[a + 1 : b].strip()
+
+            # For self-closing tags, let's ditch the closing /
+            if (self_closing):
+                s = xml[a + 1 : b - 1].strip()
+
+
+            # Create a new node from the tag's contents
+            (tag_data, node) = parser.create_node_from_tag_contents(s)
+
+
+            z = 0
+
+            # For self-closing tags, don't bother looking for descendants...
+            if (self_closing):
+                z = b
+
+            else:
+
+                # Find the closing tag for this tag...
+                z = parser.find_tag_close(xml, a, tag_data)
+
+                # If we couldn't find the close tag, then we'll have to invalidate the entire document
+                if (z < 0):
+
+                    # Posterity
+                    valid = False
+
+                    logn( "xml error", tag_data + ":  could not find close tag (%s)" % a )
+                    logn( "xml error", "not found in:  %s" % xml[a : a + 250].replace("\n", "<br>") )
+
+                    # Abandon
+                    return False
+
+                # We did indeed find the close tag
+                else:
+
+                    # Get the data inside...
+                    innerXML = xml[b + 1 : z]
+
+                    # (Track that innerXML in a member variable)
+                    # (Please note and excuse the inconsistent casing)
+                    node.innerXml = innerXML
+
+
+                    # Can we continue to parse?
+                    if ( (maxdepth < 0) or (depth < maxdepth) ):
+
+                        # Parse the innerXML for children.  Check validity of child node
+                        valid = parse_xml_recursive(parser, innerXML, node, depth = depth + 1, maxdepth = maxdepth)
+
+                        # If the child xml didn't validate, we'll have to abort
+                        if (not valid):
+
+                            # Too bad!
+                            return False
+
+                        # It did validate
+                        else:
+
+                            # If we didn't find any child nodes, take the innerXML as raw text data...
+                            if (len(node.nodes) == 0):
+
+                                node.innerText = xml_decode( innerXML.strip() )
+
+                    # If not, we'll save the remaining contents are simple innerText
+                    else:
+
+                        # Save as text
+                        node.innerText = xml_decode( innerXML.strip() )
+
+
+
+            #parent.nodes.append(node)
+            parent.add_node(node)
+
+
+
+
+
+            # Find the next node...
+            #z = parser.find_tag_close(xml, a, tag_type)
+
+            a = xml.find("<", z + 1)
+
+            b = parser.find_tag_end(xml, a)
+
+    return valid
+
+
+# Get the paths of all xml files within a given universe folder
+def get_xml_paths_in_folder(path):
+
+    # Track paths
+    paths = []
+
+    for (folder, subfolders, filenames) in os.walk(path):
+
+        for filename in sorted(filenames):
+
+            if ( filename.endswith(".xml") ):
+
+                paths.append( os.path.join(folder, filename) )
+
+    # Return all paths
+    return paths
+
+
+# Count all nodes (any tag) in a tree
+def count_nodes(node):
+
+    # Count self
+    count = 1
+
+    for child in node.nodes:
+
+        count += count_nodes(child)
+
+    # Return total
+    return count
+
+
+# Parse each given xml string using a given parser method, returning (seconds elapsed, nodes created)
+def time_parser(f, documents, repeat = 1):
+
+    # Track node count
+    count = 0
+
+    # Begin timing
+    start = time.time()
+
+    for i in range(0, repeat):
+
+        for xml in documents:
+
+            # Parse into a fresh root
+            node = XMLNode("xml-root")
+
+            if ( f(xml, node) ):
+
+                count += count_nodes(node)
+
+    # Return time, node count
+    return ( time.time() - start, count )
+
+
+def run(repeat = 1):
+
+    parser = XMLParser()
+
+    # Totals
+    (total_old, total_new) = (0.0, 0.0)
+
+    print "%-20s %8s %10s %10s %10s %8s" % ("universe", "files", "bytes", "recursive", "single", "speedup")
+
+    for name in sorted( os.listdir(UNIVERSES_PATH) ):
+
+        # Read each xml file into memory up front; we only want to time the parsing.
+        documents = []
+
+        for path in get_xml_paths_in_folder( os.path.join(UNIVERSES_PATH, name) ):
+
+            f = open(path, "r")
+            documents.append( f.read() )
+            f.close()
+
+
+        # Skip empty folders
+        if ( len(documents) > 0 ):
+
+            (seconds_old, count_old) = time_parser(lambda xml, node: parse_xml_recursive(parser, xml, node), documents, repeat)
+            (seconds_new, count_new) = time_parser(parser.parse_xml, documents, repeat)
+
+            # Both parsers should create the same trees
+            if (count_old != count_new):
+
+                print "%s:  node count mismatch (%d recursive, %d single)" % (name, count_old, count_new)
+
+            print "%-20s %8d %10d %9.3fs %9.3fs %7.1fx" % ( name, len(documents), sum( len(xml) for xml in documents ), seconds_old, seconds_new, seconds_old / max(0.000001, seconds_new) )
+
+            total_old += seconds_old
+            total_new += seconds_new
+
+    print "%-20s %8s %10s %9.3fs %9.3fs %7.1fx" % ("total", "", "", total_old, total_new, total_old / max(0.000001, total_new))
+
+
+if (__name__ == "__main__"):
+
+    # Optional repeat count (e.g. python -m code.benchmarks.xmlparser 5)
+    run( int(sys.argv[1]) if ( len(sys.argv) > 1 ) else 1 )
@@ -0,0 +1,185 @@
+import sys
+import time
+
+from code.tools.controlcenter import ControlCenter
+
+from code.game.universe import Universe
+
+from code.utils.common import xml_encode
+
+from code.constants.common import MODE_EDITOR, LAYER_FOREGROUND, SCREEN_WIDTH, SCREEN_HEIGHT
+
+
+# Compare XMLNode.compile_xml_string (single pass, via write_xml) against the legacy
+# recursive serializer (compile_xml_string_recursive, below), using the state of real maps.
+#
+#   python -m code.benchmarks.xmlwriter [universe name] [repeat] [max maps]
+
+
+# Legacy serializer (formerly XMLNode.compile_xml_string_recursive).  Builds a given node's string by recursive
+# concatenation; compile_xml_string (via write_xml) replaces it.
+def compile_xml_string_recursive(node, prefix = "", include_namespaces = False, encode_innerText = True, pretty = True):
+
+    # Assume no namespace
+    tag_data = "%s" % node.tag_type
+
+    # Check namespace inclusion flag
+    if (include_namespaces):
+
+        # Confirm that a namespace exists
+        if (node.tag_namespace != None):
+
+            # Add namespace
+            tag_data = "%s:%s" % (node.tag_namespace, node.tag_type)
+
+
+    # Begin serialization
+    xml = prefix + "<%s" % tag_data
+
+    if (node._attributes):
+
+        for key in node._attributes:
+            xml += " %s = '%s'" % (key, node._attributes[key])
+
+    # Any children?
+    if (len(node.nodes) > 0):
+
+        # Pretty formatting?
+        if (pretty):
+
+            # Add newline
+            xml += ">\n"
+
+            # Loop through nodes and indent each one
+            for each in node.nodes:
+                xml += compile_xml_string_recursive(each, "\t" + prefix, include_namespaces, encode_innerText, pretty)
+
+            # Close tag
+            xml += prefix + "</%s>\n" % tag_data
+
+        # Everything in a single line
+        else:
+
+            # Close tag without newline
+            xml += ">"
+
+            # Loop through nodes, no indention
+            for each in node.nodes:
+                xml += compile_xml_string_recursive(each, prefix, include_namespaces, encode_innerText, pretty)
+
+            # Close tag, don't add newline
+            xml += prefix + "</%s>" % tag_data
+
+    # Inner text?
+    elif (node.innerText != ""):
+
+        # If the inner text has one or more line breaks,
+        # then I'm going to indent it on a new line.
+        if ( node.innerText.find("\n") >= 0 ):
+
+            # Pretty with trailing newline?
+            if (pretty):
+                xml +=  ">\n%s\t%s\n%s</%s>\n" % (prefix, node.innerText.strip(), prefix, tag_data)
+
+            # No newline
+            else:
+                xml +=  ">\n%s\t%s\n%s</%s>\n" % (prefix, node.innerText.strip(), prefix, tag_data)
+
+        # Otherwise, I'm going to print it out without any indenting...
+        else:
+
+            # I don't always want to encode the inner text data
+            if (encode_innerText):
+
+                # Pretty with trailing newline?
+                if (pretty):
+                    xml += ">%s</%s>\n" % ( xml_encode( node.innerText.strip() ), tag_data )
+
+                # No newline
+                else:
+                    xml += ">%s</%s>" % ( xml_encode( node.innerText.strip() ), tag_data )
+
+            # Flag set to false?
+            else:
+
+                # Pretty with trailing newline?
+                if (pretty):
+                    xml += ">%s</%s>\n" % ( node.innerText, tag_data )
+
+                # No newline
+                else:
+                    xml += ">%s</%s>" % ( node.innerText, tag_data )
+
+    # Nope; self-closing...
+    else:
+
+        # Pretty with newline?
+        if (pretty):
+            xml += " />\n"
+
+        # No newline
+        else:
+            xml += " />"
+
+    return xml
+
+
+# Time a given serializer function, returning (seconds elapsed, output)
+def time_serializer(f, repeat):
+
+    # Begin timing
+    start = time.time()
+
+    for i in range(0, repeat):
+
+        xml = f()
+
+    # Return time, last output
+    return ( time.time() - start, xml )
+
+
+def run(name, repeat = 100, max_maps = 25):
+
+    # Debug control center; no window, no sound
+    control_center = ControlCenter(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT, debug = True)
+
+    # Load the universe (editor mode, so that we don't discard the universe's active session data)
+    universe = Universe(name, MODE_EDITOR, control_center)
+
+    # Totals
+    (total_old, total_new) = (0.0, 0.0)
+
+    print "%-32s %8s %10s %10s %10s %8s" % ("map", "bytes", "recursive", "single", "compact", "speedup")
+
+    for map_name in sorted( universe.map_data[LAYER_FOREGROUND] )[0 : max_maps]:
+
+        # Build the map, if we haven't already
+        universe.build_map_on_layer_by_name(map_name, LAYER_FOREGROUND, MODE_EDITOR, control_center)
+
+        # Get the map's state
+        root = universe.visible_maps[LAYER_FOREGROUND][map_name].save_state()
+
+        (seconds_old, xml_old) = time_serializer(lambda: compile_xml_string_recursive(root), repeat)
+        (seconds_new, xml_new) = time_serializer(lambda: root.compile_xml_string(), repeat)
+        (seconds_compact, xml_compact) = time_serializer(lambda: root.compile_xml_string(compact = True), repeat)
+
+        # Pretty output should be identical
+        if (xml_old != xml_new):
+
+            print "%s:  output mismatch" % map_name
+
+        print "%-32s %8d %9.3fs %9.3fs %9.3fs %7.1fx" % ( map_name, len(xml_new), seconds_old, seconds_new, seconds_compact, seconds_old / max(0.000001, seconds_new) )
+
+        total_old += seconds_old
+        total_new += seconds_new
+
+    print "%-32s %8s %9.3fs %9.3fs %10s %7.1fx" % ("total", "", total_old, total_new, "", total_old / max(0.000001, total_new))
+
+
+if (__name__ == "__main__"):
+
+    run(
+        sys.argv[1] if ( len(sys.argv) > 1 ) else "story1",
+        int(sys.argv[2]) if ( len(sys.argv) > 2 ) else 100,
+        int(sys.argv[3]) if ( len(sys.argv) > 3 ) else 25
+    )
@@ -452,6 +452,69 @@ COLLISION_BRIDGE = 7
 COLLISION_SPIKES_LEFT = 8
 COLLISION_SPIKES_RIGHT = 9
 
+
+# When checking a rect against the tile data, a plane reports everything the rect touches at once,
+# as a set of contact flags (see CollisionSweeper).
+CONTACT_SOLID = 0x1             # Can't move through it (diggable, undiggable, bridge, spikes)
+CONTACT_FALL = 0x2              # Stops a fall (solid tiles and ladders)
+CONTACT_LADDER = 0x4
+CONTACT_MONKEYBAR = 0x8
+CONTACT_DEADLY = 0x10
+CONTACT_SPIKES_LEFT = 0x20
+CONTACT_SPIKES_RIGHT = 0x40
+
+# Contact flags for each collision type
+CONTACT_FLAGS_BY_COLLISION_TYPE = {
+    COLLISION_NONE: 0,
+    COLLISION_DIGGABLE: CONTACT_SOLID | CONTACT_FALL,
+    COLLISION_UNDIGGABLE: CONTACT_SOLID | CONTACT_FALL,
+    COLLISION_LADDER: CONTACT_FALL | CONTACT_LADDER,
+    COLLISION_MONKEYBAR: CONTACT_MONKEYBAR,
+    COLLISION_DEADLY: CONTACT_DEADLY,
+    COLLISION_BRIDGE: CONTACT_SOLID | CONTACT_FALL,
+    COLLISION_SPIKES_LEFT: CONTACT_SOLID | CONTACT_FALL | CONTACT_SPIKES_LEFT,
+    COLLISION_SPIKES_RIGHT: CONTACT_SOLID | CONTACT_FALL | CONTACT_SPIKES_RIGHT
+}
+
+# A falling entity's trap exception tile (the trap it just climbed out of) counts as something to land on
+CONTACT_FLAGS_FOR_EXCEPTION = CONTACT_FALL | CONTACT_DEADLY
+
+
+# Each plane's navigation graph stores, for each tile, a set of flags for the moves
+# an entity could make from that tile (walk left / right, climb up, climb / drop / fall down).
+NAV_EDGE_LEFT = 0x1
+NAV_EDGE_RIGHT = 0x2
+NAV_EDGE_UP = 0x4
+NAV_EDGE_DOWN = 0x8
+
+# How many path query results will a navigation graph cache (until the graph changes)?
+NAV_PATH_CACHE_SIZE = 256
+
+# How many flow fields (distance fields toward a given tile, shared by every entity heading there) will a navigation graph cache?
+NAV_FLOW_FIELD_CACHE_SIZE = 8
+
+
+# Enemy AI level of detail.  Each frame, a plane sorts its enemies into buckets by distance (in pixels)
+# from the nearest player / the camera's view.  Enemies within the near distance take a turn every frame.
+AI_LOD_NEAR = 0
+AI_LOD_MID = 1
+AI_LOD_FAR = 2
+
+AI_LOD_NEAR_DISTANCE = 6 * 24  # 6 tiles
+AI_LOD_MID_DISTANCE = 16 * 24 # 16 tiles
+
+# How often (in frames) does an enemy in each bucket take a turn?
+AI_LOD_RATES = {
+    AI_LOD_NEAR: 1,
+    AI_LOD_MID: 2,
+    AI_LOD_FAR: 4
+}
+
+# An enemy banks the AI turns it skips (up to this many).  When it returns to the near bucket, it pays them back
+# a few at a time:  this many extra turns per frame, on top of its usual turn.
+AI_LOD_MAX_CATCH_UP_FRAMES = 8
+AI_LOD_CATCH_UP_TURNS_PER_FRAME = 1
+
 TILESHEET_COLLISION_VALUES = (
     (1, 3, 1, 1, 8, 9, 4, 1, 1, 1, 1, 2, 2, 2, 2, 2, 4, 6, 6, 6),
     (2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 3, 3, 3, 2, 2, 2),
@@ -567,6 +630,20 @@ NUMBERCLE_HEIGHT = 12
 
 NUMBERCLE_LIFESPAN = 120
 
+# A particle waits this many frames at full opacity, then fades by this much each frame
+PARTICLE_ALPHA_WAIT                = 30
+PARTICLE_FADE_SPEED                = 0.015
+
+# Particles that fall this far (in pixels) are gone for good
+PARTICLE_MAX_Y                     = 1000
+
+# How many particles / colorcles / numbercles can a map's particle systems hold at once?  When a
+# system fills up (e.g. during a big bomb chain), new particles replace the oldest ones, keeping
+# the per-frame cost under a fixed budget.
+PARTICLE_SYSTEM_CAPACITY           = 1024
+COLORCLE_SYSTEM_CAPACITY           = 512
+NUMBERCLE_SYSTEM_CAPACITY          = 128
+
 GOLD_SPINNER_LIFESPAN = 20
 WALLET_TICK_DELAY_MAX = 20 # 3 ticks per second, 60FPS (hard-coded)
 
@@ -603,6 +680,10 @@ TOOLTIP_DELAY = 60
 TOOLTIP_MIN_PADDING_X = 20
 TOOLTIP_MIN_PADDING_Y = 20
 
+# How many messages (dialogue lines, news items, tooltips, etc.) will the universe remember the tokenized form of,
+# for session variable / input translation?  We forget them all when we exceed this count.
+MESSAGE_TEMPLATE_CACHE_SIZE = 1024
+
 LAYER_FOREGROUND = 1
 LAYER_BACKGROUND = 2
 
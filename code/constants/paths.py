@@ -6,4 +6,10 @@ FONT_PATH = os.path.join("data", "fonts")
 CONFIG_PATH = "user"#os.path.join("test1", "config")
 
 UNIVERSES_PATH = "universes"
-REPLAYS_PATH = os.path.join("data", "replays")
\ No newline at end of file
+REPLAYS_PATH = os.path.join("data", "replays")
+
+# Parsed xml cache (optional; see the "xml cache" flag in user/flags.xml)
+XML_CACHE_PATH = os.path.join("tmp", "xml")
+
+# Parsed script cache (optional; see the "script cache" flag in user/flags.xml)
+SCRIPT_CACHE_PATH = os.path.join("tmp", "scripts")
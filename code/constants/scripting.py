@@ -13,3 +13,7 @@ CONDITION_MET_BUT_PENDING = 2
 CONDITION_NOT_MET = 3
 EXECUTE_RESULT_PENDING = 4
 EXECUTE_RESULT_DONE = 5
+
+# How many distinct evaluated values (e.g. "3", "'active'") do we remember the Python value of,
+# for compiled conditional expressions?  We forget them all when we exceed this count.
+CONDITION_LITERAL_CACHE_SIZE = 1024
@@ -830,7 +830,7 @@ class NetworkControllerSendFunctionsExt:
             m = universe.get_active_map()
 
             # Save map status so we can sync each client
-            xml = m.save_state().compile_xml_string()
+            xml = m.save_state().compile_xml_string(compact = True)
 
 
             # Send to each connected player
@@ -1336,7 +1336,7 @@ class NetworkControllerSendFunctionsExt:
             for e in m.master_plane.entities[GENUS_ENEMY]:
 
                 #xml += e.compile_memory_string_with_ai_state(m)
-                xml += e.save_ai_state(compress = True).compile_xml_string(pretty = False)
+                xml += e.save_ai_state(compress = True).compile_xml_string(compact = True)
 
             xml += "</enemies>"
 
@@ -2852,6 +2852,9 @@ class NetworkControllerRecvFunctionsExt:
                 entity.set_x(x)
                 entity.set_y(y)
 
+                # Update gold counts for the new position
+                m.master_plane.update_gold_in_cache(entity)
+
 
                 # Before sync-ing the status let's see if we're changing from active to inactive.
                 # If so, I'll call the mark_as_collected method real quick for the client, for the visual / audio effects.
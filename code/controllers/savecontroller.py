@@ -7,7 +7,7 @@ from datetime import datetime
 
 from stat import ST_MTIME
 
-from code.tools.xml import XMLParser, XMLNode
+from code.tools.xml import XMLParser, XMLNode, XMLReader
 
 from code.utils.common import ensure_path_exists, remove_folder, xml_encode, xml_decode, safe_round, logn
 
@@ -529,7 +529,7 @@ class SaveController:
 
         # Save game state to disk
         f = open(session_file_path, "w")
-        f.write( node.compile_xml_string() )
+        node.write_xml(f)
         f.close()
 
 
@@ -656,21 +656,13 @@ class SaveController:
 
         if (os.path.exists(metadata_path)):
 
-            f = open(metadata_path, "r")
-            metadata_xml = f.read()
-            f.close()
-
-            # Parse metadata XML
-            node = XMLParser().create_node_from_xml(metadata_xml)
+            # Read each metadata unit from the metadata node, without parsing the entire file
+            results = XMLReader().find_inner_text_by_tag( metadata_path, metadata.keys(), parent_tag = "metadata" )
 
             # Check each metadata unit...
-            for key in metadata:
-
-                ref_elem = node.get_first_node_by_tag("metadata").get_first_node_by_tag(key)
-
-                if (ref_elem):
+            for key in results:
 
-                    metadata[key] = ref_elem.innerText
+                metadata[key] = results[key]
 
 
         # We'll create a datetime.date object from a timestamp.
@@ -1,4 +1,4 @@
-from code.game.scripting.script import Script
+from code.game.scripting.script import script_cache
 
 from code.constants.common import ACHIEVEMENT_STATUS_ACTIVE, ACHIEVEMENT_STATUS_COMPLETE, ACHIEVEMENT_STATUS_FAILED
 
@@ -69,7 +69,7 @@ class Achievement:
 
                     # Hash by hook name.
                     # Note that this means a duplicate will completely overwrite its predecessor.
-                    self.hooks[ ref_name.innerText ] = Script( ref_script.innerText )
+                    self.hooks[ ref_name.innerText ] = script_cache.get_script( ref_script.innerText )
 
 
     # Get name
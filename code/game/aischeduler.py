@@ -0,0 +1,217 @@
+from code.constants.common import *
+from code.constants.network import NET_STATUS_OFFLINE
+
+# Decides how many AI turns (handle_ai calls) each of a plane's enemies takes on a given frame.  Every enemy
+# still runs its physics (process) once per frame; only the AI thinks less often.
+#
+# Each frame, we measure every enemy's distance to a set of "near" regions:  each player's rect, plus the
+# camera's view of the map.  Enemies close to a region take an AI turn every frame, exactly as they always
+# have.  Enemies further away take an AI turn every few frames (see AI_LOD_RATES), staggered by list position
+# so that they don't all wake on the same frame.
+#
+# A far enemy banks each AI turn it skips (up to AI_LOD_MAX_CATCH_UP_FRAMES).  When it comes back near a
+# player / into view, it pays those turns back gradually (AI_LOD_CATCH_UP_TURNS_PER_FRAME extra turns per frame),
+# so that it catches up without jumping across the screen in a single frame.
+#
+# Online, each client has its own camera and frame count, so clients would disagree about which enemies
+# take a turn.  We don't schedule at all during netplay:  every enemy takes one AI turn per frame, as before.
+class AIScheduler:
+
+    def __init__(self):
+
+        # Scheduling on?  When disabled, every enemy takes one AI turn per frame.
+        self.enabled = True
+
+        # Scheduling this frame?  (Only when enabled, and only offline.)
+        self.active = False
+
+        # Frame counter, for staggering far enemies' turns
+        self.frame = 0
+
+        # Current near regions (rects, in map coordinates)
+        self.regions = []
+
+        # AI turns owed to each enemy
+        self.debts = {}
+
+        # Debts we've carried into the next frame.  Swapping these in each frame drops
+        # any enemy that has left the plane.
+        self.next_debts = {}
+
+        # How many enemies landed in each bucket last frame, and how many AI turns they took in all (for profiling)
+        self.counts = dict( (bucket, 0) for bucket in AI_LOD_RATES )
+        self.turns = 0
+
+
+    # Enable / disable scheduling
+    def set_enabled(self, enabled):
+
+        self.enabled = enabled
+
+        # For chaining
+        return self
+
+
+    # Get the per-bucket enemy counts from the most recent frame
+    def get_bucket_counts(self):
+
+        return self.counts.copy()
+
+
+    # Get the total number of AI turns granted during the most recent frame
+    def get_turn_count(self):
+
+        return self.turns
+
+
+    # Get the near regions for a given plane this frame
+    def get_regions(self, plane, control_center, universe):
+
+        # Every player counts
+        regions = [ player.get_rect() for player in plane.entities[GENUS_PLAYER] ]
+
+        # Convenience
+        (m, camera) = (
+            universe.get_active_map(),
+            universe.get_camera()
+        )
+
+        # Validate
+        if (m):
+
+            # Translate the camera's view to map coordinates
+            regions.append(
+                ( camera.x - (m.x * TILE_WIDTH), camera.y - (m.y * TILE_HEIGHT), camera.get_width(), camera.get_height() )
+            )
+
+        # Return regions
+        return regions
+
+
+    # Start a new frame for a given plane
+    def prepare(self, plane, control_center, universe):
+
+        # Next frame
+        self.frame += 1
+
+        # We only schedule offline; online, every client must make the same decisions
+        self.active = ( (self.enabled) and ( control_center.get_network_controller().get_status() == NET_STATUS_OFFLINE ) )
+
+        # Find this frame's near regions
+        if (self.active):
+
+            self.regions = self.get_regions(plane, control_center, universe)
+
+        else:
+
+            self.regions = []
+
+        # Carry over debts from the previous frame
+        (self.debts, self.next_debts) = (self.next_debts, {})
+
+        # Reset profiling data
+        for bucket in self.counts:
+
+            self.counts[bucket] = 0
+
+        self.turns = 0
+
+        # For chaining
+        return self
+
+
+    # Calculate the distance (in pixels) between a given rect and the nearest near region
+    def get_distance(self, r):
+
+        # No region at all?  Then everything is far away.
+        distance = AI_LOD_MID_DISTANCE + 1
+
+        for (x, y, w, h) in self.regions:
+
+            # Gap on each axis (0 when overlapping)
+            (dx, dy) = (
+                max( 0, x - (r[0] + r[2]), r[0] - (x + w) ),
+                max( 0, y - (r[1] + r[3]), r[1] - (y + h) )
+            )
+
+            distance = min( distance, max(dx, dy) )
+
+        # Return distance
+        return distance
+
+
+    # Get the bucket a given entity falls into this frame
+    def get_bucket(self, entity):
+
+        # Not scheduling?
+        if (not self.active):
+
+            return AI_LOD_NEAR
+
+
+        # Distance to the nearest region
+        distance = self.get_distance( entity.get_rect() )
+
+        if (distance <= AI_LOD_NEAR_DISTANCE):
+
+            return AI_LOD_NEAR
+
+        elif (distance <= AI_LOD_MID_DISTANCE):
+
+            return AI_LOD_MID
+
+        else:
+
+            return AI_LOD_FAR
+
+
+    # Get the number of AI turns a given entity (at a given list position) should take this frame
+    def schedule(self, entity, index):
+
+        # Which bucket?
+        bucket = self.get_bucket(entity)
+
+        # Profiling
+        self.counts[bucket] += 1
+
+
+        # Not scheduling?  One turn, no debt.
+        if (not self.active):
+
+            turns = 1
+
+            # Profiling
+            self.turns += turns
+
+            return turns
+
+
+        # Include this frame in the enemy's debt
+        debt = min( AI_LOD_MAX_CATCH_UP_FRAMES, 1 + self.debts.get(entity, 0) )
+
+        # Near enemies take this frame's turn, plus a limited number of the turns they still owe
+        if (bucket == AI_LOD_NEAR):
+
+            turns = min( debt, 1 + AI_LOD_CATCH_UP_TURNS_PER_FRAME )
+
+        # Other enemies take a single turn when their (staggered) time comes
+        elif ( ( (self.frame + index) % AI_LOD_RATES[bucket] ) == 0 ):
+
+            turns = 1
+
+        # Otherwise, they wait
+        else:
+
+            turns = 0
+
+
+        # Carry whatever we still owe into the next frame
+        if (debt > turns):
+
+            self.next_debts[entity] = debt - turns
+
+        # Profiling
+        self.turns += turns
+
+        # Return turn count
+        return turns
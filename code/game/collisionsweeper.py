@@ -0,0 +1,125 @@
+from code.constants.common import *
+
+# Resolves a plane's rect collision checks against the tile lattice.
+#
+# A rect only ever touches the tiles at its four corners (entities are never wider / taller than a tile),
+# so everything a rect touches depends only on which tiles those corners land in.  We read those tiles once
+# and report every contact at the same time, as a set of flags (CONTACT_SOLID, CONTACT_FALL, CONTACT_LADDER, etc.),
+# rather than probing the same four tiles again for each question (solid?  ladder?  deadly?).
+#
+# We remember the contacts for each corner span (tx1, ty1, tx2, ty2) we look at.  An entity moving a few
+# pixels at a time keeps landing in the same span, so we only read tiles again when a move sweeps the rect
+# across a tile boundary.  We forget everything whenever the plane's collision grid changes.
+class CollisionSweeper:
+
+    def __init__(self):
+
+        # When disabled, we skip the cache and answer every question by probing the plane
+        # one collision type at a time, the old way.  (Used to check that both ways agree.)
+        self.enabled = True
+
+        # Contact flags, by corner span
+        self.contacts = {}
+
+
+    # Enable / disable sweeping
+    def set_enabled(self, enabled):
+
+        self.enabled = enabled
+
+        # Forget any cached contacts
+        return self.invalidate()
+
+
+    # Forget all cached contacts (e.g. after a tile changes)
+    def invalidate(self):
+
+        self.contacts = {}
+
+        # For chaining
+        return self
+
+
+    # Get the corner span (tx1, ty1, tx2, ty2) of a given rect
+    def get_span(self, r):
+
+        return (
+            int(r[0] / TILE_WIDTH),
+            int(r[1] / TILE_HEIGHT),
+            int( (r[0] + r[2] - 1) / TILE_WIDTH),
+            int( (r[1] + r[3] - 1) / TILE_HEIGHT)
+        )
+
+
+    # Read the contact flags for a given corner span from a given plane's tile data
+    def read_span(self, plane, span):
+
+        # Convenience
+        (tx1, ty1, tx2, ty2) = span
+
+        return (
+            CONTACT_FLAGS_BY_COLLISION_TYPE.get( plane.check_collision(tx1, ty1), 0 ) |
+            CONTACT_FLAGS_BY_COLLISION_TYPE.get( plane.check_collision(tx2, ty1), 0 ) |
+            CONTACT_FLAGS_BY_COLLISION_TYPE.get( plane.check_collision(tx1, ty2), 0 ) |
+            CONTACT_FLAGS_BY_COLLISION_TYPE.get( plane.check_collision(tx2, ty2), 0 )
+        )
+
+
+    # Probe a given plane for each contact type in turn (one rect check per collision type), the way we used to
+    def probe(self, plane, r, exception = None):
+
+        # Track flags
+        flags = 0
+
+        for flag in (CONTACT_SOLID, CONTACT_FALL, CONTACT_LADDER, CONTACT_MONKEYBAR, CONTACT_DEADLY, CONTACT_SPIKES_LEFT, CONTACT_SPIKES_RIGHT):
+
+            # Collision types with this flag
+            values = tuple( value for value in CONTACT_FLAGS_BY_COLLISION_TYPE if (CONTACT_FLAGS_BY_COLLISION_TYPE[value] & flag) )
+
+            # Only fall checks (solid ground / deadly ground) obey the exception tile
+            if ( plane.check_collision_value_exists_in_rect( r, values, exception if (flag & CONTACT_FLAGS_FOR_EXCEPTION) else None ) ):
+
+                flags |= flag
+
+        # Return flags
+        return flags
+
+
+    # Get the contact flags for a given rect on a given plane.  An optional exception tile (tx, ty)
+    # counts as ground to land on (see CONTACT_FLAGS_FOR_EXCEPTION) if one of the rect's corners lands in it.
+    def get_contacts(self, plane, r, exception = None):
+
+        # Disabled?
+        if (not self.enabled):
+
+            return self.probe(plane, r, exception)
+
+
+        # Make sure the collision grid is up to date (rebuilding it resets our cache)
+        if (plane.collision_grid_dirty):
+
+            plane.build_collision_grid()
+
+
+        # Which tiles do the corners land in?
+        span = self.get_span(r)
+
+        # New span?
+        if ( not (span in self.contacts) ):
+
+            self.contacts[span] = self.read_span(plane, span)
+
+        # Cached contacts
+        flags = self.contacts[span]
+
+
+        # Check exception tile
+        if (exception != None):
+
+            if ( exception in ( (span[0], span[1]), (span[2], span[1]), (span[0], span[3]), (span[2], span[3]) ) ):
+
+                flags |= CONTACT_FLAGS_FOR_EXCEPTION
+
+        # Return flags
+        return flags
+
@@ -1,5 +1,6 @@
 import traceback
 import sys
+import copy
 
 import math
 import random
@@ -10,7 +11,7 @@ from conversation import Conversation
 
 from code.controllers.intervalcontroller import IntervalController
 
-from code.game.particle import Particle, Colorcle, Numbercle
+from code.game.particle import Particle
 
 from code.utils.common import resize_image
 
@@ -36,6 +37,55 @@ from code.utils.common import log, log2, logn, intersect, intersect_lengths, off
 import pygame
 from pygame.locals import *
 
+
+# Slot names (from each class in the hierarchy) by class; see get_slot_names_for_class
+SLOT_NAMES_BY_CLASS = {}
+
+# Get the names of every slot a given (new-style) class and its bases declare, not counting __dict__ / __weakref__
+def get_slot_names_for_class(cls):
+
+    # Check the cache first
+    if ( not (cls in SLOT_NAMES_BY_CLASS) ):
+
+        SLOT_NAMES_BY_CLASS[cls] = [
+            name
+            for c in cls.__mro__
+            for name in c.__dict__.get( "__slots__", () )
+            if ( not ( name in ("__dict__", "__weakref__") ) )
+        ]
+
+    # Return names
+    return SLOT_NAMES_BY_CLASS[cls]
+
+
+# Deep-copy a slotted object (for a class's __deepcopy__).  Copying slot by slot is quite a bit
+# faster than the generic (pickle protocol) path copy.deepcopy otherwise takes for slotted objects.
+def deepcopy_slotted_object(o, memo):
+
+    # Create a blank object of the same class, without calling __init__
+    result = o.__class__.__new__(o.__class__)
+
+    # Remember the copy right away, in case an attribute refers back to the object
+    memo[ id(o) ] = result
+
+    # Copy each slot that has a value
+    for name in get_slot_names_for_class(o.__class__):
+
+        value = getattr(o, name, memo)
+
+        # (We use memo as a "no value" marker; no attribute can hold it.)
+        if (value is not memo):
+
+            setattr( result, name, copy.deepcopy(value, memo) )
+
+    # Copy any attributes that didn't fit a slot
+    if ( hasattr(o, "__dict__") and o.__dict__ ):
+
+        result.__dict__.update( copy.deepcopy(o.__dict__, memo) )
+
+    # Return copy
+    return result
+
 class EntityFrameDatum:
 
     def __init__(self, sequence, hflip = False, vflip = False):
@@ -73,12 +123,21 @@ class EntityFrameDatum:
         return self.hflip
 
 
-class EntityAIState:
+class EntityAIState(object):
+
+    # Every entity has its own AI state, so we store the state in fixed slots rather than a per-instance dict
+    __slots__ = (
+        "ai_behavior", "ai_flash_interval", "ai_freeze_resistance", "ai_fright_remaining", "ai_frozen",
+        "ai_frozen_for", "ai_is_carrying_gold", "ai_is_carrying_gold_by_name", "ai_is_trapped",
+        "ai_last_known_position", "ai_mood", "ai_mood_interval", "ai_path", "ai_path_goal", "ai_path_index",
+        "ai_path_origin", "ai_path_version", "ai_patience", "ai_respawn_interval", "ai_target", "ai_target_name",
+        "ai_territory", "ai_trap_exception", "ai_trap_exception_time", "ai_trap_time_remaining",
+        "attributes_by_index", "compressed_keys", "indices_by_attribute", "last_attempted_lateral_move",
+        "last_attempted_vertical_move", "last_lateral_move", "last_vertical_move"
+    )
 
     def __init__(self, node = None):
 
-        self._compressions_by_attribute_name = {}
-        self._attribute_names_by_compression = {}
         # Track whether or not we've compressed hash keys
         self.compressed_keys = False
 
@@ -146,10 +205,24 @@ class EntityAIState:
         # When the player goes invisible, an enemy will seek the player's last known position
         self.ai_last_known_position = None
 
+        # When following a path (from the map's navigation graph), remember the path, how far along it we are,
+        # the last tile we reached on it, where it leads, and which version of the navigation graph it came from.
+        self.ai_path = None
+        self.ai_path_index = 0
+        self.ai_path_origin = None
+        self.ai_path_goal = None
+        self.ai_path_version = None
+
         # Territorial entities will stick to a certain territory...
         self.ai_territory = None
 
 
+    # Deep-copy this AI state (along with its entity)
+    def __deepcopy__(self, memo):
+
+        return deepcopy_slotted_object(self, memo)
+
+
     # Helper function that gets attributes
     def save_state_get_attributes(self, compress):
 
@@ -361,7 +434,28 @@ class EntityAIState:
         self.ai_is_carrying_gold_by_name = "%s" % node.get_attribute("ai-is-carrying-gold-by-name")
 
 
-class Entity:
+class Entity(object):
+
+    # Maps can hold many entities (and MapPreview.clone deep-copies entire maps), so we store each attribute
+    # an Entity (or any Entity method) sets in a fixed slot rather than in a per-instance dict.
+    # Subclasses list any attributes of their own in __slots__ as well, or (like Player, NPC, etc.) don't
+    # declare __slots__ at all.  Anything else (e.g. an attribute a script sets) still lands in __dict__.
+    __slots__ = (
+        "ai_state", "alive", "base_speed", "can_move", "class_name", "climb_ceiling", "climb_droppable",
+        "climb_floor", "colliding_entity_types_during_gravity", "colliding_entity_types_during_movement",
+        "corpsed", "current_hotspot", "current_target_name", "damage_resistance", "default_speed", "dig_delay",
+        "direction", "editor_only", "food_chain_position", "footstep_interval", "frame", "frame_delay",
+        "frame_indices", "frame_interval", "genus", "has_shield", "height", "hotspots", "invincible",
+        "is_climbing", "is_disposable", "is_ghost", "is_swinging", "knows_how_to_hang", "last_known_target_name",
+        "lock_count", "locked", "move_delay", "moved_this_frame", "name", "network_input",
+        "network_latency_correction_rate", "network_latency_dx", "network_latency_dy", "nick", "particles",
+        "passcode", "patrol_delay", "pause_time", "position", "preferred_target_name", "previous_input",
+        "primary_color", "queued_death_by_cause", "queued_digs", "queued_gold_drop_location", "remote_bombs",
+        "requires_ai_update", "respawn_region_name", "scripted_target", "sfx_queue", "species", "speed",
+        "sprint_bonus", "status", "swing_end", "swing_start", "sync_status", "title", "warehouses", "width",
+        "working_texture", "x", "y",
+        "__dict__"
+    )
 
     def __init__(self):
 
@@ -560,6 +654,12 @@ class Entity:
         self.sfx_queue = []
 
 
+    # Deep-copy this entity (e.g. when cloning a map)
+    def __deepcopy__(self, memo):
+
+        return deepcopy_slotted_object(self, memo)
+
+
     def describe(self, options):
 
         if ( "x" in options ):
@@ -2011,7 +2111,7 @@ class Entity:
 
             if (self.knows_how_to_hang):
 
-                if ( m.master_plane.check_ladder_exists_in_rect( offset_rect(self.get_rect(), h = 1) ) ):
+                if ( m.master_plane.get_contacts_in_rect( offset_rect(self.get_rect(), h = 1) ) & CONTACT_LADDER ):
                     already_on_ladder = True
 
 
@@ -2032,6 +2132,9 @@ class Entity:
             # See we entities we may have landed on...
             entities = m.master_plane.query_interentity_collision_for_entity_against_entity_types( self.colliding_entity_types_during_gravity, self ).filter_out_entities(overlapping_entities).filter_out_by_excepting_entity_on_map(self, m, NOT_DETERMINED, Y_AXIS).get_results()
 
+            # Find everything we touch in the tile data (ground, deadly tiles) in one check
+            contacts = m.master_plane.get_contacts_in_rect( self.get_rect(), self.ai_state.ai_trap_exception )
+
             if ( len(entities) > 0 ):
 
                 self.y -= dy
@@ -2039,7 +2142,7 @@ class Entity:
 
                 return False
 
-            elif ( m.master_plane.check_fall_collision_in_rect(self.get_rect(), self.ai_state.ai_trap_exception) ):
+            elif (contacts & CONTACT_FALL):
 
                 if (already_on_ladder):
 
@@ -2053,7 +2156,7 @@ class Entity:
 
                 return False
 
-            elif ( m.master_plane.check_deadly_fall_collision_in_rect(self.get_rect(), self.ai_state.ai_trap_exception) ):
+            elif (contacts & CONTACT_DEADLY):
 
                 # In case they survive
                 self.y = int(self.get_y() / TILE_HEIGHT) * TILE_HEIGHT
@@ -3433,10 +3536,13 @@ class Entity:
                     self.ai_state.ai_patience = AI_MAX_PATIENCE
 
 
-                if ( m.master_plane.check_collision_in_rect( self.get_rect() ) ):
+                # Find everything we touch in the tile data (walls, spikes) in one check
+                contacts = m.master_plane.get_contacts_in_rect( self.get_rect() )
+
+                if (contacts & CONTACT_SOLID):
 
                     # If we hit a wall... did that wall have spikes?
-                    if ( m.master_plane.check_deadly_collision_in_rect_from_direction( self.get_rect(), DIR_RIGHT ) ):
+                    if (contacts & CONTACT_SPIKES_RIGHT):
 
                         # Go ahead and correct the x value...
                         self.x = int( (self.get_x() / TILE_WIDTH) + 1) * TILE_WIDTH
@@ -3543,10 +3649,13 @@ class Entity:
                     self.ai_state.ai_patience = AI_MAX_PATIENCE
 
 
-                if ( m.master_plane.check_collision_in_rect( self.get_rect() ) ):
+                # Find everything we touch in the tile data (walls, spikes) in one check
+                contacts = m.master_plane.get_contacts_in_rect( self.get_rect() )
+
+                if (contacts & CONTACT_SOLID):
 
                     # If we hit a wall... did that wall have spikes?
-                    if ( m.master_plane.check_deadly_collision_in_rect_from_direction( self.get_rect(), DIR_RIGHT ) ):
+                    if (contacts & CONTACT_SPIKES_RIGHT):
 
                         # Go ahead and correct the x value...
                         self.x = int(self.get_x() / TILE_WIDTH) * TILE_WIDTH
@@ -3795,6 +3904,179 @@ class Entity:
                 self.height -= squish_amount
 
 
+    # Seek some location (x, y) at the velocity of (vx, vy), following a path through the active map's navigation graph.
+    # We keep following the same path until we reach the target, the target moves to a different tile, we leave
+    # the path, or the navigation graph changes.  If we can't find a path, we fall back to seek_location.
+    def seek_location_by_path(self, x, y, vx, vy, universe):
+
+        # Fetch the active map
+        m = universe.get_active_map()
+
+        # Fetch the navigation graph
+        nav_graph = m.master_plane.get_nav_graph()
+
+        # Convenience
+        ai_state = self.ai_state
+
+
+        # Current tile, target tile
+        (tile, goal) = (
+            ( int(self.get_x() / TILE_WIDTH), int(self.get_y() / TILE_HEIGHT) ),
+            ( int(x / TILE_WIDTH), int(y / TILE_HEIGHT) )
+        )
+
+        # Are we still on our current path?  We should be at the last tile we reached, or on our way into the next one.
+        on_path = ( tile == ai_state.ai_path_origin )
+
+        if ( (ai_state.ai_path) and (ai_state.ai_path_index < len(ai_state.ai_path)) ):
+
+            on_path = ( on_path or ( tile == ai_state.ai_path[ai_state.ai_path_index] ) )
+
+
+        # Do we need a new path?
+        if ( (not on_path) or (ai_state.ai_path_goal != goal) or ( ai_state.ai_path_version != nav_graph.get_version() ) ):
+
+            # Find path (the graph caches results, so several entities heading the same way share the work)
+            ai_state.ai_path = nav_graph.find_path(tile, goal)
+
+            # Start from the beginning
+            (ai_state.ai_path_index, ai_state.ai_path_origin, ai_state.ai_path_goal, ai_state.ai_path_version) = (0, tile, goal, nav_graph.get_version())
+
+
+        # If there's no way to get there, we'll just do our best...
+        if (ai_state.ai_path == None):
+
+            return self.seek_location(x, y, vx, vy, universe)
+
+
+        # Move past each waypoint we've reached
+        while ( ( ai_state.ai_path_index < len(ai_state.ai_path) ) and ( (self.get_x(), self.get_y()) == ( ai_state.ai_path[ai_state.ai_path_index][0] * TILE_WIDTH, ai_state.ai_path[ai_state.ai_path_index][1] * TILE_HEIGHT ) ) ):
+
+            # Remember the last tile we reached
+            ai_state.ai_path_origin = ai_state.ai_path[ai_state.ai_path_index]
+
+            # Onward
+            ai_state.ai_path_index += 1
+
+
+        # Reached the target tile?  Then head for the exact location.
+        if ( ai_state.ai_path_index >= len(ai_state.ai_path) ):
+
+            return self.seek_waypoint(x, y, vx, vy, universe, lateral = True)
+
+        # Otherwise, head for the next waypoint
+        else:
+
+            # Next waypoint
+            (wx, wy) = ai_state.ai_path[ai_state.ai_path_index]
+
+            # Move toward it
+            return self.seek_waypoint(wx * TILE_WIDTH, wy * TILE_HEIGHT, vx, vy, universe, lateral = ( wy == ai_state.ai_path_origin[1] ))
+
+
+    # Seek some location (x, y) at the velocity of (vx, vy), following the active map's shared flow field toward that location.
+    # Every entity heading to the same tile shares the same flow field, so each entity only has to check its neighbors.
+    # If we can't reach the location, we fall back to seek_location.
+    def seek_location_by_flow_field(self, x, y, vx, vy, universe):
+
+        # Fetch the active map
+        m = universe.get_active_map()
+
+        # Fetch the navigation graph
+        nav_graph = m.master_plane.get_nav_graph()
+
+
+        # Current tile, target tile
+        (tile, goal) = (
+            ( int(self.get_x() / TILE_WIDTH), int(self.get_y() / TILE_HEIGHT) ),
+            ( int(x / TILE_WIDTH), int(y / TILE_HEIGHT) )
+        )
+
+        # Reached the target tile?  Then head for the exact location.
+        if (tile == goal):
+
+            return self.seek_waypoint(x, y, vx, vy, universe, lateral = True)
+
+
+        # Find the next tile on the way to the target
+        waypoint = nav_graph.get_next_tile_in_flow_field( nav_graph.get_flow_field(goal), tile[0], tile[1] )
+
+        # If there's no way to get there, we'll just do our best...
+        if (waypoint == None):
+
+            return self.seek_location(x, y, vx, vy, universe)
+
+        # Otherwise, move toward the next tile
+        else:
+
+            return self.seek_waypoint(waypoint[0] * TILE_WIDTH, waypoint[1] * TILE_HEIGHT, vx, vy, universe, lateral = ( waypoint[1] == tile[1] ))
+
+
+    # Move toward an adjacent waypoint (x, y) at the velocity of (vx, vy).  Before moving laterally, we'll line up
+    # with the waypoint's row; before moving vertically (i.e. climbing / dropping), we'll line up with its column.
+    def seek_waypoint(self, x, y, vx, vy, universe, lateral):
+
+        # Already there?
+        if ( (self.get_x() == x) and (self.get_y() == y) ):
+
+            # "Reached" location
+            return True
+
+        # Vertical movement?
+        elif ( (self.get_x() == x) or ( (lateral) and (self.get_y() != y) ) ):
+
+            # Perfect alignment
+            if (self.get_x() == x):
+                self.x = x
+
+
+            if (self.get_y() > y):
+
+                result = self.move(0, -vy, universe, determined = VERY_DETERMINED)
+
+                # Don't overshoot
+                if (self.y < y):
+                    self.y = y
+
+            else:
+
+                result = self.move(0, vy, universe, determined = VERY_DETERMINED)
+
+                # Don't overshoot
+                if (self.y > y):
+                    self.y = y
+
+            # Return move status
+            return result
+
+        # Lateral movement
+        else:
+
+            # Perfect alignment
+            if (self.get_y() == y):
+                self.y = y
+
+
+            if (self.get_x() > x):
+
+                result = self.move(-vx, 0, universe, determined = VERY_DETERMINED)
+
+                # Don't overshoot
+                if (self.x < x):
+                    self.x = x
+
+            else:
+
+                result = self.move(vx, 0, universe, determined = VERY_DETERMINED)
+
+                # Don't overshoot
+                if (self.x > x):
+                    self.x = x
+
+            # Return move status
+            return result
+
+
     # Seek some location (x, y) at the velocity of (vx, vy) on some map m
     def seek_location(self, x, y, vx, vy, universe, recursive = False):
 
@@ -4821,6 +5103,9 @@ class Entity:
             gold.x = (tx * TILE_WIDTH)
             gold.y = ( (ty) * TILE_HEIGHT)
 
+            # Update gold counts for the new position
+            universe.get_active_map().master_plane.update_gold_in_cache(gold)
+
             gold.queue_for_reactivation()
 
 
@@ -4973,9 +5258,7 @@ class ExplodingEntityExt:
 
         for i in range(0, 25):
 
-            m.colorcles.append(
-                Colorcle(cx + random.randint(-8, 8), cy + random.randint(-8, 8), (220, 110, 0, 0.75), (50, 50, 0))
-            )
+            m.colorcles.spawn(cx + random.randint(-8, 8), cy + random.randint(-8, 8), (220, 110, 0, 0.75), (50, 50, 0))
 
 
         # Dig all surrounding tiles...
@@ -5735,9 +6018,7 @@ class Player(Entity, GoldCollectorEntityExt, UITemplateLoaderExt):
             # Apply effect
             for i in range(0, 25):
 
-                m.numbercles.append(
-                    Numbercle(cx + random.randint(-8, 8), cy + random.randint(-8, 8), random.randint(0, 9))
-                )
+                m.numbercles.spawn(cx + random.randint(-8, 8), cy + random.randint(-8, 8), random.randint(0, 9))
 
 
             # Track timer, recharge, etc.
@@ -6108,9 +6389,7 @@ class Player(Entity, GoldCollectorEntityExt, UITemplateLoaderExt):
             # I use the last 2 numbercles (? and !) for the fright effect
             for i in range(0, 20):
 
-                m.numbercles.append(
-                    Numbercle(cx + random.randint(-8, 8), cy + random.randint(-8, 8), random.randint(10, 11))
-                )
+                m.numbercles.spawn(cx + random.randint(-8, 8), cy + random.randint(-8, 8), random.randint(10, 11))
 
 
             # Track timer, recharge, etc.
@@ -7721,6 +8000,11 @@ class PlayerRespawn(Entity):
 
 class Enemy(Entity, ExplodingEntityExt, GoldCollectorEntityExt):
 
+    # Attributes beyond Entity's (see Entity.__slots__)
+    __slots__ = (
+        "ox", "oy", "respawn_interval", "respawn_location"
+    )
+
     def __init__(self):
 
         Entity.__init__(self)
@@ -8330,37 +8614,28 @@ class Enemy(Entity, ExplodingEntityExt, GoldCollectorEntityExt):
 
                     if (self.ai_state.ai_respawn_interval <= 0):
 
-                        # Get all of the possible respawn locations from the master plane
-                        spawns = m.get_entities_by_type(GENUS_RESPAWN_ENEMY)
-
-                        valid_spawn_indices = []
-
-                        # Remove any respawn region that doesn't fall within our respawn region, if applicable...
+                        # Only use respawn locations within our respawn region, if applicable.  (The map caches these per region.)
                         if (self.respawn_region_name):
 
-                            for i in range(0, len(spawns)):
+                            spawns = m.get_enemy_respawns_in_region(self.respawn_region_name)
 
-                                if (intersect( m.get_trigger_by_name( self.respawn_region_name ).get_rect(is_editor = False), spawns[i].get_rect() )):
+                        # Only (a) true enemies and (b) NPCs with an explicitly defined respawn region are allowed to use enemy respawn regions
+                        elif (self.genus == GENUS_ENEMY):
 
-                                    valid_spawn_indices.append(i)
+                            # Get all of the possible respawn locations from the master plane
+                            spawns = m.get_entities_by_type(GENUS_RESPAWN_ENEMY)
 
                         else:
-                            valid_spawn_indices = range(0, len(spawns))
-
-
-                        # Only (a) true enemies and (b) NPCs with an explicitly defined respawn region are allowed to use enemy respawn regions
-                        if ( (self.genus != GENUS_ENEMY) and (not self.respawn_region_name) ):
-
-                            valid_spawn_indices = []
+                            spawns = []
 
 
                         # If some are available...
-                        if (len(valid_spawn_indices) > 0):
+                        if (len(spawns) > 0):
 
                             # ... pick one at random
-                            index = random.randint(0, len(valid_spawn_indices) - 1)
+                            index = random.randint(0, len(spawns) - 1)
 
-                            self.respawn_location = (spawns[ valid_spawn_indices[index] ].get_x(), spawns[ valid_spawn_indices[index] ].get_y())
+                            self.respawn_location = (spawns[index].get_x(), spawns[index].get_y())
 
                         # Otherwise, we have to go with our original location...
                         else:
@@ -8397,13 +8672,11 @@ class Enemy(Entity, ExplodingEntityExt, GoldCollectorEntityExt):
                 # Check for any entity intersection...
                 available = True
 
-                for genus in (GENUS_PLAYER, GENUS_ENEMY):
-
-                    for entity in m.master_plane.entities[genus]:
+                for entity in m.master_plane.query_entities_near_rect( (GENUS_PLAYER, GENUS_ENEMY), self.get_rect() ):
 
-                        # There will be no exceptions here.  Spawn or don't.
-                        if (self.intersects_entity(entity)):
-                            available = False
+                    # There will be no exceptions here.  Spawn or don't.
+                    if (self.intersects_entity(entity)):
+                        available = False
 
                 # If the respawn location is available, take it...
                 if (available):
@@ -8605,7 +8878,15 @@ class Enemy(Entity, ExplodingEntityExt, GoldCollectorEntityExt):
                 # Typically we seek a target...
                 if (self.ai_state.ai_fright_remaining <= 0 and (self.ai_state.ai_last_known_position != None) ):
 
-                    self.seek_location(self.ai_state.ai_last_known_position[0], self.ai_state.ai_last_known_position[1], vx = speed_x, vy = speed_y, universe = universe)
+                    # On challenge maps, every enemy chases the same player(s); they can share a flow field toward each player.
+                    if ( ( m.get_type() == "challenge" ) and ( m.get_wave_tracker().get_wave_param("enemies-share-flow-field") == 1 ) ):
+
+                        self.seek_location_by_flow_field(self.ai_state.ai_last_known_position[0], self.ai_state.ai_last_known_position[1], vx = speed_x, vy = speed_y, universe = universe)
+
+                    # Otherwise, each enemy finds its own path
+                    else:
+
+                        self.seek_location_by_path(self.ai_state.ai_last_known_position[0], self.ai_state.ai_last_known_position[1], vx = speed_x, vy = speed_y, universe = universe)
 
                 # Sometimes, though, the enemies get scared...
                 elif (self.ai_state.ai_last_known_position != None):
@@ -8698,7 +8979,7 @@ class Enemy(Entity, ExplodingEntityExt, GoldCollectorEntityExt):
                         speed = self.get_speed(universe)
 
                         # Seek the hotspot
-                        self.seek_location(x, y, vx = speed, vy = speed, universe = universe)
+                        self.seek_location_by_path(x, y, vx = speed, vy = speed, universe = universe)
 
 
                 # Upon reaching the location, proceed to the next hotspot
@@ -8769,7 +9050,7 @@ class Enemy(Entity, ExplodingEntityExt, GoldCollectorEntityExt):
 
                     speed = self.get_speed(universe)
 
-                    self.seek_location(x, y, vx = speed, vy = speed, universe = universe)
+                    self.seek_location_by_path(x, y, vx = speed, vy = speed, universe = universe)
 
 
                 # Upon reaching the location, proceed to the next hotspot
@@ -10145,6 +10426,11 @@ class IndicatorArrow(NPC):
 
 class Gold(Entity):
 
+    # Attributes beyond Entity's (see Entity.__slots__)
+    __slots__ = (
+        "carried", "collected", "queued_for_reactivation"
+    )
+
     def __init__(self):
 
         Entity.__init__(self)
@@ -10267,6 +10553,9 @@ class Gold(Entity):
         # and active map
         m = universe.get_active_map()
 
+        # Update gold counts
+        m.master_plane.update_gold_in_cache(self)
+
         # Create a "gold spinner" on the current map...
         m.create_gold_spinner( self.get_x(), self.get_y() )
 
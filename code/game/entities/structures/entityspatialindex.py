@@ -0,0 +1,229 @@
+from code.constants.common import TILE_WIDTH, TILE_HEIGHT
+
+# A tile-bucketed index of a plane's entities.  Each entity gets filed (by genus) into every
+# tile-sized cell its bounding box covers, so that rect queries only need to look at
+# the entities near the rect instead of every entity of a genus.
+#
+# The index only returns candidates; callers still run their exact intersection test
+# against each candidate's current position.  Entities can move a few pixels between
+# updates (e.g. one entity pushing another), so queries search one extra cell in each
+# direction to make up for it.
+class EntitySpatialIndex:
+
+    def __init__(self, cell_width = TILE_WIDTH, cell_height = TILE_HEIGHT):
+
+        # Cell dimensions (in pixels)
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+
+        # Cells by genus; each genus maps (cx, cy) to a list of entities
+        self.cells = {}
+
+        # Track the cells (genus, cx1, cy1, cx2, cy2) each entity currently occupies
+        self.entity_cells = {}
+
+        # Track each entity's position within its genus list.  We sort query results
+        # by this rank so that they come back in the same order as a plain loop would give.
+        self.entity_ranks = {}
+
+        # A signature of the entity lists we last indexed.  When a list changes
+        # (entity added / removed / replaced), the signature changes and we rebuild.
+        self.signature = None
+
+        # While tracking, the owner promises to update each entity as it moves.
+        # Otherwise, we can't trust the index, and we rebuild before each query.
+        self.tracking = False
+
+
+    # Enable / disable tracking
+    def set_tracking(self, tracking):
+
+        self.tracking = tracking
+
+        # For chaining
+        return self
+
+
+    # Force a rebuild before the next query (e.g. after reordering an entity list)
+    def invalidate(self):
+
+        self.signature = None
+
+        # For chaining
+        return self
+
+
+    # Calculate the signature of a given hash of entity lists
+    def get_signature(self, entities):
+
+        return tuple(
+            ( genus, id( entities[genus] ), len( entities[genus] ), id( entities[genus][-1] ) if ( len( entities[genus] ) > 0 ) else None )
+            for genus in entities
+        )
+
+
+    # Get the cell range (cx1, cy1, cx2, cy2) that a given rect covers, inclusive
+    def get_cell_range(self, r, margin = 0):
+
+        return (
+            int( r[0] // self.cell_width ) - margin,
+            int( r[1] // self.cell_height ) - margin,
+            int( ( r[0] + max(1, r[2]) - 1 ) // self.cell_width ) + margin,
+            int( ( r[1] + max(1, r[3]) - 1 ) // self.cell_height ) + margin
+        )
+
+
+    # Index every entity in a given hash of entity lists (by genus), from scratch
+    def rebuild(self, entities):
+
+        # Reset
+        self.cells = {}
+        self.entity_cells = {}
+        self.entity_ranks = {}
+
+        # Loop genus
+        for genus in entities:
+
+            # Fresh cell data
+            self.cells[genus] = {}
+
+            # Loop entities
+            for i in range( 0, len( entities[genus] ) ):
+
+                # Remember list position
+                self.entity_ranks[ entities[genus][i] ] = i
+
+                # Add to cells
+                self.add( genus, entities[genus][i] )
+
+        # Remember what we indexed
+        self.signature = self.get_signature(entities)
+
+        # For chaining
+        return self
+
+
+    # Rebuild the index if we can't trust it to answer a query against a given hash of entity lists
+    def validate(self, entities):
+
+        # Untracked, or have the entity lists changed?
+        if ( (not self.tracking) or ( self.get_signature(entities) != self.signature ) ):
+
+            # Rebuild
+            self.rebuild(entities)
+
+        # For chaining
+        return self
+
+
+    # File an entity into each cell its current rect covers
+    def add(self, genus, entity):
+
+        # Calculate cell range
+        (cx1, cy1, cx2, cy2) = self.get_cell_range( entity.get_rect() )
+
+        # Convenience
+        cells = self.cells[genus]
+
+        # Add to each cell
+        for cy in range(cy1, cy2 + 1):
+
+            for cx in range(cx1, cx2 + 1):
+
+                if ( (cx, cy) in cells ):
+
+                    cells[(cx, cy)].append(entity)
+
+                else:
+
+                    cells[(cx, cy)] = [entity]
+
+        # Remember where we filed it
+        self.entity_cells[entity] = (genus, cx1, cy1, cx2, cy2)
+
+
+    # Remove an entity from each cell we filed it into
+    def remove(self, entity):
+
+        # Validate
+        if (entity in self.entity_cells):
+
+            # Where did we file it?
+            (genus, cx1, cy1, cx2, cy2) = self.entity_cells.pop(entity)
+
+            # Convenience
+            cells = self.cells[genus]
+
+            # Remove from each cell
+            for cy in range(cy1, cy2 + 1):
+
+                for cx in range(cx1, cx2 + 1):
+
+                    cells[(cx, cy)].remove(entity)
+
+                    # Don't keep empty cells around
+                    if ( len( cells[(cx, cy)] ) == 0 ):
+
+                        del cells[(cx, cy)]
+
+
+    # Update a given entity's cells to match its current position
+    def update(self, entity):
+
+        # Ignore entities we haven't indexed; the next rebuild will pick them up
+        if (entity in self.entity_cells):
+
+            # Which genus?
+            genus = self.entity_cells[entity][0]
+
+            # Only refile the entity if it has moved into a different cell range
+            if ( self.get_cell_range( entity.get_rect() ) != self.entity_cells[entity][1:] ):
+
+                # Refile
+                self.remove(entity)
+                self.add(genus, entity)
+
+        # For chaining
+        return self
+
+
+    # Get a list of the entities (of the given genus types) that might intersect a given rect.
+    # Results come back ordered by genus (in the order given), then by position within each genus list.
+    def query(self, entity_types, r):
+
+        # Track results
+        results = []
+
+        # Calculate cell range, with margin
+        (cx1, cy1, cx2, cy2) = self.get_cell_range(r, margin = 1)
+
+        # Loop genus
+        for genus in entity_types:
+
+            # Validate
+            if (genus in self.cells):
+
+                # Convenience
+                cells = self.cells[genus]
+
+                # An entity can occupy several cells; only list it once
+                matches = {}
+
+                # Check each cell in range
+                for cy in range(cy1, cy2 + 1):
+
+                    for cx in range(cx1, cx2 + 1):
+
+                        if ( (cx, cy) in cells ):
+
+                            for entity in cells[(cx, cy)]:
+
+                                matches[entity] = self.entity_ranks[entity]
+
+                # Add matches in list order
+                results.extend(
+                    sorted( matches, key = lambda entity: matches[entity] )
+                )
+
+        # Return candidates
+        return results
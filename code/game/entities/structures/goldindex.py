@@ -0,0 +1,260 @@
+from code.utils.common import intersect
+
+from code.constants.common import TILE_WIDTH, TILE_HEIGHT
+
+# Tracks a plane's gold.  We keep two things here:
+#
+#   - A sparse tile cache:  for each tile that holds gold, the names of the gold pieces there.
+#     Gold collectors check it to find nearby gold.  Pieces leave the cache when someone collects / carries
+#     them off, and return when they reactivate.  (A full rebuild puts every piece back.)
+#
+#   - Gold counts:  how many pieces exist, and how many have been collected, for the whole plane and
+#     for each region (e.g. a trigger's rect) anyone has asked about.  We update the counts whenever
+#     a piece changes (see update), so that count queries never need to loop through the gold.
+#
+# If the gold list itself changes (gold added / removed), we notice it (see validate) and recount everything.
+class GoldIndex:
+
+    def __init__(self):
+
+        # Plane dimensions (in tiles); the tile cache ignores gold outside of the plane
+        self.width = 0
+        self.height = 0
+
+        # Gold names by tile (tx, ty)
+        self.cells = {}
+
+        # The state (collected, rect) we last counted for each piece of gold
+        self.states = {}
+
+        # How many pieces have been collected?
+        self.collected_count = 0
+
+        # Counts (total, collected) by region (x, y, w, h)
+        self.regions = {}
+
+        # A signature of the gold list we last counted.  When it changes, we recount.
+        self.signature = None
+
+
+    # Calculate the signature of a given gold list
+    def get_signature(self, gold_collection):
+
+        return ( id(gold_collection), len(gold_collection), id( gold_collection[-1] ) if ( len(gold_collection) > 0 ) else None )
+
+
+    # Get the state we track for a given piece of gold
+    def get_state(self, gold):
+
+        return ( gold.collected, tuple( gold.get_rect() ) )
+
+
+    # Get the tiles (tx, ty) at the corners of a given rect
+    def get_corner_tiles(self, r):
+
+        tx1 = int(r[0] / TILE_WIDTH)
+        ty1 = int(r[1] / TILE_HEIGHT)
+
+        tx2 = int( (r[0] + r[2] - 1) / TILE_WIDTH)
+        ty2 = int( (r[1] + r[3] - 1) / TILE_HEIGHT)
+
+        return (
+            (tx1, ty1),
+            (tx2, ty1),
+            (tx1, ty2),
+            (tx2, ty2)
+        )
+
+
+    # Rebuild the tile cache and all counts from a given gold list, for a plane of the given dimensions (in tiles)
+    def build(self, gold_collection, width, height):
+
+        # Remember plane size
+        (self.width, self.height) = (width, height)
+
+        # Fresh tile cache
+        self.cells = {}
+
+        for gold in gold_collection:
+
+            self.add(gold)
+
+        # Recount
+        self.recount(gold_collection)
+
+        # For chaining
+        return self
+
+
+    # Count the given gold list from scratch, including each region we've counted before
+    def recount(self, gold_collection):
+
+        # Reset
+        self.states = {}
+        self.collected_count = 0
+
+        for region in self.regions:
+
+            self.regions[region] = [0, 0]
+
+
+        for gold in gold_collection:
+
+            # Remember state
+            (collected, r) = self.states[gold] = self.get_state(gold)
+
+            if (collected):
+
+                self.collected_count += 1
+
+            # Count toward each region the gold lies within
+            for region in self.regions:
+
+                if ( intersect(region, r) ):
+
+                    self.regions[region][0] += 1
+
+                    if (collected):
+
+                        self.regions[region][1] += 1
+
+        # Remember what we counted
+        self.signature = self.get_signature(gold_collection)
+
+        # For chaining
+        return self
+
+
+    # Recount if a given gold list has changed since we last counted it
+    def validate(self, gold_collection):
+
+        if ( self.get_signature(gold_collection) != self.signature ):
+
+            self.recount(gold_collection)
+
+        # For chaining
+        return self
+
+
+    # Update the counts for a given piece of gold, after it has moved or changed collection status
+    def update(self, gold):
+
+        # Ignore gold we haven't counted; the next recount will pick it up
+        if (gold in self.states):
+
+            # Compare before / after
+            (old_collected, old_r) = self.states[gold]
+            (collected, r) = self.states[gold] = self.get_state(gold)
+
+            # Plane total
+            self.collected_count += ( int(collected) - int(old_collected) )
+
+            # Region totals
+            for region in self.regions:
+
+                (was_inside, inside) = (
+                    intersect(region, old_r),
+                    intersect(region, r)
+                )
+
+                # Take it out of the old counts...
+                if (was_inside):
+
+                    self.regions[region][0] -= 1
+
+                    if (old_collected):
+
+                        self.regions[region][1] -= 1
+
+                # ... and put it into the new ones
+                if (inside):
+
+                    self.regions[region][0] += 1
+
+                    if (collected):
+
+                        self.regions[region][1] += 1
+
+        # For chaining
+        return self
+
+
+    # Get (total, collected) gold counts, optionally limited to the gold within a given region
+    def get_counts(self, region = None):
+
+        # Limit by region?
+        if (region):
+
+            # Convenience
+            key = tuple(region)
+
+            # The first time we see a region, we count it
+            if ( not (key in self.regions) ):
+
+                self.regions[key] = [
+                    sum( 1 for (collected, r) in self.states.values() if ( intersect(key, r) ) ),
+                    sum( 1 for (collected, r) in self.states.values() if ( collected and intersect(key, r) ) )
+                ]
+
+            return tuple( self.regions[key] )
+
+        # Nope; count them all...
+        else:
+
+            return ( len(self.states), self.collected_count )
+
+
+    # Add a given piece of gold to the tile cache, at its current location
+    def add(self, gold):
+
+        (tx, ty) = (
+            int( gold.get_x() / TILE_WIDTH ),
+            int( gold.get_y() / TILE_HEIGHT )
+        )
+
+        if ( (tx >= 0 and tx < self.width) and (ty >= 0 and ty < self.height) ):
+
+            if ( (tx, ty) in self.cells ):
+
+                self.cells[(tx, ty)].append(gold.name)
+
+            else:
+
+                self.cells[(tx, ty)] = [gold.name]
+
+        # For chaining
+        return self
+
+
+    # Get the names of the gold cached at the corner tiles of a given rect
+    def get_names_in_rect(self, r):
+
+        results = []
+
+        for (tx, ty) in self.get_corner_tiles(r):
+
+            if ( (tx, ty) in self.cells ):
+
+                results.extend( self.cells[(tx, ty)] )
+
+        return results
+
+
+    # Remove a given gold name from the tile cache, checking the corner tiles of a given rect
+    def remove_name_from_rect(self, r, name):
+
+        for (tx, ty) in self.get_corner_tiles(r):
+
+            if ( (tx, ty) in self.cells ):
+
+                if ( name in self.cells[(tx, ty)] ):
+
+                    self.cells[(tx, ty)].remove(name)
+
+                    # Don't keep empty cells around
+                    if ( len( self.cells[(tx, ty)] ) == 0 ):
+
+                        del self.cells[(tx, ty)]
+
+        # For chaining
+        return self
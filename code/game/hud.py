@@ -76,16 +76,16 @@ class HUD:
     # Get a hash with information about how to render the XP bar and any HUD notes.
     def get_xp_bar_data(self, universe, session):
 
-        xp_display_interval = int( universe.get_session_variable("core.xp-bar.timer").get_value() )
+        xp_display_interval = universe.get_session_variable("core.xp-bar.timer").get_int()
 
         # Anything worth showing?
         if (xp_display_interval > 0):
 
             (xp_percent_old, xp_percent_new, xp_display_interval, xp_display_interval_max) = (
-                float( universe.get_session_variable("core.xp-bar.percent-old").get_value() ),
-                float( universe.get_session_variable("core.xp-bar.percent-new").get_value() ),
-                int( universe.get_session_variable("core.xp-bar.timer").get_value() ),
-                int( universe.get_session_variable("core.xp-bar.timer-max").get_value() )
+                universe.get_session_variable("core.xp-bar.percent-old").get_float(),
+                universe.get_session_variable("core.xp-bar.percent-new").get_float(),
+                universe.get_session_variable("core.xp-bar.timer").get_int(),
+                universe.get_session_variable("core.xp-bar.timer-max").get_int()
             )
 
             # Difference between old and new percentages
@@ -142,7 +142,7 @@ class HUD:
         else:
 
             # Use wherever we left off after last XP gain...
-            xp_current_percent = float( universe.get_session_variable("core.xp-bar.percent-new").get_value() )
+            xp_current_percent = universe.get_session_variable("core.xp-bar.percent-new").get_float()
 
             return {
                 "active": False,
@@ -342,12 +342,12 @@ class HUD:
                     alpha_penalty = 0
 
                     # Is the skill needing to recharge?
-                    recharge_remaining = int( universe.get_session_variable("core.skills.%s:recharge-remaining" % skill).get_value() )
+                    recharge_remaining = universe.get_session_variable("core.skills.%s:recharge-remaining" % skill).get_int()
 
                     if (recharge_remaining >= 0):
 
                         # Do we have any time left on the duration of this skill?
-                        time_remaining = int( universe.get_session_variable("core.skills.%s:timer" % skill).get_value() )
+                        time_remaining = universe.get_session_variable("core.skills.%s:timer" % skill).get_int()
 
                         # If the timer on the skill is still executing, then display a gold clock radial that counts "down"...
                         if (time_remaining > 0):
@@ -356,7 +356,7 @@ class HUD:
                             clock_color = (219, 183, 21, 1.0)
 
                             # Divisor
-                            time_potential = float( universe.get_session_variable("core.skills.%s:timer-max" % skill).get_value() )
+                            time_potential = universe.get_session_variable("core.skills.%s:timer-max" % skill).get_float()
 
                             log( skill )
 
@@ -370,7 +370,7 @@ class HUD:
                             clock_color = (155, 21, 21, 1.0)
 
                             # Divisor
-                            recharge_potential = float( universe.get_session_variable("core.skills.%s:recharge-potential" % skill).get_value() )
+                            recharge_potential = universe.get_session_variable("core.skills.%s:recharge-potential" % skill).get_float()
 
                             # Calculate clock angle
                             clock_angle = 360 - (int( (recharge_remaining / recharge_potential) * 360 ))
@@ -439,8 +439,8 @@ class HUD:
 
         # Get wallet data
         (wallet_actual, wallet_visible) = (
-            int( universe.get_session_variable("core.gold.wallet").get_value() ),
-            int( universe.get_session_variable("core.gold.wallet:visible").get_value() )
+            universe.get_session_variable("core.gold.wallet").get_int(),
+            universe.get_session_variable("core.gold.wallet:visible").get_int()
         )
 
         # If the visible counter is lagging behind the real value, let's consider incrementing it
@@ -661,8 +661,8 @@ class HUDIcon:
         if (text_align == DIR_LEFT):
 
             (recharge_remaining, recharge_potential) = (
-                int( universe.get_session_variable("core.skills.%s:recharge-remaining" % self.name).get_value() ),
-                int( universe.get_session_variable("core.skills.%s:recharge-potential" % self.name).get_value() )
+                universe.get_session_variable("core.skills.%s:recharge-remaining" % self.name).get_int(),
+                universe.get_session_variable("core.skills.%s:recharge-potential" % self.name).get_int()
             )
 
             (rx, ry) = (x - window_controller.get_default_text_controller().get_text_renderer().size(self.title) - text_padding, y)
@@ -697,8 +697,8 @@ class HUDIcon:
         elif (text_align == DIR_RIGHT):
 
             (recharge_remaining, recharge_potential) = (
-                int( universe.get_session_variable("core.skills.%s:recharge-remaining" % self.name).get_value() ),
-                int( universe.get_session_variable("core.skills.%s:recharge-potential" % self.name).get_value() )
+                universe.get_session_variable("core.skills.%s:recharge-remaining" % self.name).get_int(),
+                universe.get_session_variable("core.skills.%s:recharge-potential" % self.name).get_int()
             )
 
             (rx, ry) = (x + SKILL_ICON_WIDTH + text_padding, y)
@@ -8,7 +8,7 @@ import random
 from entities.entities import *
 #import from entities.entities 
 
-from particle import Particle, Colorcle, Numbercle
+from particle import ParticleSystem, ColorcleSystem, NumbercleSystem
 from goldspinner import GoldSpinner
 
 from magicwall import MagicWall
@@ -22,10 +22,15 @@ from code.controllers.eventcontroller import EventController
 from code.tools.datagrid import DataGrid
 from code.tools.xml import XMLParser, XMLNode
 
-from code.game.trap import Trap
+from code.game.trap import Trap, TrapTable
+from code.game.navgraph import NavigationGraph
+from code.game.collisionsweeper import CollisionSweeper
+from code.game.aischeduler import AIScheduler
 from code.game.entities.structures.intersectionqueryresults import IntersectionQueryResults
+from code.game.entities.structures.entityspatialindex import EntitySpatialIndex
+from code.game.entities.structures.goldindex import GoldIndex
 
-from code.game.scripting.script import Script
+from code.game.scripting.script import script_cache
 
 from code.utils.common import log, log2, logn, intersect, offset_rect, wrap_degrees, wrap_index_at_position, ensure_path_exists, f2i, cf, set_alpha_for_glcolor, coalesce, is_numeric
 
@@ -157,11 +162,20 @@ class Map:
         # Trigger can activate scripts
         self.triggers = []
 
+        # Triggers by name, built as needed (see get_trigger_by_name), and a signature
+        # of the trigger list we last built it from.
+        self.triggers_by_name = {}
+        self.triggers_by_name_signature = None
 
-        # Simple particle system
-        self.particles = []
-        self.colorcles = []
-        self.numbercles = []
+        # Enemy respawn points by respawn region (trigger) name.  Each entry holds
+        # (signature, respawn points); see get_enemy_respawns_in_region.
+        self.enemy_respawns_by_region = {}
+
+
+        # Simple particle systems
+        self.particles = ParticleSystem()
+        self.colorcles = ColorcleSystem()
+        self.numbercles = NumbercleSystem()
 
         # Gold spins to the top of the somewhere when collected
         self.gold_spinners = []
@@ -1318,8 +1332,8 @@ class Map:
             # Do we need to compile this script?
             if ( not (name in self.compiled_scripts) ):
 
-                # Compile on-the-fly
-                self.compiled_scripts[name] = Script( self.scripts[name] )
+                # Compile on-the-fly (parsing only scripts we've never seen before)
+                self.compiled_scripts[name] = script_cache.get_script( self.scripts[name] )
 
 
             # Load the compiled script
@@ -1346,8 +1360,8 @@ class Map:
             # Do we need to compile this script?
             if ( not (name in self.compiled_scripts) ):
 
-                # Compile on-the-fly
-                self.compiled_scripts[name] = Script( self.scripts[name] )
+                # Compile on-the-fly (parsing only scripts we've never seen before)
+                self.compiled_scripts[name] = script_cache.get_script( self.scripts[name] )
 
 
             # Create a new, temporary event controller
@@ -1371,10 +1385,10 @@ class Map:
             return False
 
 
-    # Get active particles
+    # Get the particle system (e.g. to adjust the particles a dig just created)
     def get_particles(self):
 
-        # Return all
+        # Return system
         return self.particles
 
 
@@ -1519,6 +1533,9 @@ class Map:
                 # Hide it
                 gold.collected = True
 
+                # Update gold counts
+                self.master_plane.update_gold_in_cache(gold)
+
 
             # Now, prepare to choose N at random to be active...
             eligible = []
@@ -1597,72 +1614,24 @@ class Map:
     # How many uncollected gold bars remain?
     def remaining_gold_count(self, region = None):
 
-        count = 0
-
-        gold_collection = self.get_entities_by_type(GENUS_GOLD)
-
-        for gold in gold_collection:
-
-            if (not gold.collected):
-
-                # Limit by region?
-                if (region):
-
-                    if ( intersect(region, gold.get_rect()) ):
-
-                        count += 1
+        (total, collected) = self.master_plane.get_gold_index().get_counts(region)
 
-                # Nope; count them all...
-                else:
-                    count += 1
-
-        return count
+        return (total - collected)
 
     # How many gold bars have been collected?
     def collected_gold_count(self, region = None):
 
-        count = 0
-
-        gold_collection = self.get_entities_by_type(GENUS_GOLD)
-
-        for gold in gold_collection:
-
-            if (gold.collected):
-
-                # Limit by region?
-                if (region):
-
-                    if ( intersect(region, gold.get_rect()) ):
+        (total, collected) = self.master_plane.get_gold_index().get_counts(region)
 
-                        count += 1
-
-                # Nope; count them all...
-                else:
-                    count += 1
-
-        return count
+        return collected
 
     # Total gold originally available in level...
     def get_gold_count(self, region = None):
 
-        if (region):
+        # Irregardless of collection status, fetch original amount...
+        (total, collected) = self.master_plane.get_gold_index().get_counts(region)
 
-            count = 0
-
-            gold_collection = self.get_entities_by_type(GENUS_GOLD)
-
-            for gold in gold_collection:
-
-                if ( intersect(region, gold.get_rect()) ):
-
-                    count += 1
-
-            return count
-
-        else:
-
-            # Irregardless of collection status, fetch original amount...
-            return ( len(self.master_plane.entities[GENUS_GOLD]) )
+        return total
 
 
     # Advance to the next challenge wave, tracking the wave number as a map param
@@ -1873,16 +1842,98 @@ class Map:
         return self.triggers
 
 
+    # Forget the trigger name lookup and the respawn points we've found for each respawn region.
+    # The level editor calls this whenever it adds, renames, moves, or removes triggers / entities.
+    def invalidate_trigger_cache(self):
+
+        self.triggers_by_name = {}
+        self.triggers_by_name_signature = None
+
+        self.enemy_respawns_by_region = {}
+
+        # For chaining
+        return self
+
+
+    # Rebuild the trigger name lookup
+    def build_trigger_cache(self):
+
+        self.triggers_by_name = {}
+
+        for t in self.triggers:
+
+            # When two triggers share a name, the first one wins
+            if ( not (t.name in self.triggers_by_name) ):
+
+                self.triggers_by_name[t.name] = t
+
+        # Remember which trigger list we built from
+        self.triggers_by_name_signature = ( id(self.triggers), len(self.triggers) )
+
+        # For chaining
+        return self
+
+
     # Get a trigger by a given name
     def get_trigger_by_name(self, name):
 
-        for t in self.triggers:
+        # Rebuild the lookup if triggers have come or gone
+        if ( ( id(self.triggers), len(self.triggers) ) != self.triggers_by_name_signature ):
 
-            if (t.name == name):
-                return t
+            self.build_trigger_cache()
 
-        # We couldn't find that trigger...
-        return None
+        # Check lookup
+        t = self.triggers_by_name.get(name)
+
+        # Only trust a trigger that still has the name we filed it under
+        if ( (t != None) and (t.name == name) ):
+
+            return t
+
+        # A trigger might have changed its name since we built the lookup; rebuild and try once more.
+        # (If we still can't find it, we return None.)
+        else:
+
+            return self.build_trigger_cache().triggers_by_name.get(name)
+
+
+    # Get the enemy respawn points that lie within a given respawn region (by trigger name), in map order
+    def get_enemy_respawns_in_region(self, name):
+
+        # Find the region
+        trigger = self.get_trigger_by_name(name)
+
+        # Validate
+        if (trigger == None):
+
+            return []
+
+
+        # All enemy respawn points
+        spawns = self.get_entities_by_type(GENUS_RESPAWN_ENEMY)
+
+        # If the region or the respawn list changes, we'll have to look again
+        signature = (
+            id(trigger),
+            tuple( trigger.get_rect(is_editor = False) ),
+            id(spawns),
+            len(spawns),
+            id( spawns[-1] ) if ( len(spawns) > 0 ) else None
+        )
+
+        # Look for respawn points within the region, if we haven't already
+        if ( (not (name in self.enemy_respawns_by_region)) or (self.enemy_respawns_by_region[name][0] != signature) ):
+
+            # Convenience
+            r = trigger.get_rect(is_editor = False)
+
+            self.enemy_respawns_by_region[name] = (
+                signature,
+                [ spawn for spawn in spawns if ( intersect( r, spawn.get_rect() ) ) ]
+            )
+
+        # Return cached respawn points
+        return self.enemy_respawns_by_region[name][1]
 
 
     # Delete a trigger by a given name
@@ -1898,6 +1949,9 @@ class Map:
             else:
                 i += 1
 
+        # Forget cached lookups
+        self.invalidate_trigger_cache()
+
 
     def send_message_to_trigger(self, trigger, entity_name, message, param, universe):#, p_map, session):
 
@@ -2053,17 +2107,14 @@ class Map:
         # Track results
         results = []
 
-        # Loop genus
-        for genus in self.master_plane.entities:
-
-            # Loop entities
-            for entity in self.master_plane.entities[genus]:
+        # Loop nearby entities of any genus
+        for entity in self.master_plane.query_entities_near_rect( self.master_plane.entities.keys(), (tx * TILE_WIDTH, ty * TILE_HEIGHT, 1, 1) ):
 
-                # Only exact matches, for now, which is fine for the level editor...
-                if ( (entity.x == (tx * TILE_WIDTH)) and (entity.y == (ty * TILE_HEIGHT)) ):
+            # Only exact matches, for now, which is fine for the level editor...
+            if ( (entity.x == (tx * TILE_WIDTH)) and (entity.y == (ty * TILE_HEIGHT)) ):
 
-                    # Add match
-                    results.append(entity)
+                # Add match
+                results.append(entity)
 
         # Return rsults
         return results
@@ -2284,31 +2335,15 @@ class Map:
                 lx = plane.x + plane.shift_x
                 ly = plane.y + plane.shift_y
 
-                # Loop all tiles in the current plane
-                for y in range( 0, plane.tiles.get_height() ):
-                    for x in range( 0, plane.tiles.get_width() ):
-
-                        # Get coordinates on master plane
-                        (tx, ty) = (
-                            (lx + x),
-                            (ly + y)
-                        )
-
-                        # Don't overwrite a lower plane's tile data unless this plane
-                        # has a tile in that position as well.
-                        if (
-                            ( master_plane.tiles.read(tx, ty) == 0 ) or
-                            ( plane.tiles.read(x, y) > 0 )
-                        ):
-
-                            master_plane.tiles.write( tx, ty, plane.tiles.read(x, y) )
-                            master_plane.tiles_backup.write( tx, ty, plane.tiles.read(x, y) )
+                # Copy the plane's tiles onto the master plane.  Don't overwrite a lower plane's
+                # tile data unless this plane has a tile in that position as well.
+                master_plane.tiles.blit(plane.tiles, lx, ly, transparent_value = 0)
 
-        # Write an empty Trap object for each tile on the master plane
-        for y in range( 0, master_plane.get_height() ):
-            for x in range( 0, master_plane.get_width() ):
+        # The backup tile data begins as a copy of the master tile data
+        master_plane.tiles_backup = master_plane.tiles.copy()
 
-                master_plane.traps.write( x, y, Trap() )
+        # Every tile on the master plane begins with an empty (default) trap
+        master_plane.traps.resize( master_plane.get_width(), master_plane.get_height() )
 
 
         # The master plane does not do any sliding on its own, but we need to set
@@ -2335,7 +2370,7 @@ class Map:
         bounds_plane = self.create_plane()
 
         # Pad by 2 tiles on each side (thus, +4 width, +4 height)
-        bounds_plane.tiles = DataGrid( self.master_plane.tiles.get_width() + (2 * COLLISION_BOUNDARY_SIZE), self.master_plane.tiles.get_height() + (2 * COLLISION_BOUNDARY_SIZE) )
+        bounds_plane.tiles.resize( self.master_plane.tiles.get_width() + (2 * COLLISION_BOUNDARY_SIZE), self.master_plane.tiles.get_height() + (2 * COLLISION_BOUNDARY_SIZE) )
 
         """
         for y in range( 0, self.master_plane.tiles.get_height() ):
@@ -2510,7 +2545,7 @@ class Map:
         """
 
 
-        self.master_plane.bounding_plane = bounds_plane
+        self.master_plane.set_bounding_plane(bounds_plane)
 
 
 
@@ -2800,7 +2835,7 @@ class Map:
         for j in range(0, 3):
             for i in range(0, 3):
 
-                self.particles.append( Particle(x, y, tile_index, i, j) )
+                self.particles.spawn(x, y, tile_index, i, j)
 
 
     def create_gold_spinner(self, x, y):
@@ -3147,14 +3182,10 @@ class Map:
                     self.event_controller.loop(control_center, universe)
 
 
-                    for particle in self.particles:
-                        particle.process(None)
-
-                    for colorcle in self.colorcles:
-                        colorcle.process(None)
-
-                    for numbercle in self.numbercles:
-                        numbercle.process(None)
+                    # Particle systems free dead particles as they go
+                    self.particles.process()
+                    self.colorcles.process()
+                    self.numbercles.process()
 
                     for gold_spinner in self.gold_spinners:
                         gold_spinner.process(None)
@@ -3211,41 +3242,7 @@ class Map:
 
             self.master_plane.post_process(control_center, universe)#network_controller, universe, self, session)
 
-            # Remove lost particles
-            i = 0
-
-            while (i < len(self.particles)):
-
-                if (self.particles[i].state == False):
-                    self.particles.pop(i)
-
-                else:
-                    i += 1
-
-
-            # Remove lost colorcles
-            i = 0
-
-            while (i < len(self.colorcles)):
-
-                if (self.colorcles[i].state == False):
-                    self.colorcles.pop(i)
-
-                else:
-                    i += 1
-
-
-            # Remove lost numbercles
-            i = 0
-
-            while (i < len(self.numbercles)):
-
-                if (self.numbercles[i].state == False):
-                    self.numbercles.pop(i)
-
-                else:
-                    i += 1
-
+            # (Particle systems free lost particles while processing.)
 
             # Remove lost gold spinners
             i = 0
@@ -3346,46 +3343,10 @@ class Map:
     # Sometimes a map the player just left has some leftover particles...
     def process_particles_only(self):
 
-        for particle in self.particles:
-            particle.process(None)
-
-        # Check to remove them as needed...
-        i = 0
-
-        while (i < len(self.particles)):
-            if (self.particles[i].state == False):
-                self.particles.pop(i)
-
-            else:
-                i += 1
-
-
-        for colorcle in self.colorcles:
-            colorcle.process(None)
-
-        # Check to remove them as needed...
-        i = 0
-
-        while (i < len(self.colorcles)):
-            if (self.colorcles[i].state == False):
-                self.colorcles.pop(i)
-
-            else:
-                i += 1
-
-
-        for numbercle in self.numbercles:
-            numbercle.process(None)
-
-        # Check to remove them as needed...
-        i = 0
-
-        while (i < len(self.numbercles)):
-            if (self.numbercles[i].state == False):
-                self.numbercles.pop(i)
-
-            else:
-                i += 1
+        # Particle systems remove lost particles as they go
+        self.particles.process()
+        self.colorcles.process()
+        self.numbercles.process()
 
 
         for gold_spinner in self.gold_spinners:
@@ -3560,16 +3521,13 @@ class Map:
 
 
             # Render particles
-            for particle in self.particles:
-                particle.render(rx, ry, tilesheet_sprite, window_controller)
+            self.particles.render(rx, ry, tilesheet_sprite, window_controller)
 
             # Render colorcles
-            for colorcle in self.colorcles:
-                colorcle.render(rx, ry, window_controller)
+            self.colorcles.render(rx, ry, window_controller)
 
             # Render numbercles
-            for numbercle in self.numbercles:
-                numbercle.render(rx, ry, additional_sprites["numbercles"], window_controller)
+            self.numbercles.render(rx, ry, additional_sprites["numbercles"], window_controller)
 
             # Render gold spinner
             for gold_spinner in self.gold_spinners:
@@ -3700,10 +3658,7 @@ class Map:
 
 
             # I don't expect to create particles during editor mode, but just in case...
-            for particle in self.particles:
-
-                # Render particle
-                particle.render(rx, ry, tilesheet_sprite, window_controller)
+            self.particles.render(rx, ry, tilesheet_sprite, window_controller)
 
 
 
@@ -3834,21 +3789,42 @@ class Plane:
 
 
 
-        # Track the structure of the plane
-        self.tiles = DataGrid(0, 0)
+        # Track the structure of the plane (tile indices)
+        self.tiles = DataGrid(0, 0, typecode = "i")
 
         # We'll keep a copy for when we're filling holes back into existence
-        self.tiles_backup = DataGrid(0, 0)
+        self.tiles_backup = DataGrid(0, 0, typecode = "i")
+
 
+        # We'll also keep the collision type for each tile (plus a border of COLLISION_BOUNDARY_SIZE tiles, read from
+        # the bounding plane if we have one), so that a collision check needs only a single lookup.  We update it
+        # as tiles change, rebuilding it entirely when the tile data changes in bulk.
+        self.collision_grid = DataGrid(0, 0, typecode = "i")
 
-        # For each tile location, I'll track various trap data, such as dig state,
+        # Do we need to rebuild the collision grid before the next collision check?
+        self.collision_grid_dirty = True
+
+        # Enemy AI finds paths using a navigation graph built from the collision data.  We patch it as tiles change.
+        self.nav_graph = NavigationGraph()
+
+        # Rect collision checks go through a sweeper, which reports all of a rect's tile contacts at once
+        self.collision_sweeper = CollisionSweeper()
+
+        # Keep track of changes to tile data
+        self.tiles.set_listener(self)
+
+
+        # For each active dig site, I'll track various trap data, such as dig state,
         # time left until refill, whether an enemy has fallen in already, etc.
         # With random fill patterns, we prevent awkward synchronicity effects when blocks refill...
-        self.traps = DataGrid(0, 0)
+        self.traps = TrapTable(0, 0)
 
+        # Keep track of trap changes, too (for the navigation graph)
+        self.traps.set_listener(self)
 
-        # Gold cache; which tiles have gold?  (Store the gold entity's name in the grid.)
-        self.gold_cache = []
+
+        # Gold index; which tiles have gold, and how much gold has been collected?
+        self.gold_index = GoldIndex()
 
 
         # A plane might track a matrix delay for the matrix skill
@@ -3882,6 +3858,12 @@ class Plane:
             GENUS_HOLOGRAM: []
         }
 
+        # Tile-bucketed index of the above entities, for rect / overlap queries
+        self.entity_index = EntitySpatialIndex()
+
+        # Enemies far from the players / camera take their turns less often
+        self.ai_scheduler = AIScheduler()
+
         if (node):
             self.load(node)
 
@@ -3956,31 +3938,15 @@ class Plane:
             # The innerText holds the tile sequence...
             data = node.innerText.strip()
 
-            # Get rows
-            rows = data.split("\n")
-
-            # Loop rows
-            for y in range( 0, len(rows) ):
-
-                # Get columns
-                cols = rows[y].strip().split(" ")
+            # Get rows, each a list of tile values
+            rows = [ [ int(tile) for tile in row.strip().split(" ") ] for row in data.split("\n") ]
 
-                # Loop columns
-                for x in range( 0, len(cols) ):
+            # Save tile data as current and "backup"
+            self.tiles.load_rows(rows)
+            self.tiles_backup.load_rows(rows)
 
-                    # Convenience
-                    tile = cols[x]
-
-                    # Save tile data as current and "backup"
-                    self.tiles.write(x, y, int(tile))
-                    self.tiles_backup.write(x, y, int(tile))
-
-                    # Add a new trap data object for this tile (everything at default, i.e. inactive)
-                    self.traps.write(
-                        x,
-                        y,
-                        Trap()
-                    )
+            # Each tile begins with a default (inactive) trap
+            self.traps.resize( self.tiles.get_width(), self.tiles.get_height() )
 
         #self.traps.debug = True
 
@@ -4018,45 +3984,39 @@ class Plane:
         # Create node
         node = XMLNode("digs")
 
-        # Loop tiles
-        for y in range( 0, self.tiles.get_height() ):
-            for x in range( 0, self.tiles.get_width() ):
-
-                # Get Trap object for this tile location
-                trap = self.traps.read(x, y, default_value = None)
-
-                # Validate Trap object
-                if (trap):
-
-                    if ( trap.get_timer() > 0 ):
-
-                        # Add new dig state
-                        node.add_node(
-                            XMLNode("dig").set_attributes({
-                                "tx": xml_encode( "%d" % x ),
-                                "ty": xml_encode( "%d" % y ),
-                                "tile": xml_encode( "%d" % 0 ), # ? (0 for empty air, I guess...)
-                                "tile-backup": xml_encode( "%d" % self.tiles_backup.read(x, y) ),
-                                "trap-timer": xml_encode( "%d" % trap.get_timer() ),
-                                "trap-timer-delay": xml_encode( "%d" % trap.get_delay() ),
-                                "trap-occupants": xml_encode( "%d" % trap.get_occupants() ),
-                                "trap-fill-pattern": xml_encode( "%d" % trap.get_fill_pattern() )
-                            })
-                        )
-                        """
-                        params = (
-                            prefix,
-                            x,
-                            y,
-                            self.tiles_backup.read(x, y),
-                            trap.get_timer(),
-                            trap.get_delay(),
-                            trap.get_occupants(),
-                            trap.get_fill_pattern()
-                        )
+        # Loop active traps
+        for (x, y, trap) in self.traps.get_active_traps():
+
+            # Validate tile location
+            if ( ( y < self.tiles.get_height() ) and ( x < self.tiles.get_width() ) ):
+
+                # Add new dig state
+                node.add_node(
+                    XMLNode("dig").set_attributes({
+                        "tx": xml_encode( "%d" % x ),
+                        "ty": xml_encode( "%d" % y ),
+                        "tile": xml_encode( "%d" % 0 ), # ? (0 for empty air, I guess...)
+                        "tile-backup": xml_encode( "%d" % self.tiles_backup.read(x, y) ),
+                        "trap-timer": xml_encode( "%d" % trap.get_timer() ),
+                        "trap-timer-delay": xml_encode( "%d" % trap.get_delay() ),
+                        "trap-occupants": xml_encode( "%d" % trap.get_occupants() ),
+                        "trap-fill-pattern": xml_encode( "%d" % trap.get_fill_pattern() )
+                    })
+                )
+                """
+                params = (
+                    prefix,
+                    x,
+                    y,
+                    self.tiles_backup.read(x, y),
+                    trap.get_timer(),
+                    trap.get_delay(),
+                    trap.get_occupants(),
+                    trap.get_fill_pattern()
+                )
 
-                        xml += "%s<dig tx = '%d' ty = '%d' tile = '0' tile-backup = '%d' trap-timer = '%d' trap-timer-delay = '%d' trap-occupants = '%d' trap-fill-pattern = '%d' />\n" % params
-                        """
+                xml += "%s<dig tx = '%d' ty = '%d' tile = '0' tile-backup = '%d' trap-timer = '%d' trap-timer-delay = '%d' trap-occupants = '%d' trap-fill-pattern = '%d' />\n" % params
+                """
 
         # Return node
         return node
@@ -4126,6 +4086,111 @@ class Plane:
         # Set
         self.collision_values_by_tile_index = handle
 
+        # Collision types may have changed
+        self.collision_grid_dirty = True
+
+        # Thus, so may the navigation graph
+        self.nav_graph.invalidate()
+
+
+    # Set the bounding plane (used for collision checks just beyond the edges of the level)
+    def set_bounding_plane(self, plane):
+
+        # Set
+        self.bounding_plane = plane
+
+        # The collision grid's border comes from the bounding plane
+        self.collision_grid_dirty = True
+
+        # The navigation graph checks the bounding plane for footing along the bottom edge
+        self.nav_graph.invalidate()
+
+
+    # Callback for single-tile writes to the tile data.  Update the collision grid for that tile.
+    def handle_grid_write(self, grid, tx, ty, value):
+
+        # No need if we're going to rebuild the collision grid anyway
+        if (not self.collision_grid_dirty):
+
+            self.collision_grid.data[ ( (ty + COLLISION_BOUNDARY_SIZE) * self.collision_grid.width ) + tx + COLLISION_BOUNDARY_SIZE ] = self.get_tile_index_collision_type(value)
+
+            # Forget any contacts we found using the old collision type
+            self.collision_sweeper.invalidate()
+
+        # Patch the navigation graph around this tile before the next path query
+        self.nav_graph.invalidate_tile(tx, ty)
+
+
+    # Callback for any other change to the tile data (resize, bulk operations, etc.)
+    def handle_grid_change(self, grid):
+
+        # Rebuild the collision grid before the next collision check
+        self.collision_grid_dirty = True
+
+        # Rebuild the navigation graph before the next path query
+        self.nav_graph.invalidate()
+
+
+    # Callback for writes to the trap table.  Dug tiles count as solid ground for navigation purposes,
+    # so a trap starting / stopping affects the navigation graph around that tile.
+    def handle_trap_write(self, table, tx, ty):
+
+        # Patch the navigation graph before the next path query
+        self.nav_graph.invalidate_tile(tx, ty)
+
+
+    # Callback for any other change to the trap table (resize, etc.)
+    def handle_trap_change(self, table):
+
+        # Rebuild the navigation graph before the next path query
+        self.nav_graph.invalidate()
+
+
+    # Build the collision grid from the current tile data (and bounding plane, if any)
+    def build_collision_grid(self):
+
+        # Convenience
+        (w, h) = (
+            self.tiles.get_width(),
+            self.tiles.get_height()
+        )
+
+        # Track collision type rows
+        rows = []
+
+        # The border extends COLLISION_BOUNDARY_SIZE tiles in each direction.  (A collision check will also read
+        # one tile beyond the bounding plane's right edge, so we include one extra column.)
+        for by in range( 0, h + (2 * COLLISION_BOUNDARY_SIZE) ):
+
+            # Outside of the level, use the bounding plane's tile data
+            if (self.bounding_plane):
+
+                row = [ self.get_tile_index_collision_type( self.bounding_plane.tiles.read(bx, by) ) for bx in range( 0, w + (2 * COLLISION_BOUNDARY_SIZE) + 1 ) ]
+
+            # Without a bounding plane, there's nothing to hit outside of the level
+            else:
+
+                row = [COLLISION_NONE] * ( w + (2 * COLLISION_BOUNDARY_SIZE) + 1 )
+
+
+            # Within the level, use our own tile data
+            if ( (by >= COLLISION_BOUNDARY_SIZE) and (by < h + COLLISION_BOUNDARY_SIZE) ):
+
+                row[COLLISION_BOUNDARY_SIZE : COLLISION_BOUNDARY_SIZE + w] = [ self.get_tile_index_collision_type(tile) for tile in self.tiles.get_row_at_index(by - COLLISION_BOUNDARY_SIZE) ]
+
+            # Add row
+            rows.append(row)
+
+
+        # Save collision types
+        self.collision_grid.load_rows(rows)
+
+        # Up to date
+        self.collision_grid_dirty = False
+
+        # Forget any contacts we found using the old collision grid
+        self.collision_sweeper.invalidate()
+
 
     # Lock controller
     def lock(self):
@@ -4165,28 +4230,18 @@ class Plane:
 
     def reset_dig_data(self):
 
-        for ty in range( 0, self.tiles.get_height() ):
-
-            for tx in range( 0, self.tiles.get_width() ):
-
-                # Get trap object for tile at this location
-                trap = self.traps.read(tx, ty, default_value = None)
-
-                # Validate Trap object
-                if (trap):
-
-                    # Needs reset?
-                    if ( trap.get_timer() > 0 ):
+        # Loop active traps
+        for (tx, ty, trap) in self.traps.get_active_traps():
 
-                        # Restore tile
-                        self.tiles.write(
-                            tx,
-                            ty,
-                            self.tiles_backup.read(tx, ty)
-                        )
+            # Restore tile
+            self.tiles.write(
+                tx,
+                ty,
+                self.tiles_backup.read(tx, ty)
+            )
 
-                        # Let's just write a new Trap object with its defaults already set at 0
-                        self.traps.write(tx, ty, Trap())
+            # Let's just write a new Trap object with its defaults already set at 0
+            self.traps.write(tx, ty, Trap())
 
 
     # Load in dig state data
@@ -4320,7 +4375,7 @@ class Plane:
         self.tiles.pad(px = x, py = y, default_value = 0)
         self.tiles_backup.pad(px = x, py = y, default_value = 0)
 
-        self.traps.pad(px = x, py = y) # Create new trap object as default value
+        self.traps.pad(px = x, py = y) # New tiles get default (inactive) traps
 
 
         # Now resize...
@@ -4534,33 +4589,22 @@ class Plane:
         return self.tiles_backup.read(tx, ty, default_value = 0)
 
 
+    # Rebuild the gold index from scratch, putting every piece of gold back into the tile cache
     def build_gold_cache(self):
 
-        self.gold_cache = []
-
-        # Default all to nothing
-        for y in range( 0, self.tiles.get_height() ):
-
-            temp_row = []
-
-            for x in range( 0, self.tiles.get_width() ):
-                temp_row.append([])
+        self.gold_index.build( self.entities[GENUS_GOLD], self.tiles.get_width(), self.tiles.get_height() )
 
-            self.gold_cache.append(temp_row)
 
-        # Now loop through all gold entities and put them in their places...
-        for gold in self.entities[GENUS_GOLD]:
+    # Get the gold index, recounting first if the gold list has changed
+    def get_gold_index(self):
 
-            (tx, ty) = (
-                int( gold.get_x() / TILE_WIDTH ),
-                int( gold.get_y() / TILE_HEIGHT )
-            )
+        return self.gold_index.validate( self.entities[GENUS_GOLD] )
 
-            if (ty >= 0 and ty < len(self.gold_cache)):
 
-                if (tx >= 0 and tx < len(self.gold_cache[ty])):
+    # Update the gold index after a given piece of gold moves or changes collection status
+    def update_gold_in_cache(self, gold):
 
-                    self.gold_cache[ty][tx].append(gold.name)
+        self.get_gold_index().update(gold)
 
     def shift_to_target(self, x_target, y_target, speed, ghost, affected_entities, p_map):
 
@@ -5120,32 +5164,51 @@ class Plane:
 
     def check_collision(self, tx, ty, strictly_within_level = False):
 
-        if ( ty >= 0 and ty < self.tiles.get_height() ):
-
-            if ( tx >= 0 and tx < self.tiles.get_width() ):
-                return self.get_tile_index_collision_type( self.tiles.read(tx, ty) )
+        # Make sure the collision grid is up to date
+        if (self.collision_grid_dirty):
+            self.build_collision_grid()
 
+        # Convenience
+        grid = self.collision_grid
 
-        # Must have been out of bounds...
-        if ( self.bounding_plane and (not strictly_within_level) ):
+        # Shift ahead by boundary size to align at (0, 0) on the collision grid
+        (bx, by) = (tx + COLLISION_BOUNDARY_SIZE, ty + COLLISION_BOUNDARY_SIZE)
 
-            if ( ty >= -COLLISION_BOUNDARY_SIZE and ty < ( self.tiles.get_height() + COLLISION_BOUNDARY_SIZE ) ):
+        # Within the collision grid?
+        if ( (bx >= 0) and (by >= 0) and (bx < grid.width) and (by < grid.height) ):
 
-                if ( tx >= -COLLISION_BOUNDARY_SIZE and tx <= ( self.tiles.get_width() + COLLISION_BOUNDARY_SIZE ) ):
+            # When we're strictly checking within the level, everything out of bounds has no collision
+            if ( (strictly_within_level) and ( (tx < 0) or (ty < 0) or ( tx >= self.tiles.get_width() ) or ( ty >= self.tiles.get_height() ) ) ):
 
-                    # Shift ahead by boundary size to align at (0, 0) on the bounding plane
-                    (bx, by) = (tx + COLLISION_BOUNDARY_SIZE, ty + COLLISION_BOUNDARY_SIZE)
+                return COLLISION_NONE
 
-                    #log( "bx, by:  ", (bx, by) )
-                    return self.get_tile_index_collision_type( self.bounding_plane.tiles.read(bx, by) )
+            # Collision type
+            return grid.data[ (by * grid.width) + bx ]
 
         else:
 
             # Out-of-bounds error?  No collision, then...
             return COLLISION_NONE
 
+    # Find a path (list of tile coordinates, excluding the starting tile) from one tile to another.
+    # Returns an empty list if we're already there, or None if there's no way to get there.
+    def find_path(self, tx1, ty1, tx2, ty2):
+
+        # Query the navigation graph
+        return self.get_nav_graph().find_path( (tx1, ty1), (tx2, ty2) )
+
+
+    # Get the navigation graph, making sure it's up to date with the current collision data
+    def get_nav_graph(self):
+
+        return self.nav_graph.validate(self)
+
+
+    # Get the enemy AI scheduler (e.g. to read its per-bucket counts)
+    def get_ai_scheduler(self):
+
+        return self.ai_scheduler
 
-        return COLLISION_NONE
 
     # This version pretends that dug tiles are solid tiles...
     def check_faux_collision(self, tx, ty):
@@ -5154,11 +5217,11 @@ class Plane:
 
             if ( tx >= 0 and tx < self.tiles.get_width() ):
 
-                if ( self.traps.read(tx, ty).get_timer() > 0 ):
+                if ( self.traps.get_timer(tx, ty) > 0 ):
                     return COLLISION_DIGGABLE
 
                 else:
-                    return self.get_tile_index_collision_type( self.tiles.read(tx, ty) )
+                    return self.check_collision(tx, ty)
 
     def check_collision_value_exists_in_rect(self, r, values, exception = None):
 
@@ -5211,107 +5274,64 @@ class Plane:
 
     def get_gold_in_rect(self, r):
 
-        tx1 = int(r[0] / TILE_WIDTH)
-        ty1 = int(r[1] / TILE_HEIGHT)
-
-        tx2 = int( (r[0] + r[2] - 1) / TILE_WIDTH)
-        ty2 = int( (r[1] + r[3] - 1) / TILE_HEIGHT)
-
-        points = (
-            (tx1, ty1),
-            (tx2, ty1),
-            (tx1, ty2),
-            (tx2, ty2)
-        )
-
-        results = []
-
-        for (tx, ty) in points:
-
-            if (ty >= 0 and ty < len(self.gold_cache)):
-
-                if (tx >= 0 and tx < len(self.gold_cache[ty])):
-
-                    results.extend(self.gold_cache[ty][tx])
-
-        return results
+        return self.gold_index.get_names_in_rect(r)
 
     # Called when an enemy falls into a trap and drops his gold
     def add_gold_to_cache(self, entity):
 
-        (tx, ty) = (
-            int( entity.get_x() / TILE_WIDTH ),
-            int( entity.get_y() / TILE_HEIGHT )
-        )
-
-        if (ty >= 0 and ty < len(self.gold_cache)):
-
-            if (tx >= 0 and tx < len(self.gold_cache[ty])):
+        self.gold_index.add(entity)
 
-                self.gold_cache[ty][tx].append(entity.name)
+        # The gold has (probably) moved and reactivated
+        self.update_gold_in_cache(entity)
 
     def remove_gold_from_rect_by_name(self, r, name):
 
-        tx1 = int(r[0] / TILE_WIDTH)
-        ty1 = int(r[1] / TILE_HEIGHT)
+        self.gold_index.remove_name_from_rect(r, name)
 
-        tx2 = int( (r[0] + r[2] - 1) / TILE_WIDTH)
-        ty2 = int( (r[1] + r[3] - 1) / TILE_HEIGHT)
+    # Get the tile contact flags (CONTACT_SOLID, CONTACT_LADDER, etc.) for a given rect, optionally
+    # treating a given exception tile (tx, ty) as ground to land on.
+    def get_contacts_in_rect(self, r, exception = None):
 
-        points = (
-            (tx1, ty1),
-            (tx2, ty1),
-            (tx1, ty2),
-            (tx2, ty2)
-        )
+        return self.collision_sweeper.get_contacts(self, r, exception)
 
-        for (tx, ty) in points:
+    # Get the collision sweeper (e.g. to disable it when comparing results)
+    def get_collision_sweeper(self):
 
-            if (ty >= 0 and ty < len(self.gold_cache)):
-
-                if (tx >= 0 and tx < len(self.gold_cache[ty])):
-
-                    if (name in self.gold_cache[ty][tx]):
-
-                        pos = self.gold_cache[ty][tx].index(name)
-                        self.gold_cache[ty][tx].pop(pos)
+        return self.collision_sweeper
 
     def check_collision_in_rect(self, r):
-        return self.check_collision_value_exists_in_rect(r, (COLLISION_DIGGABLE, COLLISION_UNDIGGABLE, COLLISION_BRIDGE, COLLISION_SPIKES_LEFT, COLLISION_SPIKES_RIGHT))
+        return ( self.get_contacts_in_rect(r) & CONTACT_SOLID ) != 0
 
     def check_deadly_collision_in_rect_from_direction(self, r, direction):
 
         if (direction == DIR_LEFT):
-            return self.check_collision_value_exists_in_rect(r, (COLLISION_SPIKES_LEFT,))
+            return ( self.get_contacts_in_rect(r) & CONTACT_SPIKES_LEFT ) != 0
 
         elif (direction == DIR_RIGHT):
-            return self.check_collision_value_exists_in_rect(r, (COLLISION_SPIKES_RIGHT,))
+            return ( self.get_contacts_in_rect(r) & CONTACT_SPIKES_RIGHT ) != 0
 
         else:
             return False
 
     def check_fall_collision_in_rect(self, r, exception = None):
-        return self.check_collision_value_exists_in_rect(r, (COLLISION_DIGGABLE, COLLISION_UNDIGGABLE, COLLISION_BRIDGE, COLLISION_LADDER, COLLISION_SPIKES_LEFT, COLLISION_SPIKES_RIGHT), exception)
+        return ( self.get_contacts_in_rect(r, exception) & CONTACT_FALL ) != 0
 
     def check_deadly_fall_collision_in_rect(self, r, exception = None):
-        return self.check_collision_value_exists_in_rect(r, (COLLISION_DEADLY,), exception)
+        return ( self.get_contacts_in_rect(r, exception) & CONTACT_DEADLY ) != 0
 
     def check_ladder_exists_in_rect(self, r):
-        return self.check_collision_value_exists_in_rect(r, (COLLISION_LADDER,))
+        return ( self.get_contacts_in_rect(r) & CONTACT_LADDER ) != 0
 
     def check_monkeybar_exists_in_rect(self, r):
-        return self.check_collision_value_exists_in_rect(r, (COLLISION_MONKEYBAR,))
+        return ( self.get_contacts_in_rect(r) & CONTACT_MONKEYBAR ) != 0
 
 
     # See if a ladder OR a monkeybar exists in a given rect.
     # We'll use this, for instance, when the player pressed DOWN and we want to see if they are facing + touching a downward-movement tile.
     def check_ladder_or_monkeybar_exists_in_rect(self, r):
 
-        # Check collision value
-        return self.check_collision_value_exists_in_rect(
-            r,
-            (COLLISION_LADDER, COLLISION_MONKEYBAR)
-        )
+        # Check contact flags
+        return ( self.get_contacts_in_rect(r) & (CONTACT_LADDER | CONTACT_MONKEYBAR) ) != 0
 
 
     def contains_trapped_entity(self, entity):
@@ -5368,17 +5388,28 @@ class Plane:
 
                 (self.entities[genus][a], self.entities[genus][b]) = (self.entities[genus][b], self.entities[genus][a])
 
+                # The entity index orders results by list position
+                self.entity_index.invalidate()
+
                 #self.entities[genus].append( self.entities[genus].pop(pos) )
 
 
+    # Get a list of entities (of the given genus types) near a given rect.  This list
+    # can include entities that don't quite intersect the rect; callers should test each one.
+    def query_entities_near_rect(self, entity_types, r):
+
+        # Make sure the index is up to date, then query it
+        return self.entity_index.validate(self.entities).query(entity_types, r)
+
+
     # Count the number of enemies in a given region
     def count_enemies_in_rect(self, r, exceptions = []):
 
         # Assume
         count = 0
 
-        # Check all enemies
-        for e in self.entities[GENUS_ENEMY]:
+        # Check nearby enemies
+        for e in self.query_entities_near_rect( (GENUS_ENEMY,), r ):
 
             # Ignore exceptions
             if ( ( not (e in exceptions) ) and ( e.is_touchable() ) ):
@@ -5397,15 +5428,13 @@ class Plane:
 
         count = 0
 
-        for genus in (GENUS_PLAYER, GENUS_ENEMY):
-
-            for entity in self.entities[genus]:
+        for entity in self.query_entities_near_rect( (GENUS_PLAYER, GENUS_ENEMY), r ):
 
-                if ( ( not (entity in exceptions) ) and ( entity.is_touchable() ) ):
+            if ( ( not (entity in exceptions) ) and ( entity.is_touchable() ) ):
 
-                    if ( intersect(r, entity.get_rect()) ):
+                if ( intersect(r, entity.get_rect()) ):
 
-                        count += 1
+                    count += 1
 
         return count
 
@@ -5429,48 +5458,45 @@ class Plane:
 
             entities = []
 
-            # Loop through each entity type we care about
-            for genus in entity_types:
+            # Loop through each nearby entity of the types we care about
+            for entity in self.query_entities_near_rect( entity_types, ref_entity.get_rect() ):
 
-                # Loop each entity in this genus
-                for entity in self.entities[genus]:
+                # Don't test against ourself, and only test against "touchable" entities
+                if ( ( not (ref_entity == entity) ) and ( entity.is_touchable() ) ):
 
-                    # Don't test against ourself, and only test against "touchable" entities
-                    if ( ( not (ref_entity == entity) ) and ( entity.is_touchable() ) ):
+                    # Finally, the intersection test!
+                    result = ref_entity.intersects_entity(entity)
 
-                        # Finally, the intersection test!
-                        result = ref_entity.intersects_entity(entity)
+                    # Intersects?
+                    if (result):# != (0, 0)):
 
-                        # Intersects?
-                        if (result):# != (0, 0)):
-
-                            # I'm going to try disabling this "instant add" and instead add if the
-                            # intersect_x / intersecT_y calculations evaluate to True.
-                            """
-                            # Add the result
-                            results.add(entity)
-                            """
+                        # I'm going to try disabling this "instant add" and instead add if the
+                        # intersect_x / intersecT_y calculations evaluate to True.
+                        """
+                        # Add the result
+                        results.add(entity)
+                        """
 
-                            # For some reason I require some certain amount of overlap before I do this?  is this right?
-                            intersect_x = min(
-                                abs( (ref_entity.x + ref_entity.width) - entity.get_x() ),
-                                abs( (entity.get_x() + entity.width) - ref_entity.x )
-                            )
+                        # For some reason I require some certain amount of overlap before I do this?  is this right?
+                        intersect_x = min(
+                            abs( (ref_entity.x + ref_entity.width) - entity.get_x() ),
+                            abs( (entity.get_x() + entity.width) - ref_entity.x )
+                        )
 
-                            intersect_y = min(
-                                abs( (ref_entity.y + ref_entity.height) - entity.get_y() ),
-                                abs( (entity.get_y() + entity.height) - ref_entity.y )
-                            )
+                        intersect_y = min(
+                            abs( (ref_entity.y + ref_entity.height) - entity.get_y() ),
+                            abs( (entity.get_y() + entity.height) - ref_entity.y )
+                        )
 
-                            # Add collision match
-                            if ( (intersect_x >= ref_entity.speed) or (intersect_y >= ref_entity.speed) ):
-                                #entity.handle_entity_touch(ref_entity)
-                                results.add(entity)
+                        # Add collision match
+                        if ( (intersect_x >= ref_entity.speed) or (intersect_y >= ref_entity.speed) ):
+                            #entity.handle_entity_touch(ref_entity)
+                            results.add(entity)
 
-                            # ??????????
-                            else:
-                                results.add(entity)
-                                log2( "< speed collision added (does this matter?)" )
+                        # ??????????
+                        else:
+                            results.add(entity)
+                            log2( "< speed collision added (does this matter?)" )
 
 
         # Return query results
@@ -5711,6 +5737,20 @@ class Plane:
 
     def process(self, control_center, universe):
 
+        # Index every entity as of the start of the frame.  While we process,
+        # we update each entity's index entry right after it takes its turn.
+        self.entity_index.rebuild(self.entities).set_tracking(True)
+
+        # Process entities, dig sites, etc.
+        self.process_entities(control_center, universe)
+
+        # Entities can move without our knowledge outside of this method (scripts, etc.), so
+        # the index will now rebuild itself before each query until the next frame.
+        self.entity_index.set_tracking(False)
+
+
+    def process_entities(self, control_center, universe):
+
         # Fetch input controller
         input_controller = control_center.get_input_controller()
 
@@ -5774,6 +5814,10 @@ class Plane:
                 network_controller.unlock()
 
 
+            # Update index
+            self.entity_index.update(player)
+
+
         # Validate that we found the local player
         if (local_player):
 
@@ -5875,79 +5919,88 @@ class Plane:
         for respawn in self.entities[GENUS_RESPAWN_PLAYER]:
 
             respawn.process(control_center, universe)#network_controller, universe, p_map, session)
+            self.entity_index.update(respawn)
 
 
-        for enemy in self.entities[GENUS_ENEMY]:
+        # Decide how many AI turns each enemy gets this frame (by distance from the players / camera)
+        self.ai_scheduler.prepare(self, control_center, universe)
 
+        for (i, enemy) in enumerate( self.entities[GENUS_ENEMY] ):
+
+            # Physics (gravity, collision, etc.) run every frame
             enemy.process(control_center, universe)#network_controller, universe, p_map, session)
-            enemy.handle_ai(control_center, universe)#network_controller, universe, p_map, session)
+
+            # Usually one AI turn; far enemies think less often, then gradually catch up when they come near
+            for turn in range( 0, self.ai_scheduler.schedule(enemy, i) ):
+
+                enemy.handle_ai(control_center, universe)#network_controller, universe, p_map, session)
+
+            self.entity_index.update(enemy)
 
         for npc in self.entities[GENUS_NPC]:
 
             npc.process(control_center, universe)#network_controller, universe, p_map, session)
             npc.handle_ai(control_center, universe)#network_controller, universe, p_map, session)
+            self.entity_index.update(npc)
 
         for bomb in self.entities[GENUS_BOMB]:
 
             bomb.process(control_center, universe)#network_controller, universe, p_map, session)
+            self.entity_index.update(bomb)
 
         for hologram in self.entities[GENUS_HOLOGRAM]:
 
             hologram.process(control_center, universe)#network_controller, universe, p_map, session)
             hologram.handle_ai(control_center, universe)#network_controller, universe, p_map, session)
+            self.entity_index.update(hologram)
 
         for gold in self.entities[GENUS_GOLD]:
 
             gold.process(control_center, universe)#network_controller, universe, p_map, session)
+            self.entity_index.update(gold)
 
 
-        # Check dig sites
-        for y in range( 0, self.traps.get_height() ):
-            for x in range( 0, self.traps.get_width() ):
-
-                # Convenience
-                trap = self.traps.read(x, y, default_value = None)
+        # Check active dig sites
+        self.process_traps(control_center, universe)
 
-                # Validate trap object
-                if (trap):
 
-                    # Is this trap active?
-                    if ( trap.get_timer() > 0 ):
+    # Count down each active dig site, refilling tiles as their timers expire
+    def process_traps(self, control_center, universe):
 
-                        # Lower the timer
-                        if ( trap.get_delay() <= 0 ):
+        for (x, y, trap) in self.traps.get_active_traps():
 
-                            # Tick, tock
-                            trap.increment_timer(-1)
+            # Lower the timer
+            if ( trap.get_delay() <= 0 ):
 
+                # Tick, tock
+                trap.increment_timer(-1)
 
-                            # Is it time to refill the tile (for collision detection, etc.)?
-                            if ( trap.get_timer() <= 0 ):
 
-                                # Restore tile (for collision detection purposes, etc.)
-                                self.tiles.write( x, y, self.tiles_backup.read(x, y) )
+                # Is it time to refill the tile (for collision detection, etc.)?
+                if ( trap.get_timer() <= 0 ):
 
-                                # Any entity in this tile will be destroyed!
-                                r = offset_rect( (x * TILE_WIDTH, y * TILE_HEIGHT, TILE_WIDTH, TILE_HEIGHT), self.x, self.y )
+                    # Restore tile (for collision detection purposes, etc.)
+                    self.tiles.write( x, y, self.tiles_backup.read(x, y) )
 
-                                for genus in (GENUS_PLAYER, GENUS_ENEMY, GENUS_NPC):
+                    # Any entity in this tile will be destroyed!
+                    r = offset_rect( (x * TILE_WIDTH, y * TILE_HEIGHT, TILE_WIDTH, TILE_HEIGHT), self.x, self.y )
 
-                                    for entity in self.entities[genus]:
+                    for entity in self.query_entities_near_rect( (GENUS_PLAYER, GENUS_ENEMY, GENUS_NPC), r ):
 
-                                        if ( intersect(r, entity.get_rect()) ):
-                                            entity.queue_death_by_cause(DEATH_BY_TILE_FILL)
+                        if ( intersect(r, entity.get_rect()) ):
+                            entity.queue_death_by_cause(DEATH_BY_TILE_FILL)
 
 
-                            # No; should we delay the next timer countdown to show the fill pattern effect?
-                            elif ( trap.get_timer() <= DIG_FILL_FRAMES ):
+                # No; should we delay the next timer countdown to show the fill pattern effect?
+                elif ( trap.get_timer() <= DIG_FILL_FRAMES ):
 
-                                # This will allow each from of the fill effect to remain visible for a short time...
-                                trap.set_delay( DIG_FILL_FRAME_DELAYS[ DIG_FILL_FRAMES - (trap.get_timer() - 0) ] )
-                                #print "FRAME: ", self.trap_timers[y][x]
+                    # This will allow each from of the fill effect to remain visible for a short time...
+                    trap.set_delay( DIG_FILL_FRAME_DELAYS[ DIG_FILL_FRAMES - (trap.get_timer() - 0) ] )
+                    #print "FRAME: ", self.trap_timers[y][x]
 
 
-                        else:
-                            trap.increment_delay(-1)
+            else:
+                trap.increment_delay(-1)
 
 
     def post_process(self, control_center, universe):#network_controller, universe, p_map, session):
@@ -6052,33 +6105,27 @@ class Plane:
                 window_controller.get_gfx_controller().draw_textured_row(rx, ry + (y * em), tilesheet_sprite, self.tiles.get_row_at_index(y), gl_color = color, max_x = max_x, max_y = max_y, scale = scale)
 
 
-            # Render filling-in tiles as necessary...
-            for y in range( 0, self.traps.get_height() ):
-                for x in range( 0, self.traps.get_width() ):
+            # Render filling-in tiles as necessary...  We only need to check active dig sites.
+            for (x, y, trap) in self.traps.get_active_traps():
 
-                    # Convenience.  Note that we're using read2 to commit an unprotected read, assuming x, y exists in the self.traps DataGrid object.  And it should!
-                    #   CAlling the protected read just ruins performance, unfortunately.
-                    #trap = self.traps.read(x, y, default_value = None)
-                    trap = self.traps.read2(x, y)
-
-                    #"""
-                    # Validate Trap object
-                    z = trap.get_timer()
+                #"""
+                # Validate Trap object
+                z = trap.get_timer()
 
-                    if ( (z > 0) and (z <= DIG_FILL_FRAMES) ):
+                if ( (z > 0) and (z <= DIG_FILL_FRAMES) ):
 
-                        # Calculate current fill frame
-                        frame = DIG_FILL_FRAMES - (trap.get_timer() - 0)
+                    # Calculate current fill frame
+                    frame = DIG_FILL_FRAMES - (trap.get_timer() - 0)
 
-                        # The currently appearing portions of the brick (for this tram timer frame) will fade into view as the trap timer expires...
-                        alpha = 1.0 - ((DIG_FILL_FRAME_DELAYS[frame] - trap.get_delay()) / float(DIG_FILL_FRAME_DELAYS[frame]))
+                    # The currently appearing portions of the brick (for this tram timer frame) will fade into view as the trap timer expires...
+                    alpha = 1.0 - ((DIG_FILL_FRAME_DELAYS[frame] - trap.get_delay()) / float(DIG_FILL_FRAME_DELAYS[frame]))
 
-                        # Any portions that already faded in during a previous frame should show 100%
-                        window_controller.get_gfx_controller().draw_fill_pattern(rx + (x * em), ry + (y * em), self.tiles_backup.read(x, y), tilesheet_sprite, frame, additional_sprites["fill-patterns:history"][ trap.get_fill_pattern() ], gl_color = color)
+                    # Any portions that already faded in during a previous frame should show 100%
+                    window_controller.get_gfx_controller().draw_fill_pattern(rx + (x * em), ry + (y * em), self.tiles_backup.read(x, y), tilesheet_sprite, frame, additional_sprites["fill-patterns:history"][ trap.get_fill_pattern() ], gl_color = color)
 
-                        # To create the effect of the current segments fading in, we render the fill mask on top of the tile to finish the process
-                        window_controller.get_gfx_controller().draw_sprite(rx + (x * em), ry + (y * em), tw, th, additional_sprites["fill-patterns:mask"][ trap.get_fill_pattern() ], frame = frame, gl_color = set_alpha_for_glcolor(alpha, color))
-                    #"""
+                    # To create the effect of the current segments fading in, we render the fill mask on top of the tile to finish the process
+                    window_controller.get_gfx_controller().draw_sprite(rx + (x * em), ry + (y * em), tw, th, additional_sprites["fill-patterns:mask"][ trap.get_fill_pattern() ], frame = frame, gl_color = set_alpha_for_glcolor(alpha, color))
+                #"""
 
 
             # Stop scissor test if we set one during a slide...
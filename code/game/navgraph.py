@@ -0,0 +1,481 @@
+import heapq
+
+from collections import deque
+
+from code.tools.datagrid import DataGrid
+
+from code.constants.common import *
+
+# Entities can't move into these tiles
+NAV_BLOCKING_TYPES = (COLLISION_DIGGABLE, COLLISION_UNDIGGABLE, COLLISION_BRIDGE, COLLISION_SPIKES_LEFT, COLLISION_SPIKES_RIGHT, COLLISION_DEADLY)
+
+# Entities can stand on top of these tiles
+NAV_SUPPORTING_TYPES = (COLLISION_DIGGABLE, COLLISION_UNDIGGABLE, COLLISION_LADDER, COLLISION_BRIDGE, COLLISION_SPIKES_LEFT, COLLISION_SPIKES_RIGHT)
+
+# Entities can hang onto / stand within these tiles
+NAV_HOLDING_TYPES = (COLLISION_LADDER, COLLISION_MONKEYBAR)
+
+# An entity climbing up a ladder needs one of these tiles above it
+NAV_CLIMBABLE_TYPES = (COLLISION_NONE, COLLISION_LADDER, COLLISION_MONKEYBAR)
+
+# Each edge flag, with its (dx, dy) offset.  We check neighbors in this order.
+NAV_EDGES = (
+    (NAV_EDGE_LEFT, -1, 0),
+    (NAV_EDGE_RIGHT, 1, 0),
+    (NAV_EDGE_UP, 0, -1),
+    (NAV_EDGE_DOWN, 0, 1)
+)
+
+# A navigation graph for a plane.  Each tile in the plane is a node; we store the moves (edges)
+# available from each tile as a set of flags on a grid.  Edges follow the usual movement rules:
+# entities walk left / right when standing on something (or holding a ladder / monkey bar),
+# climb up ladders, and climb down ladders / drop from monkey bars / fall into any open space below.
+# Dug tiles count as solid ground (like check_faux_collision), so paths walk over holes rather than into them.
+#
+# We build the graph once, then patch it as individual tiles change (digs, fills, magic walls, etc.).
+# Path queries (A*) get cached until the graph changes.
+#
+# When many entities head for the same tile (e.g. every enemy chasing the player on a challenge map),
+# we can instead calculate a single flow field:  each tile's distance (in moves) to the goal tile,
+# found with one breadth-first search backward from the goal.  Any entity can then find its next
+# move by checking its neighbors' distances.
+class NavigationGraph:
+
+    def __init__(self):
+
+        # Edge flags for each tile
+        self.edges = DataGrid(0, 0, typecode = "i")
+
+        # Do we need to rebuild the entire graph?
+        self.dirty = True
+
+        # Tiles that have changed since we last patched the graph
+        self.changed_tiles = {}
+
+        # Each time the graph changes, we increment the version.  Entities following
+        # a path can compare versions to see if they should find a new path.
+        self.version = 0
+
+        # Cached path query results, by (start, goal)
+        self.paths = {}
+
+        # Cached flow fields, by goal
+        self.flow_fields = {}
+
+
+    # Get current graph version
+    def get_version(self):
+
+        return self.version
+
+
+    # Flag the entire graph for rebuilding
+    def invalidate(self):
+
+        self.dirty = True
+
+        # For chaining
+        return self
+
+
+    # Flag a single tile as changed.  We'll patch the affected edges before the next query.
+    def invalidate_tile(self, tx, ty):
+
+        # No need if we're rebuilding the whole thing anyway
+        if (not self.dirty):
+
+            self.changed_tiles[ (tx, ty) ] = True
+
+        # For chaining
+        return self
+
+
+    # Make sure the graph reflects a given plane's current collision data
+    def validate(self, plane):
+
+        # Full rebuild?
+        if (self.dirty):
+
+            self.build(plane)
+
+        # Patch changed tiles?
+        elif ( len(self.changed_tiles) > 0 ):
+
+            self.patch(plane)
+
+        # For chaining
+        return self
+
+
+    # Check whether an entity can occupy a given tile
+    def is_passable(self, plane, tx, ty):
+
+        # Within the level?
+        if ( (tx >= 0) and (ty >= 0) and ( tx < plane.tiles.get_width() ) and ( ty < plane.tiles.get_height() ) ):
+
+            return ( not ( plane.check_faux_collision(tx, ty) in NAV_BLOCKING_TYPES ) )
+
+        # Paths never leave the level
+        else:
+            return False
+
+
+    # Check whether an entity can stand still (or hold on) at a given tile
+    def is_supported(self, plane, tx, ty):
+
+        # Holding onto a ladder / monkey bar?
+        if ( plane.check_collision(tx, ty) in NAV_HOLDING_TYPES ):
+
+            return True
+
+        # Standing on a tile within the level?  Dug tiles count as solid ground.
+        elif ( (ty + 1) < plane.tiles.get_height() ):
+
+            return ( plane.check_faux_collision(tx, ty + 1) in NAV_SUPPORTING_TYPES )
+
+        # Standing on the level's bottom edge (i.e. the bounding plane)?
+        else:
+
+            return ( plane.check_collision(tx, ty + 1) in NAV_SUPPORTING_TYPES )
+
+
+    # Calculate the edge flags for a given tile
+    def calculate_edges(self, plane, tx, ty):
+
+        # Can't go anywhere from within a wall
+        if ( not self.is_passable(plane, tx, ty) ):
+
+            return 0
+
+
+        # Track flags
+        flags = 0
+
+        # We can always go down if there's room; we'll climb down, drop, or fall...
+        if ( self.is_passable(plane, tx, ty + 1) ):
+
+            flags |= NAV_EDGE_DOWN
+
+
+        # Any other move requires footing
+        if ( self.is_supported(plane, tx, ty) ):
+
+            # Walk left?
+            if ( self.is_passable(plane, tx - 1, ty) ):
+
+                flags |= NAV_EDGE_LEFT
+
+            # Walk right?
+            if ( self.is_passable(plane, tx + 1, ty) ):
+
+                flags |= NAV_EDGE_RIGHT
+
+            # Climb up a ladder?  There must be room above.
+            if ( ( plane.check_collision(tx, ty) == COLLISION_LADDER ) and ( plane.check_collision(tx, ty - 1) in NAV_CLIMBABLE_TYPES ) and ( self.is_passable(plane, tx, ty - 1) ) ):
+
+                flags |= NAV_EDGE_UP
+
+
+        # Return flags
+        return flags
+
+
+    # Build the entire graph from a given plane's collision data
+    def build(self, plane):
+
+        # Convenience
+        (w, h) = (
+            plane.tiles.get_width(),
+            plane.tiles.get_height()
+        )
+
+        # Calculate each row's edge flags
+        self.edges.load_rows([
+            [ self.calculate_edges(plane, tx, ty) for tx in range(0, w) ]
+            for ty in range(0, h)
+        ])
+
+        # Up to date
+        self.dirty = False
+        self.changed_tiles = {}
+
+        # New version
+        self.increment_version()
+
+
+    # Patch the edges affected by each changed tile
+    def patch(self, plane):
+
+        # Track the tiles whose edges we need to recalculate
+        affected = {}
+
+        # A tile affects its own edges, the edges of each tile that could move into it,
+        # and the edges of the tile above it (which might stand on it)
+        for (tx, ty) in self.changed_tiles:
+
+            for (x, y) in ( (tx, ty), (tx - 1, ty), (tx + 1, ty), (tx, ty - 1), (tx, ty + 1) ):
+
+                affected[ (x, y) ] = True
+
+
+        # Did any edge actually change?
+        changed = False
+
+        # Recalculate each affected tile's edges
+        for (x, y) in affected:
+
+            # Validate
+            if ( (x >= 0) and (y >= 0) and ( x < self.edges.get_width() ) and ( y < self.edges.get_height() ) ):
+
+                # New flags
+                flags = self.calculate_edges(plane, x, y)
+
+                # Update
+                if ( flags != self.edges.read(x, y) ):
+
+                    self.edges.write(x, y, flags)
+
+                    # Flag change
+                    changed = True
+
+
+        # Up to date
+        self.changed_tiles = {}
+
+        # New version, if anything changed
+        if (changed):
+
+            self.increment_version()
+
+
+    # Increment graph version, discarding any cached path data
+    def increment_version(self):
+
+        # Increment
+        self.version += 1
+
+        # Cached paths / flow fields may no longer be valid
+        self.paths = {}
+        self.flow_fields = {}
+
+
+    # Get the neighbors we can move to from a given tile
+    def get_neighbors(self, tx, ty):
+
+        # Edge flags
+        flags = self.edges.read(tx, ty)
+
+        # Return each neighbor
+        return [ (tx + dx, ty + dy) for (flag, dx, dy) in NAV_EDGES if (flags & flag) ]
+
+
+    # Find a path from one tile to another.  Returns a list of tiles to move through (excluding the starting
+    # tile, including the goal tile), an empty list if we're already at the goal, or None if we can't get there.
+    def find_path(self, start, goal):
+
+        # Check the cache first
+        key = (start, goal)
+
+        if (key in self.paths):
+
+            return self.paths[key]
+
+
+        # Don't let the cache grow too large
+        if ( len(self.paths) >= NAV_PATH_CACHE_SIZE ):
+
+            self.paths = {}
+
+
+        # Calculate and cache
+        self.paths[key] = self.calculate_path(start, goal)
+
+        # Return path
+        return self.paths[key]
+
+
+    # Estimate the cost of moving between two tiles.  Each move costs 1 and moves exactly 1 tile,
+    # so manhattan distance never overestimates.
+    def estimate_cost(self, a, b):
+
+        return abs( a[0] - b[0] ) + abs( a[1] - b[1] )
+
+
+    # A* search from one tile to another (see find_path)
+    def calculate_path(self, start, goal):
+
+        # Already there?
+        if (start == goal):
+
+            return []
+
+        # Validate tiles
+        for (tx, ty) in (start, goal):
+
+            if ( (tx < 0) or (ty < 0) or ( tx >= self.edges.get_width() ) or ( ty >= self.edges.get_height() ) ):
+
+                return None
+
+
+        # Track best known cost to each tile, and how we got there
+        costs = { start: 0 }
+        previous = { start: None }
+
+        # Open set of (estimated total cost, estimated remaining cost, insertion order, tile).
+        # The insertion order keeps tiebreaking deterministic.
+        counter = 0
+        queue = [ ( self.estimate_cost(start, goal), self.estimate_cost(start, goal), counter, start ) ]
+
+        # Search
+        while ( len(queue) > 0 ):
+
+            # Best candidate
+            (f, remaining, order, node) = heapq.heappop(queue)
+
+            # Found it?
+            if (node == goal):
+
+                # Walk back to the start
+                path = []
+
+                while (node != start):
+
+                    path.append(node)
+                    node = previous[node]
+
+                # Return path from start to goal
+                path.reverse()
+                return path
+
+            # Skip stale queue entries
+            elif ( f - remaining > costs[node] ):
+
+                continue
+
+
+            # Check each neighbor
+            for neighbor in self.get_neighbors( node[0], node[1] ):
+
+                # Cost to reach the neighbor through this tile
+                cost = costs[node] + 1
+
+                # Better than what we had?
+                if ( (not (neighbor in costs)) or (cost < costs[neighbor]) ):
+
+                    # Remember
+                    costs[neighbor] = cost
+                    previous[neighbor] = node
+
+                    # Queue
+                    counter += 1
+                    heapq.heappush( queue, ( cost + self.estimate_cost(neighbor, goal), self.estimate_cost(neighbor, goal), counter, neighbor ) )
+
+
+        # No path
+        return None
+
+
+    # Get a flow field toward a given goal tile:  a grid holding each tile's distance (in moves) to the goal,
+    # or -1 for tiles that can't reach the goal.  We cache flow fields until the graph changes.
+    def get_flow_field(self, goal):
+
+        # Check the cache first
+        if (goal in self.flow_fields):
+
+            return self.flow_fields[goal]
+
+
+        # Don't let the cache grow too large
+        if ( len(self.flow_fields) >= NAV_FLOW_FIELD_CACHE_SIZE ):
+
+            self.flow_fields = {}
+
+
+        # Calculate and cache
+        self.flow_fields[goal] = self.calculate_flow_field(goal)
+
+        # Return flow field
+        return self.flow_fields[goal]
+
+
+    # Breadth-first search backward from a given goal tile (see get_flow_field)
+    def calculate_flow_field(self, goal):
+
+        # Convenience
+        (w, h) = (
+            self.edges.get_width(),
+            self.edges.get_height()
+        )
+
+        # Nothing can reach the goal until we find out otherwise
+        field = DataGrid(w, h, typecode = "i")
+        field.fill(-1)
+
+        # Validate goal
+        (gx, gy) = goal
+
+        if ( (gx < 0) or (gy < 0) or (gx >= w) or (gy >= h) ):
+
+            return field
+
+
+        # The goal is 0 moves away from itself
+        field.write(gx, gy, 0)
+
+        # Search
+        queue = deque([goal])
+
+        while ( len(queue) > 0 ):
+
+            # Next tile
+            (tx, ty) = queue.popleft()
+
+            # Distance to goal
+            distance = field.read(tx, ty)
+
+            # A tile can reach this one if it has an edge leading here
+            for (flag, dx, dy) in NAV_EDGES:
+
+                # Neighbor tile that would make this move to get here
+                (x, y) = (tx - dx, ty - dy)
+
+                # Not yet visited, and can it make the move?
+                if ( ( field.read(x, y, default_value = 0) == -1 ) and ( self.edges.read(x, y) & flag ) ):
+
+                    # One move further away
+                    field.write(x, y, distance + 1)
+
+                    # Search onward
+                    queue.append( (x, y) )
+
+
+        # Return flow field
+        return field
+
+
+    # Get the next tile to move to from a given tile, following a given flow field.  Returns None if we're
+    # already at the field's goal, or if we can't reach the goal from here.
+    def get_next_tile_in_flow_field(self, field, tx, ty):
+
+        # Distance to goal
+        distance = field.read(tx, ty, default_value = -1)
+
+        # At the goal, or can't get there?
+        if (distance <= 0):
+
+            return None
+
+
+        # Edge flags
+        flags = self.edges.read(tx, ty)
+
+        # Take the first available move that gets us closer
+        for (flag, dx, dy) in NAV_EDGES:
+
+            if ( (flags & flag) and ( field.read(tx + dx, ty + dy, default_value = -1) == (distance - 1) ) ):
+
+                return (tx + dx, ty + dy)
+
+
+        # Shouldn't happen
+        return None
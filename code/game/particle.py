@@ -1,8 +1,10 @@
 import random
 
+from array import array
+
 from code.controllers.intervalcontroller import IntervalController
 
-from code.constants.common import PARTICLE_WIDTH, PARTICLE_HEIGHT, COLORCLE_WIDTH, COLORCLE_HEIGHT, PARTICLE_SPAWN_GRAVITY, PARTICLE_SPAWN_GRAVITY_VARIANCE, PARTICLE_ROTATIONAL_SPEED, PARTICLE_ROTATIONAL_SPEED_VARIANCE, PARTICLE_RATE_OF_GRAVITY, PARTICLE_MAX_GRAVITY, NUMBERCLE_WIDTH, NUMBERCLE_HEIGHT, NUMBERCLE_LIFESPAN
+from code.constants.common import PARTICLE_WIDTH, PARTICLE_HEIGHT, COLORCLE_WIDTH, COLORCLE_HEIGHT, PARTICLE_SPAWN_GRAVITY, PARTICLE_SPAWN_GRAVITY_VARIANCE, PARTICLE_ROTATIONAL_SPEED, PARTICLE_ROTATIONAL_SPEED_VARIANCE, PARTICLE_RATE_OF_GRAVITY, PARTICLE_MAX_GRAVITY, NUMBERCLE_WIDTH, NUMBERCLE_HEIGHT, NUMBERCLE_LIFESPAN, PARTICLE_ALPHA_WAIT, PARTICLE_FADE_SPEED, PARTICLE_MAX_Y, PARTICLE_SYSTEM_CAPACITY, COLORCLE_SYSTEM_CAPACITY, NUMBERCLE_SYSTEM_CAPACITY
 
 #from glfunctions import draw_particle, draw_rect, draw_sprite
 
@@ -45,13 +47,13 @@ class Particle:
 
 
         # Alpha tracking
-        self.alpha_wait = 30
+        self.alpha_wait = PARTICLE_ALPHA_WAIT
 
         self.alpha_controller = IntervalController(
             interval = 1.0,
             target = 0.0,
             speed_in = 0.045,
-            speed_out = 0.015
+            speed_out = PARTICLE_FADE_SPEED
         )
 
     def get_x(self):
@@ -110,82 +112,408 @@ class Particle:
                 self.degrees -= 360
 
 
-            if ( (self.y >= 1000) or ( not self.alpha_controller.is_visible() ) ):
+            if ( (self.y >= PARTICLE_MAX_Y) or ( not self.alpha_controller.is_visible() ) ):
                 self.state = False
 
     def render(self, sx, sy, tilesheet_sprite, window_controller):
 
         window_controller.get_gfx_controller().draw_particle(sx + self.get_x(), sy + self.get_y(), self.index_x, self.index_y, self.degrees, self.tile, tilesheet_sprite, (255, 255, 255, self.alpha_controller.get_interval()))
 
-class Colorcle(Particle):
+# A batch of particles (tile fragments, as in Particle) stored as struct-of-arrays:  each property
+# (position, velocity, gravity, rotation, alpha, ...) lives in its own typed array, indexed by slot.
+# Each frame we step every live particle in one loop, rather than calling a method (and an
+# IntervalController) per particle object.
+#
+# Dead particles free their slots onto a free list; new particles reuse those slots first, so
+# we never rebuild any list.  A system never holds more than its capacity.  When it's full, new
+# particles take over the slots of (roughly) the oldest particles instead.
+#
+# Slot numbers stay valid until the particle dies, so a caller can adjust a particle it just
+# created (see get_new_slots / set_delay).
+class ParticleSystem:
 
-    def __init__(self, x, y, color, color_range):
+    def __init__(self, capacity = PARTICLE_SYSTEM_CAPACITY):
 
-        Particle.__init__(self, x, y, -1, -1, -1) # I don't need the tile/index params
+        # Maximum number of live particles
+        self.capacity = capacity
 
-        # Base color
-        self.color = color
+        # Is each slot alive?
+        self.live = array("b", [0]) * capacity
 
-        # Flickering colorcles
-        self.color_range = color_range
+        # Position, velocity, gravity
+        self.x = array("d", [0.0]) * capacity
+        self.y = array("d", [0.0]) * capacity
 
-    def render(self, sx, sy, window_controller):
+        self.dx = array("d", [0.0]) * capacity
+        self.dy = array("d", [0.0]) * capacity
+
+        self.gravity = array("d", [0.0]) * capacity
+
+        # Rotation
+        self.degrees = array("d", [0.0]) * capacity
+        self.rotational_speed = array("d", [0.0]) * capacity
+
+        # Alpha, and how long to wait before fading
+        self.alpha = array("d", [0.0]) * capacity
+        self.alpha_wait = array("i", [0]) * capacity
+
+        # Optional delay before a particle starts moving
+        self.delay = array("i", [0]) * capacity
+
+        # Which tile (and which piece of the tile) each particle shows
+        self.tile = array("i", [0]) * capacity
+        self.index_x = array("i", [0]) * capacity
+        self.index_y = array("i", [0]) * capacity
+
+
+        # How many slots have we handed out (live or free)?  We only ever need to look at slots below this mark.
+        self.size = 0
+
+        # How many particles are alive?
+        self.count = 0
+
+        # Slots (below the size mark) that we can reuse
+        self.free = []
+
+        # When full, we recycle slots in order, starting from here
+        self.cursor = 0
+
+        # Slots created since the last update
+        self.new_slots = []
+
+
+    # Get the number of live particles
+    def get_count(self):
+
+        return self.count
+
+
+    # Get the slots of the particles created since the last update (e.g. to delay the particles a dig just created)
+    def get_new_slots(self):
+
+        return self.new_slots
+
+
+    # Set a delay on the particle in a given slot
+    def set_delay(self, slot, amount):
+
+        self.delay[slot] = amount
+
+
+    # Claim a slot for a new particle, returning the slot
+    def allocate(self):
+
+        # Reuse a free slot?
+        if ( len(self.free) > 0 ):
+
+            slot = self.free.pop()
+
+        # Use a new slot?
+        elif (self.size < self.capacity):
+
+            slot = self.size
+            self.size += 1
+
+        # We're full.  Replace an existing particle.
+        else:
+
+            slot = self.cursor
+
+            self.cursor = (self.cursor + 1) % self.capacity
+
+            # One fewer particle (for a moment)
+            self.count -= 1
+
+
+        # Mark slot alive
+        self.live[slot] = 1
+        self.count += 1
+
+        # Track new slots
+        self.new_slots.append(slot)
+
+        # Return slot
+        return slot
+
+
+    # Free a given slot
+    def kill(self, slot):
+
+        self.live[slot] = 0
+        self.count -= 1
+
+        self.free.append(slot)
+
+
+    # Start fresh once every particle has died
+    def reset_if_empty(self):
+
+        if (self.count == 0):
+
+            self.size = 0
+            self.free = []
+            self.cursor = 0
+
+
+    # Set up the motion of a given slot the same way a new Particle sets itself up
+    def randomize_motion(self, slot):
+
+        self.gravity[slot] = PARTICLE_SPAWN_GRAVITY + (random.random() * random.randint(-PARTICLE_SPAWN_GRAVITY_VARIANCE, PARTICLE_SPAWN_GRAVITY_VARIANCE))
+
+        # I really don't want dx == 0 particles...
+        dx = 0 + (random.random() * 3)
+
+        if (random.randint(0, 10) <= 5):
+            dx *= -1
+
+        self.dx[slot] = dx
+        self.dy[slot] = 0
+
+        self.rotational_speed[slot] = PARTICLE_ROTATIONAL_SPEED + (random.random() * random.randint(0, PARTICLE_ROTATIONAL_SPEED_VARIANCE))
+
+        if (dx < 0):
+            self.rotational_speed[slot] *= -1
+
+        self.degrees[slot] = 0
+
+        # Full opacity (for a moment), no delay
+        self.alpha[slot] = 1.0
+        self.alpha_wait[slot] = PARTICLE_ALPHA_WAIT
+
+        self.delay[slot] = 0
+
+
+    # Create a particle showing a given piece (index_x, index_y) of a given tile.  Returns the new particle's slot.
+    def spawn(self, x, y, tile, index_x, index_y):
+
+        slot = self.allocate()
+
+        self.x[slot] = x + (index_x * PARTICLE_WIDTH)
+        self.y[slot] = y + (index_y * PARTICLE_HEIGHT)
+
+        self.tile[slot] = tile
+
+        self.index_x[slot] = index_x
+        self.index_y[slot] = index_y
+
+        self.randomize_motion(slot)
+
+        # Return slot
+        return slot
 
-        color = (
-            self.color[0] + random.randint(-self.color_range[0], self.color_range[1]),
-            self.color[1] + random.randint(-self.color_range[1], self.color_range[2]),
-            self.color[2] + random.randint(-self.color_range[1], self.color_range[2]),
-            self.color[3]
+
+    # Step every live particle forward one frame, freeing the slots of any that die
+    def process(self):
+
+        # Anything we created before this update is no longer new
+        del self.new_slots[:]
+
+        # Local references, for speed
+        (live, x, y, dx, dy, gravity, degrees, rotational_speed, alpha, alpha_wait, delay) = (
+            self.live, self.x, self.y, self.dx, self.dy, self.gravity, self.degrees, self.rotational_speed, self.alpha, self.alpha_wait, self.delay
         )
 
-        window_controller.get_geometry_controller().draw_rect(sx + self.get_x(), sy + self.get_y(), COLORCLE_WIDTH, COLORCLE_HEIGHT, color)
+        for slot in range(0, self.size):
+
+            if ( live[slot] ):
+
+                # Enforce delay?
+                if (delay[slot] > 0):
+
+                    delay[slot] -= 1
+
+                    continue
+
+
+                # Let the particles exist at full opacity for a moment before fading...
+                if (alpha_wait[slot] > 0):
+
+                    alpha_wait[slot] -= 1
+
+                elif (alpha[slot] > 0):
+
+                    alpha[slot] = max(0.0, alpha[slot] - PARTICLE_FADE_SPEED)
+
+
+                # Movement
+                x[slot] += dx[slot]
+                y[slot] += (dy[slot] + gravity[slot])
+
+                # Accelerate gravity
+                gravity[slot] = min(PARTICLE_MAX_GRAVITY, gravity[slot] + PARTICLE_RATE_OF_GRAVITY)
+
+
+                # Rotation
+                degrees[slot] += rotational_speed[slot]
+
+                if (degrees[slot] < 0):
+                    degrees[slot] += 360
+
+                elif (degrees[slot] >= 360):
+                    degrees[slot] -= 360
+
+
+                # Gone?
+                if ( (y[slot] >= PARTICLE_MAX_Y) or (alpha[slot] <= 0) ):
+
+                    self.kill(slot)
+
+        # Start fresh if we're out of particles
+        self.reset_if_empty()
+
+
+    def render(self, sx, sy, tilesheet_sprite, window_controller):
+
+        # Fetch gfx controller
+        gfx_controller = window_controller.get_gfx_controller()
+
+        for slot in range(0, self.size):
+
+            if ( self.live[slot] ):
+
+                gfx_controller.draw_particle(sx + int( self.x[slot] ), sy + int( self.y[slot] ), self.index_x[slot], self.index_y[slot], self.degrees[slot], self.tile[slot], tilesheet_sprite, (255, 255, 255, self.alpha[slot]))
+
+
+# A batch of colorcles:  small colored squares (e.g. explosion sparks) that move just like particles.  Each has its own (flickering) color.
+class ColorcleSystem(ParticleSystem):
+
+    def __init__(self, capacity = COLORCLE_SYSTEM_CAPACITY):
 
-class Numbercle(Particle):
+        ParticleSystem.__init__(self, capacity)
 
-    def __init__(self, x, y, number):
+        # Base color and flicker range for each slot
+        self.colors = [None] * capacity
+        self.color_ranges = [None] * capacity
 
-        Particle.__init__(self, x, y, -1, -1, -1) # I'm going to ignore the tile/index params here, too...
 
-        # Number
-        self.number = number
+    # Create a colorcle with a given color and flicker range.  Returns the new colorcle's slot.
+    def spawn(self, x, y, color, color_range):
 
-        # lifespan
-        self.lifespan = NUMBERCLE_LIFESPAN
+        # Colorcles don't use the tile/index params
+        slot = ParticleSystem.spawn(self, x, y, -1, -1, -1)
 
+        self.colors[slot] = color
+        self.color_ranges[slot] = color_range
 
-        # Numbercles will have a dy just like particles have a dx; they won't have any gravity...
-        self.dy = 0 + (random.random() * 3)
+        # Return slot
+        return slot
+
+
+    def render(self, sx, sy, window_controller):
+
+        # Fetch geometry controller
+        geometry_controller = window_controller.get_geometry_controller()
+
+        for slot in range(0, self.size):
+
+            if ( self.live[slot] ):
+
+                # Convenience
+                (color, color_range) = (
+                    self.colors[slot],
+                    self.color_ranges[slot]
+                )
+
+                geometry_controller.draw_rect(
+                    sx + int( self.x[slot] ),
+                    sy + int( self.y[slot] ),
+                    COLORCLE_WIDTH,
+                    COLORCLE_HEIGHT,
+                    (
+                        color[0] + random.randint(-color_range[0], color_range[1]),
+                        color[1] + random.randint(-color_range[1], color_range[2]),
+                        color[2] + random.randint(-color_range[1], color_range[2]),
+                        color[3]
+                    )
+                )
+
+
+# A batch of numbercles:  tiny numbers / symbols (e.g. the hacking and fright skill effects) that drift in a
+# straight line (no gravity) and fade out over a fixed lifespan.
+class NumbercleSystem(ParticleSystem):
+
+    def __init__(self, capacity = NUMBERCLE_SYSTEM_CAPACITY):
+
+        ParticleSystem.__init__(self, capacity)
+
+        # Which number each slot shows, and how long it has left
+        self.number = array("i", [0]) * capacity
+        self.lifespan = array("i", [0]) * capacity
+
+
+    # Create a numbercle showing a given number.  Returns the new numbercle's slot.
+    def spawn(self, x, y, number):
+
+        # Numbercles ignore the tile/index params, too
+        slot = ParticleSystem.spawn(self, x, y, -1, -1, -1)
+
+        self.number[slot] = number
+        self.lifespan[slot] = NUMBERCLE_LIFESPAN
+
+
+        # Numbercles have a dy just like particles have a dx
+        dy = 0 + (random.random() * 3)
 
         if (random.randint(0, 10) <= 5):
-            self.dy *= -1
+            dy *= -1
 
-    def process(self, p_map):
+        self.dy[slot] = dy
+
+        # Return slot
+        return slot
+
+
+    # Step every live numbercle forward one frame, freeing the slots of any that expire
+    def process(self):
+
+        # Anything we created before this update is no longer new
+        del self.new_slots[:]
+
+        # Local references, for speed
+        (live, x, y, dx, dy, degrees, rotational_speed, lifespan) = (
+            self.live, self.x, self.y, self.dx, self.dy, self.degrees, self.rotational_speed, self.lifespan
+        )
+
+        for slot in range(0, self.size):
+
+            if ( live[slot] ):
+
+                # Movement
+                x[slot] += dx[slot]
+                y[slot] += dy[slot]
 
-        self.x += self.dx
-        self.y += self.dy
 
+                # Rotation
+                degrees[slot] += rotational_speed[slot]
 
-        self.degrees += self.rotational_speed
+                if (degrees[slot] < 0):
+                    degrees[slot] += 360
 
-        if (self.degrees < 0):
-            self.degrees += 360
+                elif (degrees[slot] >= 360):
+                    degrees[slot] -= 360
 
-        elif (self.degrees >= 360):
-            self.degrees -= 360
 
+                # Expire?
+                lifespan[slot] -= 1
 
-        self.lifespan -= 1
+                if (lifespan[slot] <= 0):
+
+                    self.kill(slot)
+
+        # Start fresh if we're out of numbercles
+        self.reset_if_empty()
 
-        if (self.lifespan <= 0):
-            self.state = False
 
     def render(self, sx, sy, numbers_sprite, window_controller):
 
-        # Compute alpha based on lifespan
-        alpha = ( self.lifespan / float(NUMBERCLE_LIFESPAN) ) - 0.25 # max of 0.75
+        # Fetch gfx controller
+        gfx_controller = window_controller.get_gfx_controller()
+
+        for slot in range(0, self.size):
+
+            if ( self.live[slot] ):
 
-        # Don't go below 0
-        if (alpha < 0):
-            alpha = 0
+                # Compute alpha based on lifespan (max of 0.75), but don't go below 0
+                alpha = max( 0, ( self.lifespan[slot] / float(NUMBERCLE_LIFESPAN) ) - 0.25 )
 
-        window_controller.get_gfx_controller().draw_sprite(sx + self.get_x(), sy + self.get_y(), NUMBERCLE_WIDTH, NUMBERCLE_HEIGHT, numbers_sprite, frame = self.number, degrees = self.degrees, gl_color = (1, 1, 1, alpha))
+                gfx_controller.draw_sprite(sx + int( self.x[slot] ), sy + int( self.y[slot] ), NUMBERCLE_WIDTH, NUMBERCLE_HEIGHT, numbers_sprite, frame = self.number[slot], degrees = self.degrees[slot], gl_color = (1, 1, 1, alpha))
@@ -43,6 +43,32 @@ def handle_error(s):
     log2(s)
 
 
+# The state of the statement the script interpreter is currently evaluating.  Query objects that
+# behave differently on a statement's first frame (e.g. a planar shift) check the frame count here.
+class ExecutionContext:
+
+    def __init__(self):
+
+        # How many times have we evaluated the current statement (1 on its first frame)?
+        self.frames = 0
+
+
+    # Set the current statement's frame count
+    def set_frames(self, frames):
+
+        self.frames = frames
+
+
+    # Get the current statement's frame count
+    def get_frames(self):
+
+        return self.frames
+
+
+# Global execution context
+execution_context = ExecutionContext()
+
+
 class Generic:
 
     def __init__(self):
@@ -51,7 +77,7 @@ class Generic:
 
     def evaluate(self, command, params, control_center, universe):
 
-        logn( "script object debug", "BASE command %s, params %s" % (command, params) )
+        logn( "script object debug", "BASE command", command, "params", params )
 
         # Validate
         if (command in self.commands):
@@ -913,6 +939,23 @@ class Base(Generic):
             return "0:00"
 
 
+# Base holds no state beyond its command table, so every statement shares one Base query object
+shared_base = Base()
+
+# Get the Base callback for a given command (or None, if Base doesn't know the command)
+def get_base_callback(command):
+
+    # Validate
+    if (command in shared_base.commands):
+
+        # Return callback
+        return shared_base.commands[command]["callback"]
+
+    else:
+
+        return None
+
+
 # A query result class that offers access to the window controller
 class Window(Generic):
 
@@ -1467,7 +1510,7 @@ class SessionVariable(Generic):
 
 
             # When not numeric, return as a string wrapped in single quotes
-            if ( not is_numeric(value) ):
+            if ( not self.handle.is_numeric() ):
 
                 # Wrap in quotes
                 return "'%s'" % value
@@ -1491,10 +1534,10 @@ class SessionVariable(Generic):
             value = 0
 
             # Validate that the value is numeric
-            if ( is_numeric( self.handle.get_value() ) ):
+            if ( self.handle.is_numeric() ):
 
                 # Cast to a float, why not
-                value = float( self.handle.get_value() )
+                value = self.handle.get_float()
 
             # Return value
             return value
@@ -2451,7 +2494,7 @@ class Plane(Generic):
             # goes to the highest plane.
             #if (e.cached_result != "setup-complete"):
             #if (not self.preprocessing_complete):
-            if ( int( universe.get_session_variable("tmp.link.frames").get_value() ) == 1 ):
+            if ( execution_context.get_frames() == 1 ):
 
                 # Implicitly set map status to cutscene
                 m.cutscene_on()
@@ -2774,7 +2817,7 @@ class Plane(Generic):
 
                 # On the first frame, we should flag the plane as sliding and such
                 #if (e.cached_result != "done"):
-                if ( int( universe.get_session_variable("tmp.link.frames").get_value() ) == 1 ):
+                if ( execution_context.get_frames() == 1 ):
 
                     # Activate flags (?)
                     sliding_plane.is_sliding = True
@@ -2839,7 +2882,7 @@ class Plane(Generic):
 
                 # First frame flag fun
                 #if (e.cached_result != "done"):
-                if ( int( universe.get_session_variable("tmp.link.frames").get_value() ) == 1 ):
+                if ( execution_context.get_frames() == 1 ):
 
                     sliding_plane.is_sliding = True
 
@@ -4419,24 +4462,15 @@ class Trigger(Generic):
                     universe.get_active_map().dig_tile_at_tile_coords( self.handle.get_tx(), self.handle.get_ty(), purge = False, scripted_dig = True, duration_multiplier = 1, force_dig = True )
 
 
-                    # Get all map particles (newly created by last dig)
+                    # Get the map's particle system
                     particles = universe.get_active_map().get_particles()
 
-                    # Validate at least 9 particles exist (standard number)
-                    if ( len(particles) >= 9 ):
-
-                        # Set range
-                        (a, b) = (
-                            len(particles) - 9,
-                            len(particles)
-                        )
-
-                        # Add a delay to the 9 newest particles
-                        for i in range(a, b):
+                    # Add a delay to the (up to 9) particles the dig just created
+                    for slot in particles.get_new_slots()[-9:]:
 
-                            # Delay.  When the player returns from a puzzle/challenge room, the screen
-                            # needs to finish fading in; I want the player to have a good view of the door "exploding."
-                            particles[i].set_delay(120)
+                        # Delay.  When the player returns from a puzzle/challenge room, the screen
+                        # needs to finish fading in; I want the player to have a good view of the door "exploding."
+                        particles.set_delay(slot, 120)
 
 
                     # Now repeat the same dig with purge enabled (we will not see an animation, and the tile shall not return)
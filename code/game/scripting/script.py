@@ -1,11 +1,20 @@
+import os
 import sys
 
 import re
 import copy
+import tokenize
+import marshal
+import hashlib
+import cPickle
+import new
+import types
+
+from StringIO import StringIO
 
 import objects
 
-from code.utils.common import log, log2, logn
+from code.utils.common import log, log2, logn, ensure_path_exists
 
 from code.constants.scripting import *
 
@@ -29,6 +38,281 @@ def handle_error(s):
     log2(s)
 
 
+# Conditional expressions hold a placeholder (@^statementN$@) for each script call within them.
+# At runtime, we evaluate each call and splice its return value (as text) into the placeholder, then
+# eval() the result.  Script calls return Python literals (e.g. 3, 'active'), so for most conditions
+# we can instead compile the expression once, with a variable in place of each placeholder, and pass in
+# the Python value of each return value.  CompiledCondition handles both approaches:  it uses the compiled
+# code when it safely can, and splices / evals otherwise.
+class CompiledCondition:
+
+    def __init__(self, condition, count):
+
+        # Original condition (with placeholders)
+        self.condition = condition
+
+        # Number of placeholders
+        self.count = count
+
+        # Placeholder names, in order
+        self.placeholders = [ "@^statement%d$@" % (i + 1) for i in range(0, count) ]
+
+        # Compiled code, taking a variable (_1, _2, etc.) for each placeholder.
+        # None if we can't compile this condition safely; we'll splice and eval instead.
+        self.code = self.compile()
+
+
+    # Compiled conditions never change; every copy can share one
+    def __deepcopy__(self, memo):
+
+        return self
+
+
+    # Code objects don't pickle; we pickle the condition itself...
+    def __getstate__(self):
+
+        return (self.condition, self.count)
+
+
+    # ... and share the compiled condition when we unpickle
+    def __setstate__(self, state):
+
+        self.__dict__.update( get_compiled_condition( state[0], state[1] ).__dict__ )
+
+
+    # Compile the condition, if we can do so safely.  Returns a code object or None.
+    def compile(self):
+
+        # Replace each placeholder with a variable
+        source = self.condition
+
+        for i in range(0, self.count):
+
+            source = source.replace( self.placeholders[i], "_%d" % (i + 1) )
+
+        # Variable names we expect to see
+        variables = set( "_%d" % (i + 1) for i in range(0, self.count) )
+
+        # Tokenize the expression
+        try:
+
+            tokens = list( tokenize.generate_tokens( StringIO(source).readline ) )
+
+        except:
+
+            return None
+
+
+        for i in range(0, len(tokens)):
+
+            (token_type, token_string) = (tokens[i][0], tokens[i][1])
+
+            # Only allow our variables, operators, and literals.  Any other name (e.g. "this") might
+            # depend on the scope the legacy eval() runs in.
+            if (token_type == tokenize.NAME):
+
+                if (token_string in variables):
+
+                    # A placeholder must stand on its own as an operand (e.g. not "this.@^statement1$@"),
+                    # or else the spliced text might merge with its neighbors into something other than a value.
+                    if ( (i > 0) and self.merges(tokens[i - 1], tokens[i], (".",)) ):
+
+                        return None
+
+                    elif ( (i + 1 < len(tokens)) and self.merges(tokens[i + 1], tokens[i], (".", "(", "[")) ):
+
+                        return None
+
+                elif ( not (token_string in ("and", "or", "not", "in", "is", "True", "False", "None")) ):
+
+                    return None
+
+            # A placeholder within a string literal would splice into the string
+            elif ( (token_type == tokenize.STRING) and ( "@^statement" in token_string ) ):
+
+                return None
+
+
+        # Compile
+        try:
+
+            return compile( source.strip(), "<condition>", "eval" )
+
+        except:
+
+            return None
+
+
+    # Check whether spliced text at a given placeholder token might merge with a given neighboring token
+    # (e.g. adjacent names / numbers, implicit string concatenation, attribute access), given a list of
+    # operators that don't apply to a placeholder the way they'd apply to the spliced text.
+    def merges(self, neighbor, token, operators):
+
+        # Adjacent strings concatenate, even with whitespace between them
+        if (neighbor[0] == tokenize.STRING):
+
+            return True
+
+        # Names and numbers run together without whitespace
+        elif ( neighbor[0] in (tokenize.NAME, tokenize.NUMBER) ):
+
+            return ( (neighbor[3] == token[2]) or (neighbor[2] == token[3]) )
+
+        # Check operator
+        elif (neighbor[0] == tokenize.OP):
+
+            return (neighbor[1] in operators)
+
+        # Anything else (e.g. end of expression) is fine
+        else:
+
+            return False
+
+
+    # Convert each of the given evaluated values to the text we'd splice in for it
+    def get_texts(self, values):
+
+        # Anything falsy (None, "", 0) becomes 0
+        return [ ( "%s" % value ) if (value) else "0" for value in values ]
+
+
+    # Splice the given texts into the condition
+    def splice(self, texts):
+
+        condition = self.condition
+
+        for i in range(0, self.count):
+
+            condition = condition.replace( self.placeholders[i], texts[i] )
+
+        # Return resolved condition
+        return condition
+
+
+    # Check whether the condition holds for the given evaluated values (one per placeholder).
+    # An optional scope (hash) provides local names for spliced conditions we can't compile.
+    def evaluate(self, values, scope = {}):
+
+        # Convenience
+        texts = self.get_texts(values)
+
+        # Compiled?
+        if (self.code):
+
+            # Track variables
+            variables = {}
+
+            for i in range(0, self.count):
+
+                (value, valid) = get_condition_literal( texts[i] )
+
+                if (valid):
+
+                    variables[ "_%d" % (i + 1) ] = value
+
+                # Only simple literals behave the same as spliced text; otherwise, splice
+                else:
+
+                    variables = None
+                    break
+
+            # Evaluate the compiled code
+            if (variables != None):
+
+                try:
+
+                    return bool( eval(self.code, {}, variables) )
+
+                except:
+
+                    """ DEBUG check """
+                    if (DEBUG):
+
+                        # Save error
+                        handle_error( "Eval error:  %s" % self.splice(texts) )
+                    """ End DEBUG """
+
+                    return False
+
+
+        # Splice and eval
+        try:
+
+            return bool( eval( self.splice(texts), globals(), scope ) )
+
+        except:
+
+            """ DEBUG check """
+            if (DEBUG):
+
+                # Save error
+                handle_error( "Eval error:  %s" % self.splice(texts) )
+            """ End DEBUG """
+
+            return False
+
+
+# Compiled conditions, keyed by (condition, placeholder count)
+compiled_conditions = {}
+
+# Get the CompiledCondition for a given condition with a given number of placeholders
+def get_compiled_condition(condition, count):
+
+    # Key
+    key = (condition, count)
+
+    # Compile each condition once
+    if ( not (key in compiled_conditions) ):
+
+        compiled_conditions[key] = CompiledCondition(condition, count)
+
+    # Return compiled condition
+    return compiled_conditions[key]
+
+
+# Simple literals:  unsigned numbers, quoted strings (without escapes or nested quotes), and True / False / None
+CONDITION_LITERAL_PATTERN = re.compile( "^(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+|'[^'\\\n]*'|\"[^\"\\\n]*\"|True|False|None)$" )
+
+# The Python value for each evaluated text we've seen, keyed by text
+condition_literals = {}
+
+# Get the Python value of a given evaluated text, if it's a simple literal (i.e. safe to pass in place of the spliced text).
+# Returns (value, valid).
+def get_condition_literal(text):
+
+    # Check cache
+    if (text in condition_literals):
+
+        return condition_literals[text]
+
+
+    # Assume
+    result = (None, False)
+
+    # Only simple literals
+    if ( CONDITION_LITERAL_PATTERN.match(text) ):
+
+        try:
+
+            result = ( eval(text, {}), True )
+
+        except:
+
+            pass
+
+
+    # Don't let the cache grow without bound (e.g. timers)
+    if ( len(condition_literals) >= CONDITION_LITERAL_CACHE_SIZE ):
+
+        condition_literals.clear()
+
+    # Cache result
+    condition_literals[text] = result
+
+    # Return result
+    return result
+
+
 class Script:
 
     def __init__(self, s):
@@ -336,6 +620,348 @@ class Script:
         #    print self.statements[i].evaluatecontrol_center, universe)
 
 
+# Process-wide cache of parsed scripts, keyed by an md5 hash of each script's source.  Parsing a script
+# (regular expressions, placeholder substitution, expression parsing) costs far more than copying an already
+# parsed statement tree, so we parse each distinct source once and keep a pickled copy of the result.  Every
+# request unpickles a fresh Script, so each caller still gets its own cursor / runtime state (as if it had
+# parsed the source itself).  Maps that share a script (or a map we return to) never parse it again.
+#
+# Optionally (see the "script cache" flag in user/flags.xml), we also keep each parsed script in a cache
+# folder on disk, so that later sessions can skip parsing as well.  Cache files never hold pickles (unpickling
+# can run arbitrary code); like XMLCache, we marshal a plain version of the statement tree (see flatten), and
+# rebuild only the script classes we know of.  marshal itself isn't hardened against malicious data, though,
+# so the cache folder should be no more writable than the game's own files.
+class ScriptCache:
+
+    # Bump this whenever the parser (or the classes it builds) changes in a way that affects parsed scripts
+    VERSION = 3
+
+    def __init__(self):
+
+        # Pickled scripts, keyed by source hash
+        self.scripts = {}
+
+        # Disk cache disabled by default
+        self.enabled = False
+
+        # Cache folder
+        self.path = None
+
+        # Track cache hits (memory, disk) and misses (parses)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+
+    # Enable the on-disk cache, storing cache files in a given folder
+    def enable(self, path):
+
+        # Make sure the folder exists
+        ensure_path_exists(path)
+
+        # Set path
+        self.path = path
+
+        # Enable
+        self.enabled = True
+
+        # For chaining
+        return self
+
+
+    # Disable the on-disk cache.  Existing cache files remain on disk.
+    def disable(self):
+
+        # Disable
+        self.enabled = False
+
+        # For chaining
+        return self
+
+
+    # Check whether the on-disk cache is enabled
+    def is_enabled(self):
+
+        return self.enabled
+
+
+    # Forget every script we've cached in memory
+    def clear(self):
+
+        self.scripts.clear()
+
+        # For chaining
+        return self
+
+
+    # Get cache hit / miss counts
+    def get_stats(self):
+
+        return {
+            "hits": self.hits,
+            "disk-hits": self.disk_hits,
+            "misses": self.misses,
+            "scripts": len(self.scripts)
+        }
+
+
+    # Reset cache hit / miss counts
+    def reset_stats(self):
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+
+    # Calculate the key for a given script source
+    def get_key_for_source(self, s):
+
+        # Hash bytes
+        if ( isinstance(s, unicode) ):
+
+            s = s.encode("utf-8")
+
+        return hashlib.md5(s).hexdigest()
+
+
+    # Get the cache file path for a given key
+    def get_cache_path_for_key(self, key):
+
+        return os.path.join(
+            self.path,
+            "%s.scriptc" % key
+        )
+
+
+    # Get a freshly built Script for a given source string, parsing the source only if we've never seen it before
+    def get_script(self, s):
+
+        # Key
+        key = self.get_key_for_source(s)
+
+        # Already in memory?
+        if (key in self.scripts):
+
+            # Hit
+            self.hits += 1
+
+        else:
+
+            # Try the disk cache
+            script = self.load(key) if (self.enabled) else None
+
+            # Hit?
+            if (script != None):
+
+                self.disk_hits += 1
+
+            # Parse the source
+            else:
+
+                # Miss
+                self.misses += 1
+
+                script = Script(s)
+
+                # Remember for future sessions
+                if (self.enabled):
+
+                    self.save(key, script)
+
+            # Keep in memory
+            self.scripts[key] = cPickle.dumps(script, 2)
+
+
+        # Return a fresh copy
+        return cPickle.loads( self.scripts[key] )
+
+
+    # Get the classes a cached script may contain, by name.  We never rebuild any other class from a cache file.
+    def get_cacheable_classes(self):
+
+        return {
+            "Script": Script,
+            "Statement": Statement,
+            "StatementLink": StatementLink,
+            "CompiledCondition": CompiledCondition
+        }
+
+
+    # Convert a given value from a parsed script into nested tuples that marshal can store.  Each list / tuple / dict /
+    # object becomes a tagged tuple; a list, dict or object we've already converted becomes a reference to it,
+    # so that shared values stay shared (as they would in a pickle).  Raises ValueError for any other kind of value.
+    def flatten(self, o, memo):
+
+        # Convenience
+        t = type(o)
+
+        # Plain values store as-is
+        if ( t in (types.NoneType, bool, int, long, float, str, unicode) ):
+
+            return o
+
+        # Tuples can't refer to themselves; convert each item
+        elif (t == tuple):
+
+            return ( "t", tuple( self.flatten(item, memo) for item in o ) )
+
+        # Seen this list / dict / object before?
+        elif ( id(o) in memo ):
+
+            return ( "r", memo[ id(o) ][0] )
+
+
+        # Number each list / dict / object in the order we first see it.  (We keep a reference to each, so that
+        # a temporary value, such as a state dict, can't free up its id for another value to reuse.)
+        memo[ id(o) ] = ( len(memo), o )
+
+        if (t == list):
+
+            return ( "l", [ self.flatten(item, memo) for item in o ] )
+
+        elif (t == dict):
+
+            return ( "d", [ ( self.flatten(key, memo), self.flatten(o[key], memo) ) for key in o ] )
+
+        elif ( (t == types.InstanceType) and ( self.get_cacheable_classes().get(o.__class__.__name__) == o.__class__ ) ):
+
+            # Same state we'd pickle
+            return ( "o", o.__class__.__name__, self.flatten( o.__getstate__() if hasattr(o, "__getstate__") else o.__dict__, memo ) )
+
+        else:
+
+            raise ValueError( "can't cache %s" % t )
+
+
+    # Rebuild a value converted by flatten.  objects lists each list / dict / object we've rebuilt so far, in order.
+    def restore(self, o, objects):
+
+        # Plain value?
+        if ( type(o) != tuple ):
+
+            return o
+
+        # Convenience
+        tag = o[0]
+
+        if (tag == "t"):
+
+            return tuple( self.restore(item, objects) for item in o[1] )
+
+        elif (tag == "r"):
+
+            return objects[ o[1] ]
+
+        elif (tag == "l"):
+
+            # Number before rebuilding the contents
+            result = []
+            objects.append(result)
+
+            result.extend( self.restore(item, objects) for item in o[1] )
+
+            return result
+
+        elif (tag == "d"):
+
+            # Number before rebuilding the contents
+            result = {}
+            objects.append(result)
+
+            for (key, value) in o[1]:
+
+                result[ self.restore(key, objects) ] = self.restore(value, objects)
+
+            return result
+
+        elif (tag == "o"):
+
+            # Known classes only (KeyError otherwise)
+            result = new.instance( self.get_cacheable_classes()[ o[1] ] )
+            objects.append(result)
+
+            # Restore state the same way we would unpickle
+            state = self.restore( o[2], objects )
+
+            if ( hasattr(result, "__setstate__") ):
+
+                result.__setstate__(state)
+
+            else:
+
+                result.__dict__.update(state)
+
+            return result
+
+        else:
+
+            raise ValueError( "unknown tag %s" % tag )
+
+
+    # Try to read the script for a given key from disk.  Returns a Script, or None on a miss.
+    def load(self, key):
+
+        # Cache file path
+        path = self.get_cache_path_for_key(key)
+
+        # Does the cache file exist?
+        if ( os.path.exists(path) ):
+
+            try:
+
+                # Read cache file
+                f = open(path, "rb")
+                (header, data) = marshal.load(f)
+                f.close()
+
+                # Still valid?
+                if ( header == (self.VERSION, key) ):
+
+                    # Rebuild the script
+                    script = self.restore(data, [])
+
+                    # Validate
+                    if ( isinstance(script, Script) ):
+
+                        return script
+
+            # Corrupt or outdated cache file; we'll just reparse the source.
+            except:
+                pass
+
+        # Not cached
+        return None
+
+
+    # Save a given (freshly parsed) script for a given key to disk
+    def save(self, key, script):
+
+        # Cache file path
+        path = self.get_cache_path_for_key(key)
+
+        try:
+
+            # Write to a temporary file first, so that we never leave a partial cache file behind
+            f = open("%s.tmp" % path, "wb")
+            marshal.dump( ( (self.VERSION, key), self.flatten(script, {}) ), f )
+            f.close()
+
+            # Replace any previous cache file
+            if ( os.path.exists(path) ):
+                os.remove(path)
+
+            os.rename("%s.tmp" % path, path)
+
+        # Couldn't write the cache file.  No big deal.
+        except:
+
+            logn( "script error", "could not write script cache file:  %s" % path )
+
+
+# Global script cache
+script_cache = ScriptCache()
+
+
 class Statement:
 
     def __init__(self):
@@ -465,18 +1091,30 @@ class Statement:
                 # Evaluate all other methods via the object query scripting system
                 else:
 
-                    # A brutal hack to get frame count to each link **HACK
-                    universe.get_session_variable("tmp.link.frames").set_value("%d" % self.frames)
+                    # Let each link know the statement's frame count
+                    objects.execution_context.set_frames(self.frames)
 
 
-                    # Evaluate first link as a "Base" queryobject
-                    result = objects.Base().evaluate(
-                        self.links[0].method.lstrip("+"), # Strip off the plus sign, which indicates a "simultaneous" statement
-                        self.links[0].parameters,
-                        control_center,
-                        universe
-                    )
-                    logn( "script debug", "Result:  %s" % result )
+                    # Evaluate first link as a "Base" query object, using the callback we bound as we parsed the link
+                    if (self.links[0].callback):
+
+                        result = self.links[0].callback(
+                            self.links[0].parameters,
+                            control_center,
+                            universe
+                        )
+
+                    # Unknown method; let Base report it
+                    else:
+
+                        result = objects.shared_base.evaluate(
+                            self.links[0].command,
+                            self.links[0].parameters,
+                            control_center,
+                            universe
+                        )
+
+                    logn( "script debug", "Result:", result )
 
                     # Prepare to move to the 2nd link in the chain, if/a.
                     i = 1
@@ -491,7 +1129,7 @@ class Statement:
                             control_center,
                             universe
                         )
-                        logn( "script debug", "Result:  %s" % result )
+                        logn( "script debug", "Result:", result )
 
                         # Always attempt to continue to the next link
                         i += 1
@@ -502,8 +1140,8 @@ class Statement:
             # the specified "base" object instead of instantiating objects.Base()
             elif (self.links[0].type == LINK_TYPE_THIS):
 
-                # A brutal hack to get frame count to each link **HACK
-                universe.get_session_variable("tmp.link.frames").set_value("%d" % self.frames)
+                # Let each link know the statement's frame count
+                objects.execution_context.set_frames(self.frames)
 
                 # Use the given base object
                 result = base
@@ -556,12 +1194,22 @@ class StatementLink:
         # Method / property for this link
         self.method = method
 
+        # Method links know their command name (without any "simultaneous" plus sign)...
+        self.command = method.lstrip("+") if (link_type == LINK_TYPE_METHOD) else None
+
+        # ... and, when the method begins a statement, the Base callback it runs.
+        # We bind each method once, as we parse it, rather than looking it up on every evaluation.
+        self.callback = objects.get_base_callback(self.command) if (link_type == LINK_TYPE_METHOD) else None
+
         # Parameters for this link
         self.parameters = parameter_statements
 
         # Conditional links will retain the conditional script (with placeholders)
         self.condition = condition
 
+        # Conditional links compile their conditional script once, as we parse it
+        self.compiled_condition = get_compiled_condition(condition, len(parameter_statements)) if (link_type == LINK_TYPE_CONDITIONAL) else None
+
         # Conditional links will only evaluate on the first run.
         # Thereafter, they will use a cached result.
         self.cached_condition_result = None
@@ -584,6 +1232,29 @@ class StatementLink:
         self.iterator_cursor = None
 
 
+    # Bound methods don't pickle (or deep copy); we leave out the callback...
+    def __getstate__(self):
+
+        # Copy state
+        state = self.__dict__.copy()
+
+        # Rebind later
+        state.pop("callback")
+
+        # Return state
+        return state
+
+
+    # ... and bind it again when we unpickle (or copy)
+    def __setstate__(self, state):
+
+        # Restore state
+        self.__dict__.update(state)
+
+        # Rebind
+        self.callback = objects.get_base_callback(self.command) if (self.type == LINK_TYPE_METHOD) else None
+
+
     # Reset this link
     def reset(self):
 
@@ -638,63 +1309,21 @@ class StatementLink:
             # Do we need to evaluate this as a fresh condition?
             if (condition_evaluates_to_true == None):
 
-                # First, replace each placeholder in the conditional expression
-                # with the evaluated placeholders.
-                condition = self.condition
-
-                logn( "script debug", "Conditional:  ", condition )
-
-                # Replace all "parameters," each of which is a statement that forms a part of the conditional expression.
-                for i in range( 0, len(self.parameters) ):
-
-                    # Evaluate the return value of this part of the conditional expression.
-                    evaluation = self.parameters[i].evaluate(control_center, universe, base = base)
-
-                    # Validate that we got some evaluation back
-                    if (evaluation):
+                logn( "script debug", "Conditional:  ", self.condition )
 
-                        # Replace the placeholder with the return value
-                        condition = condition.replace(
-                            "@^statement%d$@" % (i + 1),
-                            "%s" % self.parameters[i].evaluate(control_center, universe, base = base)
-                        )
-
-                    # Otherwise, throw a 0 in there.  (?)
-                    else:
-
-                        condition = condition.replace(
-                            "@^statement%d$@" % (i + 1),
-                            "0"
-                        )
-
-                logn( "script debug", "Conditional resolution:  ", condition )
-
-
-                # Evaluate and cache
-                condition_evaluates_to_true = False
-
-
-                # Assume
-                result = False
-
-                # Try to evaluate
-                try:
-                    result = eval(condition)
-
-                # Record error
-                except:
-
-                    """ DEBUG check """
-                    if (DEBUG):
-
-                        # Save error
-                        handle_error( "Eval error:  %s" % condition )
-                    """ End DEBUG """
-
-
-                if (result):
-                    condition_evaluates_to_true = True
+                # Evaluate each "parameter," each of which is a statement that forms a part of the conditional expression.
+                values = [ parameter.evaluate(control_center, universe, base = base) for parameter in self.parameters ]
 
+                # Check the condition against those values
+                condition_evaluates_to_true = self.compiled_condition.evaluate(
+                    values,
+                    {
+                        "self": self,
+                        "control_center": control_center,
+                        "universe": universe,
+                        "base": base
+                    }
+                )
 
                 # Cache
                 self.cached_condition_result = condition_evaluates_to_true
@@ -68,3 +68,187 @@ class Trap:
     def get_fill_pattern(self):
 
         return self.fill_pattern
+
+
+
+# Sparse trap storage for a plane.  Most tiles never get dug, so rather than keeping a Trap object
+# for every tile, we only keep Trap objects for active dig sites.  Any other tile within the table's
+# bounds has an (implicit) default, inactive trap.  Per-frame processing and rendering then only
+# have to visit the active dig sites.
+#
+# Trap objects may be shared between tables (the master plane distributes its Trap objects to the
+# individual planes during a planar shift), so a trap's timer can run down while it sits in another
+# table.  Thus, a table may briefly hold an expired trap; we prune expired traps as we go.
+class TrapTable:
+
+    def __init__(self, width = 0, height = 0):
+
+        # Dimensions
+        self.width = width
+        self.height = height
+
+        # Trap objects for active dig sites, hashed by (tx, ty)
+        self.active = {}
+
+        # Optional listener object.  Its handle_trap_write(table, tx, ty) gets called after each
+        # write; handle_trap_change(table) gets called after a resize / pad.
+        self.listener = None
+
+
+    # Set a listener object to notify of changes
+    def set_listener(self, listener):
+
+        self.listener = listener
+
+
+    # Notify the listener (if any) of a change other than a single write
+    def notify_change(self):
+
+        if (self.listener):
+
+            self.listener.handle_trap_change(self)
+
+
+    # Get table width
+    def get_width(self):
+
+        return self.width
+
+
+    # Get table height
+    def get_height(self):
+
+        return self.height
+
+
+    # Clear the table
+    def clear(self):
+
+        # Just a convenience function, really...
+        self.resize(0, 0)
+
+
+    # Resize the table, discarding any trap that no longer fits
+    def resize(self, width, height):
+
+        # Set dimensions
+        (self.width, self.height) = (
+            max(0, width),
+            max(0, height)
+        )
+
+        # Discard out-of-bounds traps
+        for (tx, ty) in self.active.keys():
+
+            if ( (tx >= self.width) or (ty >= self.height) ):
+
+                self.active.pop( (tx, ty) )
+
+        # Notify
+        self.notify_change()
+
+
+    # "Pad" columns or rows into the table, shifting all existing traps right / down
+    def pad(self, px, py):
+
+        # Grow
+        (self.width, self.height) = (
+            self.width + px,
+            self.height + py
+        )
+
+        # Shift
+        self.active = dict( ( (tx + px, ty + py), trap ) for ( (tx, ty), trap ) in self.active.items() )
+
+        # Notify
+        self.notify_change()
+
+
+    # Get the Trap object at a given location.  Within bounds, we return a new, default Trap object for any tile
+    # without an active trap.  Out of bounds, we return default_value.
+    def read(self, tx, ty, default_value = None):
+
+        # Sanity
+        if ( (tx >= 0) and (ty >= 0) and (tx < self.width) and (ty < self.height) ):
+
+            # Active dig site?
+            if ( (tx, ty) in self.active ):
+
+                return self.active[ (tx, ty) ]
+
+            else:
+
+                return Trap()
+
+        else:
+
+            return default_value
+
+
+    # Set the Trap object at a given location.  We grow the table if we write out of bounds.
+    def write(self, tx, ty, trap):
+
+        # Sanity
+        if ( (tx >= 0) and (ty >= 0) ):
+
+            # Fit to position
+            (self.width, self.height) = (
+                max(self.width, tx + 1),
+                max(self.height, ty + 1)
+            )
+
+            # Only an active trap needs an actual Trap object; an inactive trap
+            # (or no trap at all) resets the location to the default trap.
+            if ( (trap) and ( trap.get_timer() > 0 ) ):
+
+                # Track as active
+                self.active[ (tx, ty) ] = trap
+
+            else:
+
+                # Back to default
+                self.active.pop( (tx, ty), None )
+
+            # Notify
+            if (self.listener):
+
+                self.listener.handle_trap_write(self, tx, ty)
+
+
+    # Get the timer for the trap at a given location (0 for any tile without an active trap)
+    def get_timer(self, tx, ty):
+
+        # Active dig site?
+        if ( (tx, ty) in self.active ):
+
+            return self.active[ (tx, ty) ].get_timer()
+
+        else:
+
+            return 0
+
+
+    # Get a list of (tx, ty, trap) for each active trap, in row order (top to bottom, left to right)
+    def get_active_traps(self):
+
+        # Track results
+        results = []
+
+        # Check each active dig site
+        for (tx, ty) in sorted( self.active, key = lambda (tx, ty): (ty, tx) ):
+
+            # Convenience
+            trap = self.active[ (tx, ty) ]
+
+            # Still active?
+            if ( trap.get_timer() > 0 ):
+
+                results.append( (tx, ty, trap) )
+
+            # No; the location reverts to the default trap
+            else:
+
+                self.active.pop( (tx, ty) )
+
+        # Return active traps
+        return results
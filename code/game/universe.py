@@ -28,14 +28,14 @@ from code.extensions.common import UITemplateLoaderExt, HookableExt
 
 from code.tools.xml import XMLParser, XMLNode
 
-from code.game.scripting.script import Script
+from code.game.scripting.script import script_cache
 
 from code.game.achievement import Achievement
 
-from code.utils.common import offset_rect, intersect, log, log2, logn, xml_encode, xml_decode, create_path, remove_folder, log_msg, ensure_path_exists, resize_image, coalesce
+from code.utils.common import offset_rect, intersect, log, log2, logn, xml_encode, xml_decode, create_path, remove_folder, log_msg, ensure_path_exists, resize_image, coalesce, is_numeric
 
 from code.constants.common import TILE_WIDTH, TILE_HEIGHT, CAMERA_SPEED, MAX_PERIMETER_SCROLL_X, MAX_PERIMETER_SCROLL_Y, SCREEN_WIDTH, SCREEN_HEIGHT, QUEST_STATUS_INACTIVE, QUEST_STATUS_IN_PROGRESS, QUEST_STATUS_COMPLETE, QUEST_STATUS_FAILED, SKILL_LIST, ACTIVE_SKILL_LIST, GENUS_PLAYER, GENUS_ENEMY, MODE_EDITOR, MODE_GAME, DIG_RESULT_SUCCESS, COLLISION_NONE, COLLISION_LADDER, COLLISION_MONKEYBAR, MAX_SKILL_SLOTS, MAX_ENEMY_COUNT, AI_ENEMY_INITIAL_DELAY
-from code.constants.common import FADE_CONCENTRIC, FADE_LTR, LAYER_FOREGROUND, LAYER_BACKGROUND, BACKGROUND_MAP_SCALE, BACKGROUND_MAP_PARALLAX_SCALE, SCALE_BY_LAYER, PARALLAX_BY_LAYER, EDITOR_GRID_MINOR_SIZE, EDITOR_GRID_MAJOR_SIZE, EDITOR_MAP_FRAME_THICKNESS, EDITOR_PRIMARY_FRAME_COLOR, EDITOR_SECONDARY_FRAME_COLOR
+from code.constants.common import FADE_CONCENTRIC, FADE_LTR, LAYER_FOREGROUND, LAYER_BACKGROUND, BACKGROUND_MAP_SCALE, BACKGROUND_MAP_PARALLAX_SCALE, SCALE_BY_LAYER, PARALLAX_BY_LAYER, MESSAGE_TEMPLATE_CACHE_SIZE, EDITOR_GRID_MINOR_SIZE, EDITOR_GRID_MAJOR_SIZE, EDITOR_MAP_FRAME_THICKNESS, EDITOR_PRIMARY_FRAME_COLOR, EDITOR_SECONDARY_FRAME_COLOR
 
 from code.constants.paths import UNIVERSES_PATH
 
@@ -314,6 +314,11 @@ class MapData:
 
 # Session variable wrapper.  Key these by variable name in the universe (this object just contains data on the variable).
 # Just a hash with some convenience methods.
+#
+# Values stay exactly as given (usually strings, as they appear in save files).  We count each change to the value
+# (the version), and we remember the value's numeric (int / float) reading until the value changes, so that
+# numeric reads / increments don't have to parse the string each time.  When the variable belongs to a
+# SessionStore, each change notifies anyone who subscribed to the variable's key.
 class SessionVariable:
 
     # Default variable value
@@ -325,6 +330,14 @@ class SessionVariable:
         # Current value (by default, default, of course)
         self.value = default
 
+        # How many times has the value changed?
+        self.version = 0
+
+
+        # Numeric readings of the current value (int, float, is numeric), and the version they belong to
+        self.typed_values = None
+        self.typed_version = -1
+
 
         # Most session variables reset on reboot.  Not all do, though.
         self.ignore_reboot = ignore_reboot
@@ -333,6 +346,11 @@ class SessionVariable:
         self.ignore_import = ignore_import
 
 
+        # The session store (and key) this variable belongs to, if any
+        self.store = None
+        self.key = None
+
+
         """ Debugging """
         self.name = name
 
@@ -358,26 +376,114 @@ class SessionVariable:
         return self.value
 
 
+    # Get the current version (how many times the value has changed)
+    def get_version(self):
+
+        # Return
+        return self.version
+
+
     # Set the current value
     def set_value(self, value):
 
-        if ( self.name == "net.player-limit" ):
-            if ( "%s" % value == "4" ):
-                logn( 10, "--stacktrace" )
+        # Ignore non-changes
+        if ( (value != self.value) or ( type(value) != type(self.value) ) ):
+
+            # Update
+            self.value = value
+
+            # Count change
+            self.version += 1
+
+            # Let subscribers know
+            if (self.store != None):
+
+                self.store.notify(self.key, self)
+
+
+    # Calculate (or recall) the numeric readings of the current value:  (int value or None, float value or None, is numeric?)
+    def get_typed_values(self):
+
+        # Still current?
+        if (self.typed_version != self.version):
+
+            # Assume
+            (int_value, float_value) = (None, None)
+
+            try:
+                int_value = int(self.value)
+
+            except:
+                pass
+
+            try:
+                float_value = float(self.value)
+
+            except:
+                pass
+
+            # Save
+            self.typed_values = (int_value, float_value, is_numeric( "%s" % self.value ))
+            self.typed_version = self.version
+
+
+        # Return readings
+        return self.typed_values
+
+
+    # Get the current value as an integer, or a given default if the value isn't an integer
+    def get_int(self, default = 0):
+
+        # Reading
+        value = self.get_typed_values()[0]
+
+        # Validate
+        if (value != None):
+
+            return value
+
+        else:
+
+            return default
+
+
+    # Get the current value as a float, or a given default if the value isn't a number
+    def get_float(self, default = 0.0):
+
+        # Reading
+        value = self.get_typed_values()[1]
+
+        # Validate
+        if (value != None):
+
+            return value
+
+        else:
+
+            return default
+
 
-        # Update
-        self.value = value
+    # Check whether the current value is numeric (see is_numeric)
+    def is_numeric(self):
+
+        return self.get_typed_values()[2]
 
 
     # Increment the current value
     def increment_value(self, amount):
 
         # Increment the current value.
-        # Only works on numeric values.
+        # Only works on integer values.
         try:
 
             # Get current value
-            current_value = int( self.get_value() )
+            current_value = self.get_typed_values()[0]
+
+            # Validate
+            if (current_value == None):
+
+                # Failure
+                return False
 
             # Increment, set
             self.set_value(
@@ -393,6 +499,212 @@ class SessionVariable:
             return False
 
 
+# A hash of session variables, keyed by name.  Each variable we add learns its key, and changes to any
+# variable notify the callbacks subscribed to its key.  Subscriptions live in a given hash (the universe's),
+# so that they outlast any one session store (e.g. when the universe resets or loads a dummy session).
+class SessionStore(dict):
+
+    def __init__(self, subscribers, variables = {}):
+
+        dict.__init__(self)
+
+        # Callbacks by key
+        self.subscribers = subscribers
+
+        # Add initial variables
+        for key in variables:
+
+            self[key] = variables[key]
+
+
+    # Add (or replace) a session variable
+    def __setitem__(self, key, variable):
+
+        # Bind to this store
+        variable.store = self
+        variable.key = key
+
+        dict.__setitem__(self, key, variable)
+
+        # A new variable is as good as a new value
+        self.notify(key, variable)
+
+
+    # Let everyone subscribed to a given key know that a given variable changed
+    def notify(self, key, variable):
+
+        # Any subscriber?
+        if (key in self.subscribers):
+
+            # Callbacks might unsubscribe as we go
+            for callback in list( self.subscribers[key] ):
+
+                callback(key, variable)
+
+
+# Input phrases (besides "@enter," which translates to the "interact" input) that messages can refer to
+INPUT_PHRASES = ("dig-left", "dig-right", "dig-forward", "left", "right", "up", "bomb")
+
+
+# Messages can refer to session variables ($[key]) and to input phrases (e.g. @enter, @dig-left), which translate
+# to the player's key / button for that input.  We used to translate a message by replacing each session variable's
+# reference (every variable, whether the message used it or not), then each input phrase, one after another.
+# A MessageTemplate tokenizes a message once into literal text, session variable references, and input phrases,
+# so that translating it costs only the references it actually holds.
+#
+# Replacing one reference after another can cascade (e.g. a variable's value holding another reference).  When
+# a message or a value could do that (see is_fragile and render), we fall back to replacing references one by one.
+class MessageTemplate:
+
+    # Segment types
+    LITERAL = 1
+    VARIABLE = 2
+    PHRASE = 3
+
+    # Session variable references (names without reference characters) and input phrases
+    PATTERN = re.compile( "\$\[([^\$\[\]@]*)\]|@(%s)" % "|".join( INPUT_PHRASES + ("enter",) ) )
+
+    # Any character that could begin / end a reference
+    REFERENCE_CHARACTERS = re.compile( "[\$\[\]@]" )
+
+    def __init__(self, message):
+
+        # Source message
+        self.message = message
+
+        # A list of (type, text) segments.  Variable segments hold the variable's key; phrase segments hold the input phrase.
+        self.segments = []
+
+        # When true, we can't safely render the message from its segments
+        self.fragile = False
+
+        # Tokenize
+        self.compile()
+
+
+    # Tokenize the message into segments
+    def compile(self):
+
+        # Cursor
+        pos = 0
+
+        for match in self.PATTERN.finditer(self.message):
+
+            # Literal text before the reference
+            if ( match.start() > pos ):
+
+                self.segments.append( (self.LITERAL, self.message[pos : match.start()]) )
+
+            # Session variable reference
+            if ( match.group(1) != None ):
+
+                self.segments.append( (self.VARIABLE, match.group(1)) )
+
+            # Input phrase
+            else:
+
+                self.segments.append( (self.PHRASE, match.group(2)) )
+
+            # Advance
+            pos = match.end()
+
+        # Trailing literal text
+        if ( pos < len(self.message) ):
+
+            self.segments.append( (self.LITERAL, self.message[pos:]) )
+
+
+        # A stray reference-like sequence in literal text might match an odd session variable key, and a stray "@"
+        # ahead of a reference might form an input phrase once we replace the reference.  Either way, we'll play it safe.
+        for i in range( 0, len(self.segments) ):
+
+            (segment_type, text) = self.segments[i]
+
+            if (segment_type == self.LITERAL):
+
+                if ( ( text.find("$[") >= 0 ) or ( ( text.find("@") >= 0 ) and ( i < len(self.segments) - 1 ) ) ):
+
+                    self.fragile = True
+
+
+    # Check whether we must translate this message the old way
+    def is_fragile(self):
+
+        return self.fragile
+
+
+    # Render the message, given a session (hash of SessionVariables) and a hash of input phrase translations (or None, to leave them as-is).
+    # Returns None if a variable's value could form another reference (in which case we must translate the old way).
+    def render(self, session, phrases):
+
+        # Track results
+        parts = []
+
+        for (segment_type, text) in self.segments:
+
+            # Literal text
+            if (segment_type == self.LITERAL):
+
+                parts.append(text)
+
+            # Session variable
+            elif (segment_type == self.VARIABLE):
+
+                # Known variable?
+                if (text in session):
+
+                    # Value
+                    value = session[text].get_value()
+
+                    # A value with reference characters could cascade
+                    if ( self.REFERENCE_CHARACTERS.search(value) ):
+
+                        return None
+
+                    parts.append(value)
+
+                # Unknown variables stay as they are
+                else:
+
+                    parts.append( "$[%s]" % text )
+
+            # Input phrase
+            else:
+
+                # Translate?
+                if (phrases != None):
+
+                    parts.append( phrases[text] )
+
+                else:
+
+                    parts.append( "@%s" % text )
+
+
+        # Return translated message
+        return "".join(parts)
+
+
+# Tokenized messages, keyed by message
+message_templates = {}
+
+# Get the MessageTemplate for a given message
+def get_message_template(message):
+
+    # Tokenize each message once
+    if ( not (message in message_templates) ):
+
+        # Don't let the cache grow without bound (e.g. messages holding a changing number)
+        if ( len(message_templates) >= MESSAGE_TEMPLATE_CACHE_SIZE ):
+
+            message_templates.clear()
+
+        message_templates[message] = MessageTemplate(message)
+
+    # Return template
+    return message_templates[message]
+
+
 # Quest data wrapper
 class QuestData(UITemplateLoaderExt):
 
@@ -1375,8 +1687,29 @@ class Universe(HookableExt):
         # Track game session.  Some values always exist (e.g. abilities), whereas
         # others are defined by a universe's configuration file.
 
+        # Callbacks subscribed to changes in given session variables, by key.  These outlast any one session (see SessionStore).
+        self.session_variable_subscribers = {}
+
+
+        # Input phrase translations (e.g. @enter -> the player's interact key) for the most recently used input device,
+        # along with the device and the session they came from.  We build these as we need them.
+        self.input_phrase_translations = None
+        self.input_phrase_device = None
+        self.input_phrase_session = None
+
+        # Does any translation hold an input phrase of its own?  (If so, translations cascade and we can't render messages from their tokens.)
+        self.input_phrase_cascades = False
+
+        # Rebuild the translations whenever the player changes any input's key / button
+        for device in ("keyboard", "gamepad"):
+
+            for key in INPUT_PHRASES + ("interact",):
+
+                self.subscribe_session_variable( "sys.input.%s.%s" % (device, key), self.invalidate_input_phrase_translations )
+
+
         # Note:  This is populated (default values, at least) within reset()
-        self.session = {}
+        self.session = SessionStore(self.session_variable_subscribers)
 
         # Fresh start
         self.reset()
@@ -1478,7 +1811,7 @@ class Universe(HookableExt):
         # others are defined by a universe's configuration file.
         self.session.clear()
 
-        self.session = {
+        self.session = SessionStore(self.session_variable_subscribers, {
             "app.load-from-folder": SessionVariable(""),
 
             "app.active-map-name": SessionVariable("x"),
@@ -1642,7 +1975,7 @@ class Universe(HookableExt):
             "stats.items-bought": SessionVariable("0"),
             "stats.skills-unlocked": SessionVariable("0"),
             "stats.gold-spent": SessionVariable("0")
-        }
+        })
 
         # Add a default session entry for each skill
         for skill in SKILL_LIST:
@@ -2366,7 +2699,7 @@ class Universe(HookableExt):
 
         # Save map data
         f = open( os.path.join("universes", self.name, "maps.xml"), "w" )
-        f.write( node.compile_xml_string() )
+        node.write_xml(f)
         f.close()
 
 
@@ -2392,7 +2725,7 @@ class Universe(HookableExt):
 
         # Save session variable data
         f = open( os.path.join("universes", self.name, "session.xml"), "w" )
-        f.write( node.compile_xml_string() )
+        node.write_xml(f)
         f.close()
 
 
@@ -2432,7 +2765,7 @@ class Universe(HookableExt):
 
         # Save quest data
         f = open( os.path.join("universes", self.name, "quests.xml"), "w" )
-        f.write( node.compile_xml_string() )
+        node.write_xml(f)
         f.close()
 
 
@@ -2468,7 +2801,7 @@ class Universe(HookableExt):
 
         # Save item data to disk
         f = open( os.path.join("universes", self.name, "items.xml"), "w" )
-        f.write( node.compile_xml_string() )
+        node.write_xml(f)
         f.close()
         """
 
@@ -2519,7 +2852,7 @@ class Universe(HookableExt):
     def create_dummy_session(self):
 
         # Set up a dummy session
-        dummy_session = {
+        dummy_session = SessionStore(self.session_variable_subscribers, {
             "app.active-map-name": SessionVariable(""),
 
             "core.is-gif": SessionVariable("1"),
@@ -2539,7 +2872,7 @@ class Universe(HookableExt):
             "core.gold.wallet:visible": SessionVariable("0"),       # Don't know that I really need this here
 
             "core.bombs.count": SessionVariable("10")
-        }
+        })
 
         for key in SKILL_LIST:
 
@@ -2810,6 +3143,41 @@ class Universe(HookableExt):
         return ( key in self.session )
 
 
+    # Subscribe a given callback to changes in a given session variable.  Whenever the variable's value changes,
+    # we'll call callback(key, variable).  Subscriptions survive session resets / loads.
+    def subscribe_session_variable(self, key, callback):
+
+        # First subscriber to this key?
+        if ( not (key in self.session_variable_subscribers) ):
+
+            self.session_variable_subscribers[key] = []
+
+        # Don't subscribe twice
+        if ( not (callback in self.session_variable_subscribers[key]) ):
+
+            self.session_variable_subscribers[key].append(callback)
+
+        # For chaining
+        return self
+
+
+    # Unsubscribe a given callback from changes in a given session variable
+    def unsubscribe_session_variable(self, key, callback):
+
+        # Validate
+        if ( (key in self.session_variable_subscribers) and (callback in self.session_variable_subscribers[key]) ):
+
+            self.session_variable_subscribers[key].remove(callback)
+
+            # Clean up
+            if ( len(self.session_variable_subscribers[key]) == 0 ):
+
+                self.session_variable_subscribers.pop(key)
+
+        # For chaining
+        return self
+
+
     def get_session_variable(self, key):
 
         if (key in self.session):
@@ -2896,6 +3264,73 @@ class Universe(HookableExt):
 
     def translate_session_variable_references(self, message, control_center):
 
+        # Tokenized message
+        template = get_message_template(message)
+
+        # Usually we can render the message straight from its tokens
+        if ( not template.is_fragile() ):
+
+            # Input phrase translations, if we have a control center
+            phrases = self.get_input_phrase_translations(control_center) if (control_center) else None
+
+            # Translations that hold input phrases of their own must cascade the old way
+            if ( (phrases == None) or (not self.input_phrase_cascades) ):
+
+                # Render
+                result = template.render(self.session, phrases)
+
+                # Done, unless a value forced us to translate the old way
+                if (result != None):
+
+                    return result
+
+
+        # Replace each reference, one after another
+        return self.replace_session_variable_references(message, control_center)
+
+
+    # Forget the input phrase translations (e.g. when the player changes an input's key / button).
+    # Accepts (and ignores) the (key, variable) arguments of a session variable subscription.
+    def invalidate_input_phrase_translations(self, key = None, variable = None):
+
+        self.input_phrase_translations = None
+
+
+    # Get the input phrase translations (keyed by phrase, e.g. "enter") for the input device the player most recently used
+    def get_input_phrase_translations(self, control_center):
+
+        # Keyboard?  If not, assume gamepad.
+        device = "keyboard" if ( control_center.get_input_controller().get_last_used_device() == "keyboard" ) else "gamepad"
+
+        # Rebuild for a new device or a new session
+        if ( (self.input_phrase_translations == None) or (self.input_phrase_device != device) or (self.input_phrase_session is not self.session) ):
+
+            # "@enter" translates to the interact input
+            translations = {
+                "enter": self.get_session_variable("sys.input.%s.interact" % device).get_value()
+            }
+
+            # Other inputs
+            for key in INPUT_PHRASES:
+
+                translations[key] = self.get_session_variable("sys.input.%s.%s" % (device, key)).get_value()
+
+            # Save
+            self.input_phrase_translations = translations
+            self.input_phrase_device = device
+            self.input_phrase_session = self.session
+
+            # Check for cascades
+            self.input_phrase_cascades = any( ( "%s" % value ).find("@") >= 0 for value in translations.values() )
+
+
+        # Return translations
+        return self.input_phrase_translations
+
+
+    # Translate a given message by replacing each session variable reference (for every session variable), then each input phrase, one after another
+    def replace_session_variable_references(self, message, control_center):
+
         # Replace referenced session variables
         for key in self.session:
 
@@ -5375,19 +5810,12 @@ class Universe(HookableExt):
             # Validate
             if (m):
 
-                # Do we need to compile the universe script?
-                if ( not (name in self.compiled_scripts) ):
-
-                    # Compile on-the-fly
-                    self.compiled_scripts[name] = Script( self.scripts[name] )
-
-
                 # Get the map's event controller
                 event_controller = m.get_event_controller()
 
-                # Load compiled script
+                # Load a fresh copy of the compiled script (the script cache parses each source only once)
                 event_controller.load(
-                    copy.deepcopy(self.compiled_scripts[name])
+                    script_cache.get_script( self.scripts[name] )
                 )
 
                 # Loop?
@@ -5406,8 +5834,8 @@ class Universe(HookableExt):
             # Do we need to compile this script?
             if ( not (name in self.compiled_scripts) ):
 
-                # Compile on-the-fly
-                self.compiled_scripts[name] = Script( self.scripts[name] )
+                # Compile on-the-fly (parsing only scripts we've never seen before)
+                self.compiled_scripts[name] = script_cache.get_script( self.scripts[name] )
 
 
             # Create a new, temporary event controller
@@ -5830,6 +6258,9 @@ class Universe(HookableExt):
                         entity.x = tx * TILE_WIDTH
                         entity.y = ty * TILE_HEIGHT
 
+                        # A respawn point may have moved in / out of a respawn region
+                        m.invalidate_trigger_cache()
+
                     elif (editor_controller.drag.object_type == "plane"):
 
                         plane = editor_controller.drag.object_reference
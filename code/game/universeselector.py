@@ -10,7 +10,7 @@ from code.render.glfunctions import *
 from code.controllers.intervalcontroller import IntervalController
 
 from code.tools.eventqueue import EventQueue
-from code.tools.xml import XMLParser
+from code.tools.xml import XMLReader
 
 from code.game.universe import Universe
 
@@ -681,16 +681,11 @@ class UniverseSelector(UITemplateLoaderExt):
                     # If it doesn't exist, then this universe does not exist, on the record
                     if ( os.path.exists(metadata_path) ):
 
-                        # The metadata uses the xml format
-                        f = open(metadata_path, "r")
-                        xml = f.read()
-                        f.close()
+                        # Read only the params we need from the metadata, rather than parsing the entire file
+                        params = XMLReader().find_inner_text_by_id( metadata_path, ("min-players", "max-players", "type"), ancestor_tag = "metadata" )
 
-                        # Let's parse the metadata xml
-                        root = XMLParser().create_node_from_xml(xml).find_node_by_tag("metadata")
-
-                        # Validate
-                        if (root):
+                        # Validate (skip universes whose metadata has no <metadata> node)
+                        if (params != None):
 
                             # Find the min/max player count.  Start with assumed defaults.
                             (min_players, max_players) = (1, 1) # Assumption
@@ -700,33 +695,24 @@ class UniverseSelector(UITemplateLoaderExt):
 
 
                             # Read in given min players data
-                            node = root.find_node_by_id("min-players")
-
-                            # Validate
-                            if (node):
+                            if ( "min-players" in params ):
 
                                 # Cast as int
-                                min_players = int( node.innerText )
+                                min_players = int( params["min-players"] )
 
 
                             # Read in given max players data
-                            node = root.find_node_by_id("max-players")
-
-                            # Read in given max players data
-                            if (node):
+                            if ( "max-players" in params ):
 
                                 # Cast as int
-                                max_players = int( node.innerText )
+                                max_players = int( params["max-players"] )
 
 
                             # Check for type param
-                            node = root.find_node_by_id("type")
-
-                            # Validate
-                            if (node):
+                            if ( "type" in params ):
 
                                 # Grab type param
-                                universe_type = node.innerText
+                                universe_type = params["type"]
 
 
                             # Does this universe work for a single player game?  And if so, do we want such universes?
@@ -808,26 +794,17 @@ class UniverseSelector(UITemplateLoaderExt):
                     f.close()
 
 
-                # Read in xml content
-                f = open(metadata_path, "r")
-                xml = f.read()
-                f.close()
-
-                # Parse xml
-                root = XMLParser().create_node_from_xml(xml).find_node_by_tag("metadata")
-
-
                 # Default universe title to the folder name
                 title = name
 
-                # See if the metadata defines the formal readable title
-                node = root.find_node_by_id("title")
+                # See if the metadata defines the formal readable title.  We stop reading the file once we find it.
+                params = XMLReader().find_inner_text_by_id( metadata_path, ("title",), ancestor_tag = "metadata" )
 
-                # Validate
-                if (node):
+                # Validate (a file without a <metadata> node has no title to offer)
+                if ( (params != None) and ( "title" in params ) ):
 
                     # Use the given title
-                    title = node.innerText
+                    title = params["title"]
 
 
                 # Let's create a new option wrapper using the name/title data
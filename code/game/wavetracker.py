@@ -37,6 +37,9 @@ class WaveTracker:
 
             "enemies-collect-gold": 1, # Do enemies pick up gold when they touch it?  (Usually, yes...)
 
+            "enemies-share-flow-field": 1, # Should enemies chasing a player share a single flow field toward that player (rather than each finding their own path)?
+                                           # This keeps waves with lots of enemies cheap.
+
             "bombs-free": 0 # When set to 1, the player's bomb inventory is not reduced when using a bomb, and the player can drop a bomb even if their overworld inventory is 0.
                             # When this is set, only the "bombs-used" parameter limits the number of bombs the player can use.
         }
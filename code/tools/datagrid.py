@@ -1,76 +1,119 @@
 import sys
 
+from array import array
+
 from code.utils.common import logn
 
+# A 2d grid of values.  We store the grid as one contiguous, row-major sequence.  Given a typecode
+# (e.g. "i" for tile indices), we use a typed array for storage; otherwise, we store arbitrary
+# objects in a plain list.  Either way, bulk operations (fill, blit, etc.) work a row at a time
+# using slice assignment rather than one cell at a time.
+#
+# A grid can have a listener (e.g. a Plane maintaining data derived from its tiles).  The listener's
+# handle_grid_write(grid, x, y, value) gets called after each single-cell write that stays within the
+# grid's bounds; handle_grid_change(grid) gets called after any other change (resize, bulk operation, etc.).
 class DataGrid:
 
-    def __init__(self, width = 0, height = 0):
+    def __init__(self, width = 0, height = 0, typecode = None):
         self.debug = False
 
-        # Track data in a 2d array
-        self.data = []
+        # Optional listener object
+        self.listener = None
+
+        # Typed storage (array typecode), or None for a list of arbitrary objects
+        self.typecode = typecode
+
+        # Dimensions
+        self.width = 0
+        self.height = 0
+
+        # Track data in a flat, row-major sequence
+        self.data = self.create_storage(0)
 
         # Set width, height
         self.resize(width, height)
 
 
-    # Get grid width
-    def get_width(self):
+    # Create a storage sequence of a given length, filled with a given value
+    def create_storage(self, length, value = 0):
 
-        # No data?
-        if ( len(self.data) == 0 ):
+        # Typed?
+        if (self.typecode):
 
-            # No width
-            return 0
+            return array( self.typecode, [value] ) * length
 
         else:
 
-            # All rows have equal width at all times
-            return len(self.data[0])
+            return [value] * length
+
+
+    # Convert a sequence of values into our storage type
+    def to_storage(self, values):
+
+        # Typed?
+        if (self.typecode):
+
+            return array(self.typecode, values)
+
+        else:
+
+            return list(values)
+
+
+    # Set a listener object to notify of changes
+    def set_listener(self, listener):
+
+        self.listener = listener
+
+
+    # Notify the listener (if any) of a change other than a single-cell write
+    def notify_change(self):
+
+        if (self.listener):
+
+            self.listener.handle_grid_change(self)
+
+
+    # Get grid width
+    def get_width(self):
+
+        return self.width
 
 
     # Get grid height
     def get_height(self):
 
-        return len(self.data)
+        return self.height
 
 
     # Add a new row.
     # -1 indicates to append at the end (default).
     def add_row(self, default_value, pos = -1):
 
-        # No row previously exists?
-        if ( len(self.data) == 0 ):
+        # Add row to end?
+        if ( (pos < 0) or (pos >= self.height) ):
 
-            # Add a row with no column data
-            self.data.append([])
+            # Append
+            self.data.extend( self.create_storage(self.width, default_value) )
 
-            # Return the empty row
-            return self.data[-1]
+            # New row position
+            pos = self.height
 
+        # No; insert it somewhere, probably at the start...
         else:
 
-            # Create array of equal width
-            row = []
-
-            for i in range( 0, len(self.data[0]) ):
-
-                # Use given default value
-                row.append(default_value)
-
-
-            # Add row to end?
-            if (pos < 0):
+            # Insert
+            self.data[pos * self.width : pos * self.width] = self.create_storage(self.width, default_value)
 
-                self.data.append(row)
 
-            # No; insert it somewhere, probably at the start...
-            else:
-                self.data.insert(pos, row)
+        # One taller
+        self.height += 1
 
+        # Notify
+        self.notify_change()
 
-            # Return new row
-            return self.data[pos]
+        # Return new row
+        return self.get_row_at_index(pos)
 
 
     # Clear the grid
@@ -83,71 +126,81 @@ class DataGrid:
     # Resize the grid
     def resize(self, width, height, default_value = 0):
 
-        # Shorter?
-        if ( height < self.get_height() ):
+        # Sanity.  A grid with no rows has no width.
+        (width, height) = (
+            max(0, width) if (height > 0) else 0,
+            max(0, height)
+        )
 
-            # Remove excess
-            while ( self.get_height() > height ):
+        # Same width?  Then we only need to add or trim rows at the end.
+        if (width == self.width):
 
-                # Trim
-                self.data.pop()
+            # Shorter?
+            if ( height < self.height ):
 
-        # Taller?
-        elif ( height > self.get_height() ):
+                # Trim
+                del self.data[height * width : ]
 
-            # Add new rows
-            while ( self.get_height() < height ):
+            # Taller?
+            elif ( height > self.height ):
 
-                # Add
-                self.add_row(default_value)
+                # Add new rows
+                self.data.extend( self.create_storage( (height - self.height) * width, default_value ) )
 
+        # Otherwise, we'll copy the overlapping rows into new storage
+        else:
 
-        # Thinner?
-        if ( width < self.get_width() ):
+            # New storage
+            data = self.create_storage(width * height, default_value)
 
-            # Loop rows
-            for y in range( 0, self.get_height() ):
+            # Overlap width
+            w = min(width, self.width)
 
-                # Remove excess
-                while ( len(self.data[y]) > width ):
+            # Copy each overlapping row
+            for y in range( 0, min(height, self.height) ):
 
-                    # Trim
-                    self.data[y].pop()
+                data[y * width : (y * width) + w] = self.data[y * self.width : (y * self.width) + w]
 
-        # Wider?
-        elif ( width > self.get_width() ):
+            # Replace
+            self.data = data
 
-            # Loop rows
-            for y in range( 0, self.get_height() ):
 
-                # Add columns
-                while ( len(self.data[y]) < width ):
+        # Update dimensions
+        (self.width, self.height) = (width, height)
 
-                    # Add new column
-                    self.data[y].append(default_value)
+        # Notify
+        self.notify_change()
 
 
     # "Pad" columns or rows into the grid
     def pad(self, px, py, default_value = 0):
 
-        # Add rows first
-        for i in range(0, py):
+        # Sanity
+        if ( (px > 0) or (py > 0) ):
+
+            # Remember the current data
+            (data, width, height) = (self.data, self.width, self.height)
 
-            # Insert new row at the top
-            self.add_row(default_value, pos = 0)
+            # New storage, large enough for the padding
+            self.data = self.create_storage( (width + px) * (height + py), default_value )
 
+            # Update dimensions.  A grid with no rows has no width.
+            (self.width, self.height) = (
+                (width + px) if ( (height + py) > 0 ) else 0,
+                height + py
+            )
 
-        # Add new columns
-        for y in range( 0, self.get_height() ):
+            # Copy each old row into its padded position
+            for y in range(0, height):
 
-            # Insert new data
-            for j in range(0, px):
+                self.data[ ( (py + y) * self.width ) + px : ( (py + y) * self.width ) + px + width ] = data[y * width : (y + 1) * width]
 
-                self.data[y].insert(0, default_value)
+            # Notify
+            self.notify_change()
 
 
     def read2(self, x, y):
-        return self.data[y][x]
+        return self.data[(y * self.width) + x]
 
 
     # Get recorded value at a given position on the grid
@@ -157,10 +210,10 @@ class DataGrid:
         if ( (x >= 0) and (y >= 0) ):
 
             # Validate
-            if ( (x < self.get_width()) and (y < self.get_height()) ):
+            if ( (x < self.width) and (y < self.height) ):
 
                 # Return value
-                return self.data[y][x]
+                return self.data[(y * self.width) + x]
 
             else:
 
@@ -178,40 +231,203 @@ class DataGrid:
         # Sanity
         if (x >= 0 and y >= 0):
 
-            # Should we add more rows?
-            if ( y >= self.get_height() ):
+            # Do we need to add more rows or columns?
+            if ( (x >= self.width) or (y >= self.height) ):
 
-                # Fit to height
-                self.resize( self.get_width(), y + 1, default_value )
+                # Fit to position
+                self.resize( max(self.width, x + 1), max(self.height, y + 1), default_value )
 
 
-            # Do we need to add columns?
-            if ( x >= self.get_width() ):
+            # Write to grid
+            self.data[(y * self.width) + x] = value
 
-                # Fit to width
-                self.resize( x + 1, self.get_height(), default_value )
+            # Notify
+            if (self.listener):
 
-
-            # Write to 2d array
-            self.data[y][x] = value
+                self.listener.handle_grid_write(self, x, y, value)
 
 
         if (self.debug):
-            for qy in range( 0, self.get_height() ):
-                for qx in range( 0, self.get_width() ):
-                    if ( self.data[qy][qx] == 0 ):
+            for qy in range( 0, self.height ):
+                for qx in range( 0, self.width ):
+                    if ( self.read2(qx, qy) == 0 ):
                         logn( "datagrid", "Set %d, %d = %s" % (x, y, value) )
                         logn( "datagrid", "Aborting.  Unsure why, previous debug code..." )
                         sys.exit()
 
 
-    # Get an entire row of data
+    # Clip a region to the grid's bounds.  Returns (x1, y1, x2, y2), with x2/y2 exclusive.
+    def clip_region(self, x, y, width, height):
+
+        # Negative width/height extend to the edge of the grid
+        if (width < 0):
+            width = self.width - x
+
+        if (height < 0):
+            height = self.height - y
+
+        # Clip
+        return (
+            max(0, x),
+            max(0, y),
+            min(self.width, x + width),
+            min(self.height, y + height)
+        )
+
+
+    # Set every cell in a given region (by default, the entire grid) to a given value
+    def fill(self, value, x = 0, y = 0, width = -1, height = -1):
+
+        # Clip region
+        (x1, y1, x2, y2) = self.clip_region(x, y, width, height)
+
+        # Validate
+        if ( (x2 > x1) and (y2 > y1) ):
+
+            # One row's worth of the value
+            row = self.create_storage(x2 - x1, value)
+
+            # Fill each row
+            for ty in range(y1, y2):
+
+                self.data[(ty * self.width) + x1 : (ty * self.width) + x2] = row
+
+            # Notify
+            self.notify_change()
+
+
+    # Set every cell in a given region (by default, the entire grid) to a new value from a given
+    # function.  Use this instead of fill when each cell needs its own object.
+    def generate(self, f, x = 0, y = 0, width = -1, height = -1):
+
+        # Clip region
+        (x1, y1, x2, y2) = self.clip_region(x, y, width, height)
+
+        # Fill each row
+        for ty in range(y1, y2):
+
+            self.data[(ty * self.width) + x1 : (ty * self.width) + x2] = self.to_storage( [ f() for i in range(x1, x2) ] )
+
+        # Notify
+        self.notify_change()
+
+
+    # Replace the grid's contents with a list of rows.  Rows shorter than the widest row get padded with default_value.
+    def load_rows(self, rows, default_value = 0):
+
+        # Calculate dimensions
+        (width, height) = (
+            max( [0] + [ len(row) for row in rows ] ),
+            len(rows)
+        )
+
+        # Reset storage
+        (self.width, self.height) = (width, height)
+
+        self.data = self.create_storage(0)
+
+        # Add each row
+        for row in rows:
+
+            # Row data
+            self.data.extend(row)
+
+            # Pad short rows
+            if ( len(row) < width ):
+
+                self.data.extend( self.create_storage( width - len(row), default_value ) )
+
+        # Notify
+        self.notify_change()
+
+
+    # Copy the contents of another grid into this grid, with the other grid's top-left corner at (x, y).
+    # We grow this grid as necessary to fit the other grid (though we ignore any part of the other grid
+    # that falls to the left of or above this grid).  If we provide a transparent value, then the other
+    # grid's cells with that value do not overwrite this grid's data.
+    def blit(self, grid, x, y, transparent_value = None, default_value = 0):
+
+        # Clip to the left/top edge of this grid
+        (sx, sy) = (
+            max(0, -x),
+            max(0, -y)
+        )
+
+        # Validate that we have anything to copy
+        if ( (sx < grid.width) and (sy < grid.height) ):
+
+            # Grow to fit
+            if ( ( (x + grid.width) > self.width ) or ( (y + grid.height) > self.height ) ):
+
+                self.resize( max(self.width, x + grid.width), max(self.height, y + grid.height), default_value )
+
+
+            # Copy a row at a time
+            for gy in range(sy, grid.height):
+
+                # Source and target row offsets
+                (a, b) = (
+                    (gy * grid.width),
+                    ( (y + gy) * self.width ) + x
+                )
+
+                # Source row
+                row = grid.data[a + sx : a + grid.width]
+
+                # Do we need to keep some of the existing data?
+                if ( (transparent_value != None) and (transparent_value in row) ):
+
+                    # Merge
+                    row = self.to_storage( [
+                        row[i] if ( row[i] != transparent_value ) else self.data[b + sx + i]
+                        for i in range( 0, len(row) )
+                    ] )
+
+                # Different storage types?
+                elif (grid.typecode != self.typecode):
+
+                    # Convert
+                    row = self.to_storage(row)
+
+                # Copy row
+                self.data[b + sx : b + grid.width] = row
+
+            # Notify
+            self.notify_change()
+
+
+    # Copy a region of the grid into a new grid.  Any part of the region outside of this grid gets default_value.
+    def copy_region(self, x, y, width, height, default_value = 0):
+
+        # New grid of the same storage type
+        grid = DataGrid(0, 0, typecode = self.typecode)
+
+        # Size
+        grid.resize(width, height, default_value)
+
+        # Copy (any overlapping) data into the new grid
+        grid.blit(self, -x, -y)
+
+        # The blit may have grown the new grid; trim to the requested size
+        grid.resize(width, height, default_value)
+
+        # Return new grid
+        return grid
+
+
+    # Copy the entire grid
+    def copy(self):
+
+        return self.copy_region(0, 0, self.width, self.height)
+
+
+    # Get an entire row of data.  This returns a copy of the row (a fast slice of our storage),
+    # suitable for rendering.  Changes to the returned row do not affect the grid.
     def get_row_at_index(self, index):
 
         # Sanity
-        if ( index < len(self.data) ):
+        if ( (index >= 0) and (index < self.height) ):
 
-            return self.data[index]
+            return self.data[index * self.width : (index + 1) * self.width]
 
         return []
-
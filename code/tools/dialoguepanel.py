@@ -7,7 +7,7 @@ from code.menu.menu import Menu
 from code.tools.eventqueue import EventQueue
 from code.tools.xml import XMLParser
 
-from code.game.scripting.script import Script
+from code.game.scripting.script import script_cache
 
 from code.utils.common import log, log2, logn, xml_encode, xml_decode
 
@@ -418,7 +418,7 @@ class DialoguePanelFoundation(Menu):
 
             # Add the requisite events to the new event controller
             event_controller.load(
-                Script(self.source_node.pre_script.innerText)
+                script_cache.get_script(self.source_node.pre_script.innerText)
             )
             logn( "conversation prescript", "PS Pre:  %s" % self.source_node.pre_script.innerText )
 
@@ -444,7 +444,7 @@ class DialoguePanelFoundation(Menu):
 
                 # Create a throwaway Script object
                 universe.get_active_map().get_event_controller().load(
-                    Script(self.source_node.post_script.innerText)
+                    script_cache.get_script(self.source_node.post_script.innerText)
                 )
 
 
@@ -456,7 +456,7 @@ class DialoguePanelFoundation(Menu):
 
                 # Add the requisite events to the new event controller
                 event_controller.load(
-                    Script(self.source_node.post_script.innerText)
+                    script_cache.get_script(self.source_node.post_script.innerText)
                 )
                 logn( "conversation postscript", "PS:  %s" % self.source_node.post_script.innerText )
 
@@ -1306,7 +1306,7 @@ class DialoguePanelShop(DialoguePanelFoundation):
 
                     # Add the requisite events to the new event controller
                     event_controller.load(
-                        Script(self.source_node.post_script.innerText)
+                        script_cache.get_script(self.source_node.post_script.innerText)
                     )
 
                     # Run for as long as we can
@@ -1349,7 +1349,7 @@ class DialoguePanelShop(DialoguePanelFoundation):
 
                     # Add the requisite events to the new event controller
                     event_controller.load(
-                        Script(self.source_node.post_script.innerText)
+                        script_cache.get_script(self.source_node.post_script.innerText)
                     )
 
                     # Run for as long as we can
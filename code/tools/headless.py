@@ -0,0 +1,421 @@
+import os
+import sys
+import time
+
+import pygame
+
+from code.tools.controlcenter import ControlCenter
+
+from code.controllers.windowcontroller import DebugWindowController, DEFAULT_FONT_NAME, DEFAULT_FONT_SIZE
+from code.controllers.csscontroller import CSSController
+from code.controllers.textcontroller import TextController
+
+from code.render.glfunctions import GLTextRenderer
+
+from code.game.universe import Universe
+
+from code.constants.common import *
+from code.constants.paths import REPLAYS_PATH, FONT_PATH
+
+
+# Runs a map's game logic without a window, OpenGL, sound, or saving.  We load a universe, activate one of its maps,
+# and step the map (process / drama / post_process) as fast as we can, optionally feeding the local player
+# recorded input from a replay file (see Map.process_replay_data).  Nothing ever renders.
+#
+#   python -m code.tools.headless [universe] [map name] [replay file] [ticks]
+#
+# If we have a replay file, we run until the replay runs out (unless given a tick count).
+
+
+# Default tick count when we have no replay data to follow
+HEADLESS_DEFAULT_TICKS = 1000
+
+
+# Stand-in for any controller we don't want to touch at all (e.g. sound)
+class SilentController:
+
+    def __getattr__(self, name):
+
+        return lambda *args, **kwargs: None
+
+
+# A text renderer that measures text exactly as GLTextRenderer does (same font, same character widths),
+# but never creates any texture.  Widgets size themselves by their text as they set up (e.g. a trigger's
+# prompt tooltip), so we need real measurements even though nothing ever renders.
+class HeadlessTextRenderer(GLTextRenderer):
+
+    def create_character(self, i):
+
+        try:
+
+            # Measure the character
+            font_surface = self.font.render( unichr(i), 1, self.foreground, self.background )
+
+            self.all_widths[i] = font_surface.get_width()
+
+            if ( font_surface.get_height() > self.font_height ):
+                self.font_height = font_surface.get_height()
+
+            # No texture
+            self.all_tiles[i] = (-1, (0, 0))
+
+        except:
+
+            self.all_tiles[i] = (-1, (0, 0))
+            self.all_widths[i] = 0
+
+
+# A window controller for game logic that never renders.  It keeps the bookkeeping game logic
+# relies upon (newsfeeder, CSS, text measurement, window params), and ignores fades, delays, and hooks.
+class HeadlessWindowController(DebugWindowController):
+
+    def __init__(self):
+
+        DebugWindowController.__init__(self)
+
+        # Widgets (e.g. dialogue panels) read CSS as they set up
+        self.css_controller = CSSController()
+
+        # Widgets also measure text as they set up.  Every text controller measures the same way
+        # (the real ones differ only by color), so they all share a single renderer.
+        if ( not pygame.font.get_init() ):
+            pygame.font.init()
+
+        text_renderer = HeadlessTextRenderer( os.path.join(FONT_PATH, DEFAULT_FONT_NAME), (255, 255, 255), (0, 0, 0), DEFAULT_FONT_SIZE )
+
+        self.text_controllers = dict(
+            ( name, TextController(render_offset_x = 0, render_offset_y = 0, text_renderer = text_renderer) )
+            for name in ("default", "high-contrast", "gui")
+        )
+
+        # Scripts can stash params on the window
+        self.params = {}
+
+
+    # Get the CSS controller
+    def get_css_controller(self):
+
+        return self.css_controller
+
+
+    # Get the default text controller
+    def get_default_text_controller(self):
+
+        return self.text_controllers["default"]
+
+
+    # Get a text controller by name (or the default text controller, if we don't know the name)
+    def get_text_controller_by_name(self, name):
+
+        return self.text_controllers.get( name, self.text_controllers["default"] )
+
+
+    # We have no window; pretend it covers the standard screen
+    def get_visibility_region(self):
+
+        return (0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+
+    # Set a window param
+    def set_param(self, key, value):
+
+        self.params[key] = value
+
+
+    # Get a window param (or None)
+    def get_param(self, key):
+
+        return self.params.get(key)
+
+
+    # Check for a window param
+    def has_param(self, key):
+
+        return (key in self.params)
+
+
+    # Remove a window param
+    def remove_param(self, key):
+
+        if (key in self.params):
+
+            self.params.pop(key)
+
+
+    # We never fade, so nothing will ever wait on us (fade callbacks never fire)
+    def fade_out(self, on_complete = ""):
+
+        return
+
+
+    def fade_in(self, on_complete = ""):
+
+        return
+
+
+    def delay(self, interval):
+
+        return
+
+
+    def hook(self, listener):
+
+        return
+
+
+    def unhook(self, listener):
+
+        return
+
+
+    # No textures to release
+    def clear_cache(self):
+
+        return
+
+
+# A control center for headless runs:  no window, no sound, no saving.  Every other controller is the real thing.
+class HeadlessControlCenter(ControlCenter):
+
+    def __init__(self):
+
+        # Debug mode skips the window / sound controllers
+        ControlCenter.__init__(self, SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT, debug = True)
+
+        # Headless window
+        self.window_controller = HeadlessWindowController()
+
+        # Silence
+        self.sound_controller = SilentController()
+
+        # A headless run must never overwrite the player's saved games
+        self.save_controller = SilentController()
+
+
+    # Get the sound controller
+    def get_sound_controller(self):
+
+        return self.sound_controller
+
+
+# A universe for headless runs.  It never touches the player's session data on disk.
+class HeadlessUniverse(Universe):
+
+    def __init__(self, name, control_center):
+
+        # A game mode universe clears the player's active session data as it loads, so we load in
+        # editor mode (loading doesn't otherwise depend on the mode).  Maps still activate in game mode.
+        Universe.__init__(self, name, MODE_EDITOR, control_center)
+
+        # Don't read / write map memory files
+        self.ignore_map_memory_files = True
+
+        # Treat this as a dummy session (e.g. no game over menus)
+        self.get_session_variable("core.is-dummy-session").set_value("1")
+
+
+    # We have no display to capture
+    def generate_filesave_thumbnail(self):
+
+        return
+
+
+    # Never autosave
+    def commit_autosave(self, control_center, universe):
+
+        return
+
+
+# Loads a map and steps its game logic
+class HeadlessRunner:
+
+    def __init__(self, control_center = None):
+
+        # Use a headless control center unless given another
+        self.control_center = control_center if (control_center) else HeadlessControlCenter()
+
+        # Universe / active map, once loaded
+        self.universe = None
+        self.map = None
+
+        # How many ticks have we run?
+        self.ticks = 0
+
+        # Seconds spent stepping (not loading)
+        self.elapsed = 0.0
+
+
+    # Load a given map from a given universe, optionally with a replay file to drive player1, and
+    # optionally setting a hash of session variables before the map activates.
+    # If the map has no local player, we spawn one at the map's first player respawn point.
+    def load(self, universe_name, map_name, replay_file = None, variables = {}):
+
+        # Load the universe
+        self.universe = HeadlessUniverse(universe_name, self.control_center)
+
+        # Set session variables
+        for key in variables:
+
+            self.universe.set_session_variable( key, variables[key] )
+
+
+        # Activate the map on its own
+        self.universe.activate_map_on_layer_by_name(map_name, LAYER_FOREGROUND, game_mode = MODE_GAME, control_center = self.control_center, ignore_adjacent_maps = True)
+
+        # Convenience
+        self.map = self.universe.get_active_map()
+
+
+        # Local player
+        player_name = "player%s" % self.universe.get_session_variable("core.player-id").get_value()
+
+        # Spawn the player if the map doesn't hold one
+        if ( not self.map.get_entity_by_name(player_name) ):
+
+            # Where?
+            spawns = self.map.get_entities_by_type(GENUS_RESPAWN_PLAYER) + self.map.get_entities_by_type(GENUS_RESPAWN_PLAYER1)
+
+            # Default to the top left corner
+            (x, y) = (spawns[0].get_x(), spawns[0].get_y()) if ( len(spawns) > 0 ) else (0, 0)
+
+            self.universe.spawn_player_with_name_at_location(player_name, x, y)
+
+
+        # Load recorded input
+        if (replay_file):
+
+            self.map.configure({
+                "replay-file": replay_file
+            })
+
+        # Fresh counts
+        self.ticks = 0
+        self.elapsed = 0.0
+
+        # For chaining
+        return self
+
+
+    # Load one of the "gifs" universe's skill preview maps, set up the way the Gif widget sets it up:
+    # every skill at level 3, a given active skill, only player1 taking part, and recorded input from a given replay file (in data/replays).
+    def load_gif(self, map_name, replay_file, skill):
+
+        # Mark the universe as a gif
+        variables = {
+            "core.is-gif": "1"
+        }
+
+        # Emulate a "level 3" ability for each preview
+        for name in SKILL_LIST:
+
+            variables["core.skills.%s" % name] = "3"
+
+
+        # Load the map
+        self.load("gifs", map_name, os.path.join(REPLAYS_PATH, replay_file), variables)
+
+        # Mark the map as a gif
+        self.map.set_type("gif")
+
+        # Disable any player entity not named "player1"
+        for player in self.map.get_entities_by_type(GENUS_PLAYER):
+
+            if ( player.get_name() != "player1" ):
+
+                player.set_status(STATUS_INACTIVE)
+
+        # Set the player's active skill
+        self.universe.set_session_variable("core.player1.skill1", skill)
+
+        # For chaining
+        return self
+
+
+    # Run one tick of game logic on the active map, the same way the universe does during gameplay
+    # (minus the camera, network, and rendering).  Recorded input (if any) applies afterward, as in GIF playback.
+    def step(self):
+
+        # Convenience
+        (control_center, universe, m) = (self.control_center, self.universe, self.map)
+
+        # Process the map unless the map / universe is "busy"
+        if ( ( not universe.is_paused() ) and ( not m.is_busy() ) and ( not universe.is_busy() ) ):
+
+            m.process(control_center, universe)
+            m.process_drama(control_center, universe)
+
+            m.post_process(control_center, universe)
+
+        else:
+
+            m.process_cutscene(control_center, universe)
+
+
+        # Feed recorded input
+        m.process_replay_data(control_center, universe)
+
+        # Count tick
+        self.ticks += 1
+
+
+    # Run a given number of ticks (default:  the length of the replay data, if any) as fast as we can.
+    # Optionally call a given function after each tick (e.g. to record state).  Returns ticks per second.
+    def run(self, ticks = None, on_tick = None):
+
+        # Default tick count
+        if (ticks == None):
+
+            ticks = len(self.map.replay_data) if ( self.map.has_replay_data() ) else HEADLESS_DEFAULT_TICKS
+
+
+        # Begin timing
+        start = time.time()
+
+        try:
+
+            for i in range(0, ticks):
+
+                self.step()
+
+                # Callback?
+                if (on_tick):
+
+                    on_tick(self)
+
+        # Track time, even if a tick fails
+        finally:
+
+            self.elapsed += (time.time() - start)
+
+        # Return results
+        return self.get_ticks_per_second()
+
+
+    # Get the ticks per second we've managed so far
+    def get_ticks_per_second(self):
+
+        # Avoid dividing by zero
+        if (self.elapsed > 0):
+
+            return (self.ticks / self.elapsed)
+
+        else:
+
+            return 0.0
+
+
+if (__name__ == "__main__"):
+
+    # Read arguments
+    (universe_name, map_name, replay_file, ticks) = (
+        sys.argv[1] if ( len(sys.argv) > 1 ) else "story1",
+        sys.argv[2] if ( len(sys.argv) > 2 ) else "root",
+        sys.argv[3] if ( ( len(sys.argv) > 3 ) and ( sys.argv[3] != "" ) ) else None,
+        int( sys.argv[4] ) if ( len(sys.argv) > 4 ) else None
+    )
+
+    runner = HeadlessRunner().load(universe_name, map_name, replay_file)
+
+    tps = runner.run(ticks)
+
+    print "%s/%s:  %d ticks in %.3f seconds (%.1f ticks per second)" % ( universe_name, map_name, runner.ticks, runner.elapsed, tps )
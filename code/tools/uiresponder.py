@@ -2005,6 +2005,9 @@ class UIResponder:
                         t.behavior = int( wrapper.find_widget_by_name("behavior").get_value() )
                         t.prompt = wrapper.find_widget_by_name("prompt").get_text()
 
+                        # Trigger name / size may have changed
+                        m.invalidate_trigger_cache()
+
         # Add new script event to a trigger
         elif ( action == "triggers.properties:add" ):
 
@@ -2475,6 +2478,9 @@ class UIResponder:
                         entity.x = (tx * TILE_WIDTH)
                         entity.y = (ty * TILE_HEIGHT)
 
+                        # Respawn regions may now hold a new respawn point
+                        m.invalidate_trigger_cache()
+
 
             # HOTKEY ONLY - Move an existing entity (instead of right click / move entity)
             elif ( params["value"] == "rk.generic/move-entity" ):
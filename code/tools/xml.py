@@ -1,7 +1,37 @@
 import os
 import re
 
-from code.utils.common import log, log2, logn, xml_encode, xml_decode
+import marshal
+import hashlib
+
+import bisect
+
+from code.utils.common import log, log2, logn, xml_encode, xml_decode, ensure_path_exists
+
+
+# Matches xml comments
+XML_COMMENT_PATTERN = re.compile("\<\!\-\-[^$]*?\-\-\>")
+
+# Matches whitespace surrounding a newline
+XML_NEWLINE_WHITESPACE_PATTERN = re.compile("[ \t]+?\n[ \t]+?")
+
+# Matches whitespace surrounding an attribute's assignment operator
+XML_ASSIGNMENT_WHITESPACE_PATTERN = re.compile("[ ]+=[ ]+")
+
+# Matches a tag from its opening < through its closing >, skipping over any > within attribute strings
+XML_TAG_PATTERN = re.compile("<[^'>]*(?:'[^']*'[^'>]*)*>")
+
+# Matches a quoted attribute string (or an unterminated quote running to the end of the tag)
+XML_QUOTED_STRING_PATTERN = re.compile("'[^']*(?:'|$)")
+
+# Intern a tag or attribute name.  Only plain strings can be interned; anything else (e.g. None) returns as-is.
+def intern_name(s):
+
+    if ( type(s) == str ):
+        return intern(s)
+
+    else:
+        return s
 
 def escape_quoted_whitespace(s):
     in_quote = False
@@ -31,42 +61,28 @@ def unescape_quoted_whitespace(s):
 def escape_special_characters(s):
 
     # Which characters will we replace?
-    translations = {
-        " ": "&nbsp;",
-        "<": "&lt;",
-        ">": "&gt;",
-        "=": "&equals;" # I think I'm making this up...
-    }
-
-
-    # Track when we're within a string (which needs the escape)
-    in_quote = False
-
-    # Remember translated output
-    output = ""
+    translations = (
+        (" ", "&nbsp;"),
+        ("<", "&lt;"),
+        (">", "&gt;"),
+        ("=", "&equals;") # I think I'm making this up...
+    )
 
 
-    for i in range(0, len(s)):
-
-        # Toggle
-        if (s[i] == "'"):
-            in_quote = (not in_quote)
+    # Translate the characters within a given quoted string
+    def escape_quoted_string(match):
 
-            output += s[i]
+        # Begin with the original quoted string
+        output = match.group(0)
 
-        elif (s[i] in translations):
-
-            if (in_quote):
-                output += translations[ s[i] ]
-
-            else:
-                output += s[i]
+        for (c, translation) in translations:
+            output = output.replace(c, translation)
 
-        else:
-            output += s[i]
+        return output
 
 
-    return output
+    # Characters only need the escape while within a string
+    return XML_QUOTED_STRING_PATTERN.sub(escape_quoted_string, s)
 
 def unescape_special_characters(s):
 
@@ -85,7 +101,164 @@ def unescape_special_characters(s):
 
 
 
-class XMLNode:
+# Lookup tables for a node, built the first time we query the node's children.  Tracks the node's children
+# by tag and by id, and remembers the results of previous attribute-filtered queries.
+class XMLNodeIndex(object):
+
+    __slots__ = (
+        "children_by_tag",
+        "children_by_id",
+        "filtered_children"
+    )
+
+    def __init__(self, nodes):
+
+        # Children, by tag type (in document order)
+        self.children_by_tag = {}
+
+        # First child with a given id.  (Children without an id file under False, just like get_attribute returns.)
+        self.children_by_id = {}
+
+        for node in nodes:
+
+            # Track by tag
+            if (node.tag_type in self.children_by_tag):
+                self.children_by_tag[node.tag_type].append(node)
+
+            else:
+                self.children_by_tag[node.tag_type] = [node]
+
+            # Track by id (first match only)
+            key = node.get_attribute("id")
+
+            if ( not (key in self.children_by_id) ):
+                self.children_by_id[key] = node
+
+
+        # Results of previous get_nodes_by_tag calls that filtered by attribute
+        self.filtered_children = {}
+
+
+# Lookup tables for a whole document, built in a single walk the first time we search (find_node_by_id /
+# find_node_by_tag) any node in the document.  We number each node in the order those searches visit nodes
+# (a node's children, then each child's descendants in turn), so a node's descendants always take a contiguous
+# range of numbers.  A search from any node then reads the first match within that node's range.
+class XMLDocumentIndex(object):
+
+    __slots__ = (
+        "nodes_by_tag",
+        "nodes_by_id",
+        "ranges"
+    )
+
+    def __init__(self, root):
+
+        # Nodes by tag type, as a list of positions and a list of nodes (in search order)
+        self.nodes_by_tag = {}
+
+        # Nodes by id, likewise.  (Nodes without an id file under False, just like get_attribute returns.)
+        self.nodes_by_id = {}
+
+        # The range of positions each (non-leaf) node's descendants take, by id(node)
+        self.ranges = {}
+
+
+        # Current position
+        position = 0
+
+        # Nodes left to visit.  A node we've already visited comes back (with its starting position) once we've visited its descendants.
+        stack = [ (root, -1) ]
+
+        while ( len(stack) > 0 ):
+
+            (node, start) = stack.pop()
+
+            # We've numbered every descendant of this node
+            if (start >= 0):
+
+                self.ranges[ id(node) ] = (start, position)
+
+            # Leaf nodes have no descendants
+            elif ( len(node.nodes) > 0 ):
+
+                # Come back to this node after its descendants
+                stack.append( (node, position) )
+
+                # Number the node's children first
+                for child in node.nodes:
+
+                    self.track(self.nodes_by_tag, child.tag_type, position, child)
+                    self.track(self.nodes_by_id, child.get_attribute("id"), position, child)
+
+                    position += 1
+
+                # Then visit each child in order
+                for i in range( len(node.nodes) - 1, -1, -1 ):
+
+                    stack.append( (node.nodes[i], -1) )
+
+
+    # Add a node (at a given position) to the list for a given key in a given table
+    def track(self, table, key, position, node):
+
+        if (key in table):
+
+            table[key][0].append(position)
+            table[key][1].append(node)
+
+        else:
+
+            table[key] = ( [position], [node] )
+
+
+    # Check whether we numbered a given node's descendants (we won't have if the node has since left the document)
+    def covers(self, node):
+
+        return ( id(node) in self.ranges )
+
+
+    # Find the first descendant of a given node that a given table tracks under a given key
+    def find(self, node, table, key):
+
+        # Range of positions the node's descendants take
+        (start, end) = self.ranges[ id(node) ]
+
+        # Nodes tracked under the given key
+        (positions, nodes) = table.get( key, ( (), () ) )
+
+        # First position within the node's range
+        i = bisect.bisect_left(positions, start)
+
+        if ( (i < len(positions)) and (positions[i] < end) ):
+
+            return nodes[i]
+
+        else:
+
+            return None
+
+
+# Parsed documents (maps, item data, saved sessions) contain a great many nodes, so we keep each node small:
+# fixed slots instead of a per-node __dict__, attributes / data dicts allocated only when needed, and
+# innerXml / innerText kept as offsets into the parsed document's (shared) source string until requested.
+class XMLNode(object):
+
+    __slots__ = (
+        "tag_type",
+        "tag_namespace",
+        "nodes",
+        "parent",
+        "_attributes",
+        "_data",
+        "_innerText",
+        "_innerXml",
+        "source",
+        "source_start",
+        "source_end",
+        "_index",
+        "_document_index",
+        "_document_indexing"
+    )
 
     def __init__(self, tag_type, tag_namespace = None):
 
@@ -96,20 +269,26 @@ class XMLNode:
         self.tag_namespace = tag_namespace
 
 
-        # Node attributes (serialized)
-        self.attributes = {}
+        # Node attributes (serialized).  Created as needed.
+        self._attributes = None
 
-        # HIdden data properties (not serialized)
-        self.data = {}
+        # HIdden data properties (not serialized).  Created as needed.
+        self._data = None
 
 
         # Children
         self.nodes = []
 
 
-        # Inner content
-        self.innerText = ""
-        self.innerXml = ""
+        # Inner content.  A value of None means we haven't read it from the source string yet.
+        self._innerText = ""
+        self._innerXml = ""
+
+        # Parsed nodes keep a reference to the (normalized) xml they came from,
+        # along with the position of their inner xml within that source.
+        self.source = None
+        self.source_start = 0
+        self.source_end = 0
 
 
         # A node will have knowledge of its parent.
@@ -117,6 +296,160 @@ class XMLNode:
         self.parent = None
 
 
+        # Lookup tables (XMLNodeIndex), built when we first query this node's children
+        self._index = None
+
+        # Lookup tables for the whole document (XMLDocumentIndex).  Only a top-level node builds them, when we first search the document.
+        self._document_index = None
+
+        # Top-level nodes build document lookup tables by default.  Callers that only search a document once or twice can turn them off.
+        self._document_indexing = True
+
+
+    # Get this node's lookup tables, building them if necessary
+    def get_index(self):
+
+        # Build on demand
+        if (self._index == None):
+            self._index = XMLNodeIndex(self.nodes)
+
+        return self._index
+
+
+    # Get the lookup tables for the document this node belongs to, building them if necessary.
+    # Returns None if the document doesn't use lookup tables.
+    def get_document_index(self):
+
+        # Find the top-level node
+        root = self
+
+        while (root.parent != None):
+
+            root = root.parent
+
+
+        # Document lookup tables turned off?
+        if (not root._document_indexing):
+
+            return None
+
+        # Build on demand
+        elif (root._document_index == None):
+
+            root._document_index = XMLDocumentIndex(root)
+
+        return root._document_index
+
+
+    # Turn document lookup tables on / off for the document this (top-level) node begins
+    def set_document_indexing(self, indexing):
+
+        # Set
+        self._document_indexing = indexing
+
+        # Discard any existing lookup tables
+        if (not indexing):
+
+            self._document_index = None
+
+        # For chaining
+        return self
+
+
+    # Discard this node's lookup tables, along with those of each ancestor (their search results might include this node's children).
+    # Once we reach the top-level node, we discard the document's lookup tables.
+    def invalidate_index(self):
+
+        node = self
+
+        while (node != None):
+
+            node._index = None
+            node._document_index = None
+
+            # Move up
+            node = node.parent
+
+
+    # Point this node's inner content at a given range of a source string.
+    # If the node has no children, its innerText comes from the same range.
+    def set_inner_source(self, source, start, end):
+
+        # Set source range
+        self.source = source
+        self.source_start = start
+        self.source_end = end
+
+        # Read both lazily
+        self._innerXml = None
+
+        if ( len(self.nodes) == 0 ):
+            self._innerText = None
+
+        else:
+            self._innerText = ""
+
+        # For chaining
+        return self
+
+
+    # Get attributes hash, creating it if necessary
+    def get_attributes(self):
+
+        # Create on demand
+        if (self._attributes == None):
+            self._attributes = {}
+
+        return self._attributes
+
+
+    # Replace attributes hash
+    def set_attributes_hash(self, attributes):
+
+        self._attributes = attributes
+
+        # The parent (and its ancestors) might have indexed this node by its attributes
+        if (self.parent != None):
+            self.parent.invalidate_index()
+
+
+    # Get data hash, creating it if necessary
+    def get_data_hash(self):
+
+        # Create on demand
+        if (self._data == None):
+            self._data = {}
+
+        return self._data
+
+
+    # Replace data hash
+    def set_data_hash(self, data):
+
+        self._data = data
+
+
+    # Get inner xml, reading it from the source if necessary
+    def get_inner_xml(self):
+
+        # Not yet read?
+        if (self._innerXml == None):
+
+            return self.source[self.source_start : self.source_end]
+
+        # Return
+        return self._innerXml
+
+
+    # Set inner xml
+    def set_inner_xml(self, xml):
+
+        self._innerXml = xml
+
+        # For chaining
+        return self
+
+
     def debug(self, indent = 0):
 
         for i in range(0, 4 * indent):
@@ -159,6 +492,9 @@ class XMLNode:
         # Set parent on the new node!
         self.nodes[-1].set_parent(self)
 
+        # Lookups need to consider the new node
+        self.invalidate_index()
+
         return self.nodes[-1]
 
 
@@ -196,7 +532,11 @@ class XMLNode:
     def set_attribute(self, key, value):
 
         # Set attribute
-        self.attributes[key] = value
+        self.get_attributes()[key] = value
+
+        # The parent (and its ancestors) might have indexed this node by its attributes
+        if (self.parent != None):
+            self.parent.invalidate_index()
 
         # For chaining
         return self
@@ -205,13 +545,13 @@ class XMLNode:
     # Check to see if a node has a given attribute
     def has_attribute(self, key):
 
-        return (key in self.attributes)
+        return ( (self._attributes != None) and (key in self._attributes) )
 
 
     def get_attribute(self, key):
 
-        if (key in self.attributes):
-            return self.attributes[key]
+        if ( (self._attributes != None) and (key in self._attributes) ):
+            return self._attributes[key]
 
         else:
             return False
@@ -228,23 +568,17 @@ class XMLNode:
         return self
 
 
-    # Get all attributes
-    def get_attributes(self):
-
-        return self.attributes
-
-
     # Check to see if a node has a given data value key
     def has_data(self, key):
 
-        return (key in self.data)
+        return ( (self._data != None) and (key in self._data) )
 
 
     # Set data value for a given key
     def set_data(self, key, value):
 
         # Set
-        self.data[key] = value
+        self.get_data_hash()[key] = value
 
         # For chaining
         return self
@@ -257,7 +591,7 @@ class XMLNode:
         if ( self.has_data(key) ):
 
             # Return stored data
-            return self.data[key]
+            return self._data[key]
 
 
         # Not found
@@ -266,13 +600,19 @@ class XMLNode:
 
     def get_inner_text(self):
 
+        # Not yet read?
+        if (self._innerText == None):
+
+            # Decode once
+            self._innerText = xml_decode( self.get_inner_xml().strip() )
+
         # Return
-        return self.innerText
+        return self._innerText
 
 
     def set_inner_text(self, text):
 
-        self.innerText = text
+        self._innerText = text
 
         # For chaining
         return self
@@ -280,38 +620,58 @@ class XMLNode:
 
     def get_node_by_id(self, node_id):
 
-        for node in self.nodes:
+        # Nodes without an id (or with an empty id) never match
+        if (not node_id):
+            return None
 
-            if (node.get_attribute("id")):
+        # First child with the given id
+        return self.get_index().children_by_id.get(node_id)
 
-                if (node.get_attribute("id") == node_id):
 
-                    return node
+    def get_nodes_by_tag(self, tag, params = None):
 
-        return None
+        # Lookup tables
+        index = self.get_index()
 
+        # Every child?
+        if (tag == "*"):
+            candidates = self.nodes
 
-    def get_nodes_by_tag(self, tag, params = None):
+        # Children with the given tag
+        else:
+            candidates = index.children_by_tag.get(tag, ())
 
-        output = []
 
-        for node in self.nodes:
+        # No need to qualify
+        if (not params):
 
-            if (node.tag_type == tag or tag == "*"):
+            return list(candidates)
 
-                # No need to qualify
-                if (not params):
-                    output.append(node)
+        # Check for parameter match
+        else:
 
-                # Check for parameter match
-                else:
+            # Check for a previous result
+            key = ( tag, tuple( sorted( params.items() ) ) )
 
-                    for key in params:
+            # Return a copy of the previous result, if we have one
+            if ( key in index.filtered_children ):
 
-                        if (node.attributes[key] == params[key]):
-                            output.append(node)
+                return list( index.filtered_children[key] )
 
-        return output
+
+            output = []
+
+            for node in candidates:
+
+                for key2 in params:
+
+                    if (node.attributes[key2] == params[key2]):
+                        output.append(node)
+
+            # Remember result
+            index.filtered_children[key] = output
+
+            return list(output)
 
 
     def get_nodes_by_tags(self, tags, params = None):
@@ -346,7 +706,14 @@ class XMLNode:
 
     def get_first_node_by_tag(self, tag, params = None):
 
-        nodes = self.get_nodes_by_tag(tag, params)
+        # Without params, we can check the index directly
+        if ( (not params) and (tag != "*") ):
+
+            nodes = self.get_index().children_by_tag.get(tag, ())
+
+        else:
+
+            nodes = self.get_nodes_by_tag(tag, params)
 
 
         if (len(nodes) > 0):
@@ -359,8 +726,22 @@ class XMLNode:
 
 
     # Find a node by a given id.  We'll check the first-level descendants first, then recur into children sequentially.
+    # The document's lookup tables answer in the same order, if the document uses them.
     def find_node_by_id(self, node_id):
 
+        # Nothing to find in a leaf node
+        if ( len(self.nodes) == 0 ):
+            return None
+
+        # Document lookup tables
+        index = self.get_document_index()
+
+        # Read the first match from the lookup tables, if they cover this node
+        if ( (index != None) and ( index.covers(self) ) ):
+
+            return index.find(self, index.nodes_by_id, node_id)
+
+
         # Check direct descendants
         for node in self.nodes:
 
@@ -398,6 +779,9 @@ class XMLNode:
             # Object match?
             if ( self.nodes[i] == node ):
 
+                # Lookups can no longer consider the node
+                self.invalidate_index()
+
                 # Goodbye
                 return self.nodes.pop(i)
 
@@ -422,6 +806,9 @@ class XMLNode:
             # If this is the one, we'll remove it and all of its children
             if ( self.nodes[i].get_attribute("id") == node_id ):
 
+                # Lookups can no longer consider the node
+                self.invalidate_index()
+
                 # Later dude.  Return the removed node for a last chance to do something with it...
                 return self.nodes.pop(i)
 
@@ -447,8 +834,22 @@ class XMLNode:
 
 
     # Find the first node (at any depth) that matches a given tag name
+    # The document's lookup tables answer in the same order, if the document uses them.
     def find_node_by_tag(self, tag_type):
 
+        # Nothing to find in a leaf node
+        if ( len(self.nodes) == 0 ):
+            return None
+
+        # Document lookup tables
+        index = self.get_document_index()
+
+        # Read the first match from the lookup tables, if they cover this node
+        if ( (index != None) and ( index.covers(self) ) ):
+
+            return index.find(self, index.nodes_by_tag, tag_type)
+
+
         # Check direct descendants
         for node in self.nodes:
 
@@ -548,10 +949,37 @@ class XMLNode:
         return results
 
 
-    def compile_xml_string(self, prefix = "", include_namespaces = False, encode_innerText = True, pretty = True):
+    # Serialize this node (and its children) into a given output, either a list (we append each piece of
+    # the xml) or a file-like object (we write each piece).  Pretty output matches compile_xml_string.
+    # Compact output skips all indentation and line breaks, for sending over the wire.
+    def write_xml(self, output, prefix = "", include_namespaces = False, encode_innerText = True, pretty = True, compact = False):
+
+        # Lists collect the pieces; anything else gets written to
+        if ( type(output) == list ):
+            write = output.append
+
+        else:
+            write = output.write
+
+
+        # Compact output never uses indentation
+        if (compact):
+
+            self.write_xml_pieces(write, "", include_namespaces, encode_innerText, False, True)
+
+        else:
+
+            self.write_xml_pieces(write, prefix, include_namespaces, encode_innerText, pretty, False)
+
+        # Return the output
+        return output
+
+
+    # Write the xml for this node (and its children) one piece at a time, using a given write function
+    def write_xml_pieces(self, write, prefix, include_namespaces, encode_innerText, pretty, compact):
 
         # Assume no namespace
-        tag_data = "%s" % self.tag_type
+        tag_data = self.tag_type
 
         # Check namespace inclusion flag
         if (include_namespaces):
@@ -564,10 +992,13 @@ class XMLNode:
 
 
         # Begin serialization
-        xml = prefix + "<%s" % tag_data
+        write( "%s<%s" % (prefix, tag_data) )
+
+        if (self._attributes):
+
+            for (key, value) in self._attributes.iteritems():
+                write( " %s = '%s'" % (key, value) )
 
-        for key in self.attributes:
-            xml += " %s = '%s'" % (key, self.attributes[key])
 
         # Any children?
         if (len(self.nodes) > 0):
@@ -576,99 +1007,104 @@ class XMLNode:
             if (pretty):
 
                 # Add newline
-                xml += ">\n"
+                write(">\n")
 
                 # Loop through nodes and indent each one
+                child_prefix = "\t" + prefix
+
                 for each in self.nodes:
-                    xml += each.compile_xml_string("\t" + prefix, include_namespaces, encode_innerText, pretty)
+                    each.write_xml_pieces(write, child_prefix, include_namespaces, encode_innerText, pretty, compact)
 
                 # Close tag
-                xml += prefix + "</%s>\n" % tag_data
+                write( "%s</%s>\n" % (prefix, tag_data) )
 
             # Everything in a single line
             else:
 
                 # Close tag without newline
-                xml += ">"
+                write(">")
 
                 # Loop through nodes, no indention
                 for each in self.nodes:
-                    xml += each.compile_xml_string(prefix, include_namespaces, encode_innerText, pretty)
+                    each.write_xml_pieces(write, prefix, include_namespaces, encode_innerText, pretty, compact)
 
                 # Close tag, don't add newline
-                xml += prefix + "</%s>" % tag_data
+                write( "%s</%s>" % (prefix, tag_data) )
+
+            # Done
+            return
+
+
+        # Check inner text
+        text = self.get_inner_text()
 
         # Inner text?
-        elif (self.innerText != ""):
+        if (text != ""):
 
             # If the inner text has one or more line breaks,
             # then I'm going to indent it on a new line.
-            if ( self.innerText.find("\n") >= 0 ):
+            if ( text.find("\n") >= 0 ):
 
-                # Pretty with trailing newline?
-                if (pretty):
-                    xml +=  ">\n%s\t%s\n%s</%s>\n" % (prefix, self.innerText.strip(), prefix, tag_data)
+                # Compact output keeps the text in line (the parser strips the surrounding whitespace either way)
+                if (compact):
+                    write( ">%s</%s>" % (text.strip(), tag_data) )
 
-                # No newline
+                # Pretty or not, we always indent the text and add a trailing newline
                 else:
-                    xml +=  ">\n%s\t%s\n%s</%s>\n" % (prefix, self.innerText.strip(), prefix, tag_data)
+                    write( ">\n%s\t%s\n%s</%s>\n" % (prefix, text.strip(), prefix, tag_data) )
 
             # Otherwise, I'm going to print it out without any indenting...
             else:
 
                 # I don't always want to encode the inner text data
                 if (encode_innerText):
+                    text = xml_encode( text.strip() )
 
-                    # Pretty with trailing newline?
-                    if (pretty):
-                        xml += ">%s</%s>\n" % ( xml_encode( self.innerText.strip() ), tag_data )
-
-                    # No newline
-                    else:
-                        xml += ">%s</%s>" % ( xml_encode( self.innerText.strip() ), tag_data )
+                # Pretty with trailing newline?
+                if (pretty):
+                    write( ">%s</%s>\n" % (text, tag_data) )
 
-                # Flag set to false?
+                # No newline
                 else:
-
-                    # Pretty with trailing newline?
-                    if (pretty):
-                        xml += ">%s</%s>\n" % ( self.innerText, tag_data )
-
-                    # No newline
-                    else:
-                        xml += ">%s</%s>" % ( self.innerText, tag_data )
+                    write( ">%s</%s>" % (text, tag_data) )
 
         # Nope; self-closing...
         else:
 
             # Pretty with newline?
             if (pretty):
-                xml += " />\n"
+                write(" />\n")
 
             # No newline
             else:
-                xml += " />"
+                write(" />")
 
-        return xml
+
+    def compile_xml_string(self, prefix = "", include_namespaces = False, encode_innerText = True, pretty = True, compact = False):
+
+        # Collect the pieces in one pass, then join them
+        return "".join(
+            self.write_xml( [], prefix, include_namespaces, encode_innerText, pretty, compact )
+        )
 
 
     def compile_inner_xml_string(self, prefix = "", include_namespaces = False):
 
-        xml = ""
+        xml = []
 
         # Any children?
         if (len(self.nodes) > 0):
 
             for each in self.nodes:
-                xml += each.compile_xml_string("\t" + prefix, include_namespaces)
+                each.write_xml(xml, "\t" + prefix, include_namespaces)
 
         # Inner text?
         elif (self.innerText != ""):
 
-            xml += xml_encode(self.innerText)
+            xml.append( xml_encode(self.innerText) )
 
 
-        return xml
+        return "".join(xml)
 
 
     def compile_xml_abstract(self, prefix = "", include_namespaces = False):
@@ -688,8 +1124,10 @@ class XMLNode:
 
         xml = prefix + "<%s" % tag_data
 
-        for key in self.attributes:
-            xml += " %s = '%s' " % (key, self.attributes[key])
+        if (self._attributes):
+
+            for key in self._attributes:
+                xml += " %s = '%s' " % (key, self._attributes[key])
 
         if (len(self.nodes) > 0):
 
@@ -702,6 +1140,15 @@ class XMLNode:
         return xml
 
 
+    # Attribute-style access, for compatibility
+    attributes = property(get_attributes, set_attributes_hash)
+    data = property(get_data_hash, set_data_hash)
+
+    # (Please note and excuse the inconsistent casing)
+    innerText = property(get_inner_text, set_inner_text)
+    innerXml = property(get_inner_xml, set_inner_xml)
+
+
 class XMLDocument:
     def __init__(self, xml, parent = None):
 
@@ -713,31 +1160,291 @@ class XMLDocument:
     #    self.tag_collections = {}
 
 
-class XMLParser:
+# Optional on-disk cache of parsed xml files.  Serializes each parsed XMLNode tree (using marshal)
+# into a cache folder, keyed by the source file's absolute path.  Each cache file remembers the
+# source file's modified time and size; if either changes, the cache entry no longer counts.
+class XMLCache:
+
+    # Bump this whenever the serialized format changes
+    VERSION = 2
 
     def __init__(self):
-        return
 
+        # Disabled by default
+        self.enabled = False
 
-    # Compile an xml string into a single xml node, wrapping the entire contents in a parent node
-    def create_node_from_xml(self, xml, maxdepth = -1):
+        # Cache folder
+        self.path = None
 
-        # Create a new root node
-        node = XMLNode("xml-root")
+        # Track cache hits and misses
+        self.hits = 0
+        self.misses = 0
 
-        # Parse into that node.  Return no node if the xml does not validate
-        if ( not self.parse_xml(xml, node, maxdepth = maxdepth) ):
 
-            # Abandon
-            return None
+    # Enable the cache, storing cache files in a given folder
+    def enable(self, path):
 
-        else:
+        # Make sure the folder exists
+        ensure_path_exists(path)
+
+        # Set path
+        self.path = path
+
+        # Enable
+        self.enabled = True
+
+        # For chaining
+        return self
+
+
+    # Disable the cache.  Existing cache files remain on disk.
+    def disable(self):
+
+        # Disable
+        self.enabled = False
+
+        # For chaining
+        return self
+
+
+    # Check whether the cache is enabled
+    def is_enabled(self):
+
+        return self.enabled
+
+
+    # Get cache hit / miss counts
+    def get_stats(self):
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+    # Reset cache hit / miss counts
+    def reset_stats(self):
+
+        self.hits = 0
+        self.misses = 0
+
+
+    # Get the cache file path for a given source file path
+    def get_cache_path_for_file(self, filepath):
+
+        return os.path.join(
+            self.path,
+            "%s.xmlc" % hashlib.md5( os.path.abspath(filepath) ).hexdigest()
+        )
+
+
+    # Calculate the key (absolute path, modified time, size, maxdepth) for a given source file
+    def get_key_for_file(self, filepath, maxdepth):
+
+        # Check modified time, file size
+        stat = os.stat(filepath)
+
+        # Return key
+        return ( self.VERSION, os.path.abspath(filepath), stat.st_mtime, stat.st_size, maxdepth )
+
+
+    # Try to fetch the parsed node for a given source file.  Returns None on a cache miss.
+    def load(self, filepath, maxdepth = -1):
+
+        # Cache file path
+        path = self.get_cache_path_for_file(filepath)
+
+        # Does the cache file exist?
+        if ( os.path.exists(path) ):
+
+            try:
+
+                # Read cache file
+                f = open(path, "rb")
+                (key, data) = marshal.load(f)
+                f.close()
+
+                # Still valid?
+                if ( key == self.get_key_for_file(filepath, maxdepth) ):
+
+                    # Hit
+                    self.hits += 1
+
+                    # Rebuild node
+                    return self.unpack_tree(data)
+
+            # Corrupt or outdated cache file; we'll just reparse the source file.
+            except:
+
+                logn( "xml error", "could not read xml cache file:  %s" % path )
+
+
+        # Miss
+        self.misses += 1
+
+        # Not cached
+        return None
+
+
+    # Save the parsed node for a given source file
+    def save(self, filepath, node, maxdepth = -1):
+
+        # Cache file path
+        path = self.get_cache_path_for_file(filepath)
+
+        try:
+
+            # Write to a temporary file first, so that we never leave a partial cache file behind
+            f = open("%s.tmp" % path, "wb")
+            marshal.dump( ( self.get_key_for_file(filepath, maxdepth), self.pack_tree(node) ), f )
+            f.close()
+
+            # Replace any previous cache file
+            if ( os.path.exists(path) ):
+                os.remove(path)
+
+            os.rename("%s.tmp" % path, path)
+
+        # Couldn't write the cache file.  No big deal.
+        except:
+
+            logn( "xml error", "could not write xml cache file:  %s" % path )
+
+
+    # Find the source string a parsed tree refers to (the first one we find, anyway)
+    def find_source(self, node):
+
+        # Check this node
+        if (node.source != None):
+
+            return node.source
+
+        # Check children
+        for child in node.nodes:
+
+            source = self.find_source(child)
+
+            if (source != None):
+
+                return source
+
+        # No source
+        return None
+
+
+    # Pack a parsed tree into its shared source string plus nested tuples for marshaling
+    def pack_tree(self, node):
+
+        # We'll store the source once
+        source = self.find_source(node)
+
+        # Return packed data
+        return ( source, self.pack_node(node, source) )
+
+
+    # Pack a node (and its children) into nested tuples.  Inner xml taken from the
+    # shared source string packs as a (start, end) range.
+    def pack_node(self, node, source):
+
+        # Explicit inner xml by default
+        inner_xml = node._innerXml
+
+        # Unread inner xml from the shared source?
+        if (inner_xml == None):
+
+            # Range within source
+            if (node.source is source):
+                inner_xml = (node.source_start, node.source_end)
+
+            # Some other source
+            else:
+                inner_xml = node.get_inner_xml()
+
+
+        return (
+            node.tag_type,
+            node.tag_namespace,
+            node._attributes,
+            node._innerText,
+            inner_xml,
+            tuple( self.pack_node(child, source) for child in node.nodes )
+        )
+
+
+    # Rebuild a parsed tree from packed data
+    def unpack_tree(self, data):
+
+        # Unpack
+        (source, packed_node) = data
+
+        # Rebuild
+        return self.unpack_node(packed_node, source)
+
+
+    # Rebuild a node (and its children) from packed data
+    def unpack_node(self, data, source):
+
+        # Unpack
+        (tag_type, tag_namespace, attributes, innerText, innerXml, children) = data
+
+        # Create node
+        node = XMLNode(tag_type, tag_namespace)
+
+        # Restore children first; set_inner_source checks for children.
+        for child in children:
+
+            node.add_node( self.unpack_node(child, source) )
+
+
+        # Inner xml range within the source?
+        if ( type(innerXml) == tuple ):
+
+            node.set_inner_source(source, innerXml[0], innerXml[1])
+
+        # Explicit inner xml
+        else:
+
+            node.set_inner_xml(innerXml)
+
+
+        # Restore contents
+        node.set_attributes_hash(attributes)
+        node.set_inner_text(innerText)
+
+        # Return node
+        return node
+
+
+# Shared cache for XMLParser.create_node_from_file.  Disabled until enabled (e.g. xml_cache.enable(XML_CACHE_PATH)).
+xml_cache = XMLCache()
+
+
+class XMLParser:
+
+    def __init__(self):
+        return
+
+
+    # Compile an xml string into a single xml node, wrapping the entire contents in a parent node
+    def create_node_from_xml(self, xml, maxdepth = -1):
+
+        # Create a new root node
+        node = XMLNode("xml-root")
+
+        # Parse into that node.  Return no node if the xml does not validate
+        if ( not self.parse_xml(xml, node, maxdepth = maxdepth) ):
+
+            # Abandon
+            return None
+
+        else:
 
             # Return the new node
             return node
 
 
     # Import a filepath into a single xml node, wrapping the file's xml contents in a parent node.  Returns a single (empty) wrapper node if file does not exist.
+    # When the xml cache is enabled, we'll use a previously parsed copy of an unchanged file.
     def create_node_from_file(self, filepath, maxdepth = -1):
 
         # Create wrapper
@@ -747,6 +1454,19 @@ class XMLParser:
         # Validate filepath
         if ( os.path.exists(filepath) ):
 
+            # Check the cache first, if enabled
+            if ( xml_cache.is_enabled() ):
+
+                # Try to fetch previously parsed data
+                cached_node = xml_cache.load(filepath, maxdepth = maxdepth)
+
+                # Cache hit?
+                if (cached_node):
+
+                    # No need to parse
+                    return cached_node
+
+
             # Read file contents
             f = open(filepath, "r")
             xml = f.read()
@@ -758,6 +1478,12 @@ class XMLParser:
                 # Abandon
                 return None
 
+            # Cache the parsed data, if enabled
+            if ( xml_cache.is_enabled() ):
+
+                # Save
+                xml_cache.save(filepath, node, maxdepth = maxdepth)
+
         # Return the node, presumably with the file contents imported
         return node
 
@@ -775,209 +1501,244 @@ class XMLParser:
         return node.get_nodes_by_tag("*")[0]
 
 
-    def parse_xml(self, xml, parent, depth = 1, maxdepth = -1):
+    # Strip comments from the markup, then strip whitespace surrounding new lines, remove tabs, excess whitespace, etc.
+    def normalize_xml(self, xml):
 
-        # Track whether or not we have valid xml data.  Assume we do, at the beginning.
-        valid = True
+        # Strip comments
+        xml = XML_COMMENT_PATTERN.sub("", xml)
 
+        # Strip whitespace
+        return XML_NEWLINE_WHITESPACE_PATTERN.sub("\n", xml).strip(" \n").replace("\t", "")
 
-        # Strip comments from the markup
-        xml = re.sub("\<\!\-\-[^$]*?\-\-\>", "", xml)
 
-        # Strip whitespace surrounding new lines, remove tabs, excess whitespace, etc.
-        xml = re.sub("[ \t]+?\n[ \t]+?", "\n", xml).strip(" \n").replace("\t", "")
+    # Create a new XMLNode from the contents of a start tag (e.g. "box id = 'a' width = 5" for "<box id = 'a' width = 5>").
+    # Returns a tuple containing the tag's raw tag data (namespace included) and the new node.
+    def create_node_from_tag_contents(self, s):
 
+        # Split to calculate (1) tag type, and (2) tag attributes
+        pieces = s.split(" ", 1)
 
-        """
-        def gLog(args):
-            for arg in args:
-                print arg
-        log = lambda *s: gLog(s)
-        log2 = log
-        logn = log
-        #log(xml)
-        """
 
-        # Begin by finding the first element
-        a = xml.find("<")
-        b = -1
+        # We definitely will have a tag type.  We might have namespace data.
+        tag_data = pieces[0].strip()
 
-        if (a >= 0):
+        # Assume
+        (tag_namespace, tag_type) = (
+            None,
+            tag_data
+        )
 
-            b = self.find_tag_end(xml, a)
+        # Check for namespace
+        if ( tag_data.find(":") >= 0 ):
 
-            # If we couldn't find the end of the tag, then we invalidate the entire document
-            if (b < 0):
+            # Reinterpret data
+            (tag_namespace, tag_type) = tag_data.split(":", 1)
 
-                # Just for posterity
-                valid = False
 
-                # Immediately abandon parsing for this node
-                return False
+        # Create a new node using the given tag type.  Intern names; documents repeat them a lot.
+        node = XMLNode( intern_name(tag_type), intern_name(tag_namespace) )
 
-            # We found the end of the intro tag.
-            while (a >= 0):
 
-                # Check to see if this is a self-closing tag ( e.g. <node /> or <node attribute = '1' /> )
-                self_closing = (xml[b - 1] == "/")
+        # Strip any whitespace surrounding = in the attributes, if we actually have any attribute to read
+        if (len(pieces) > 1):
 
+            # Remove whitespace surrounding the assignment operator ( e.g. attribute = '1' -> attribute='1' ).  This simplifies parsing.
+            pieces[1] = escape_special_characters( XML_ASSIGNMENT_WHITESPACE_PATTERN.sub("=", pieces[1]).strip() )
 
-                # Get the contents of the XML
-                s = xml[a + 1 : b].strip()
+            # Check any attribute assignments...
+            assignments = pieces[1].split(" ")
 
-                # For self-closing tags, let's ditch the closing /
-                if (self_closing):
-                    s = xml[a + 1 : b - 1].strip()
+            # Loop all
+            for each in assignments:
 
+                # Split by the assignment operator to get the key and the value
+                kv = each.split("=")
 
-                # Split to calculate (1) tag type, and (2) tag attributes
-                pieces = s.split(" ", 1)
+                # If we didn't assign a value to this attribute, we'll treat it as a boolean attribute, set as True...
+                if ( len(kv) == 1 ):
 
+                    (key, value) = (intern_name(kv[0]), True)
 
-                # We definitely will have a tag type.  We might have namespace data.
-                tag_data = pieces[0].strip()
+                    node.set_attribute(key, value)
 
-                # Assume
-                (tag_namespace, tag_type) = (
-                    None,
-                    tag_data
-                )
+                else:
 
-                # Check for namespace
-                if ( tag_data.find(":") >= 0 ):
+                    (key, value) = (intern_name( kv[0].strip() ), kv[1].strip())
 
-                    # Reinterpret data
-                    (tag_namespace, tag_type) = tag_data.split(":", 1)
+                    # String assignment?
+                    if (value[0] == "'"):
 
+                        # Unescape value (?)
+                        value = unescape_special_characters(value).strip("'")
 
-                # Create a new node using the given tag type
-                node = XMLNode(tag_type, tag_namespace)
+                        # Save attribute
+                        node.set_attribute(key, value)
 
+                    else:
 
-                # Strip any whitespace surrounding = in the attributes, if we actually have any attribute to read
-                if (len(pieces) > 1):
+                        # (?) Save as integer
+                        try:
+                            node.set_attribute(key, int(value))
 
-                    # Remove whitespace surrounding the assignment operator ( e.g. attribute = '1' -> attribute='1' ).  This simplifies parsing.
-                    pieces[1] = escape_special_characters( re.sub("[ ]+=[ ]+", "=", pieces[1]).strip() )
+                        # Can't set this attribute.  Assumed integer, but
+                        # cannot convert.
+                        except:
+                            pass#node.set_attribute(
 
-                    # Check any attribute assignments...
-                    assignments = pieces[1].split(" ")
 
-                    # Loop all
-                    for each in assignments:
+        # Return tag data and node
+        return (tag_data, node)
 
-                        # Split by the assignment operator to get the key and the value
-                        kv = each.split("=")
 
-                        # If we didn't assign a value to this attribute, we'll treat it as a boolean attribute, set as True...
-                        if ( len(kv) == 1 ):
+    # Parse an xml string into a given parent node.  We normalize the markup once, then make a single pass
+    # over it, building the tree with a stack of open tags.  Nodes deeper than maxdepth (if given) keep
+    # their contents as innerText.
+    def parse_xml(self, xml, parent, depth = 1, maxdepth = -1):
 
-                            (key, value) = (kv[0], True)
+        # Strip comments, excess whitespace, etc.
+        xml = self.normalize_xml(xml)
 
-                            node.set_attribute(key, value)
 
-                        else:
+        # Track each open (non-self-closing) tag as [node, tag data, innerXML start position, node depth].
+        # When we're beyond maxdepth, we still track open tags (to match close tags) but we don't create a node.
+        stack = []
 
-                            (key, value) = (kv[0].strip(), kv[1].strip())
+        # Begin by finding the first element
+        a = xml.find("<")
 
-                            # String assignment?
-                            if (value[0] == "'"):
+        while (a >= 0):
 
-                                # Unescape value (?)
-                                value = unescape_special_characters(value).strip("'")
+            # Find the end of the tag, skipping over any > within attribute strings
+            result = XML_TAG_PATTERN.match(xml, a)
 
-                                # Save attribute
-                                node.set_attribute(key, value)
+            # If we couldn't find the end of the tag, then we invalidate the entire document
+            if (not result):
 
-                            else:
+                # Abandon
+                return False
+
+            # Position of the closing >
+            b = result.end() - 1
+
+
+            # Close tag?
+            if ( xml[a + 1] == "/" ):
 
-                                # (?) Save as integer
-                                try:
-                                    node.set_attribute(key, int(value))
+                # A close tag must close the most recently opened tag
+                if ( ( len(stack) == 0 ) or ( xml[a + 2 : b] != stack[-1][1] ) ):
 
-                                # Can't set this attribute.  Assumed integer, but
-                                # cannot convert.
-                                except:
-                                    pass#node.set_attribute(
+                    logn( "xml error", "unexpected close tag:  %s (%s)" % (xml[a : b + 1], a) )
+                    logn( "xml error", "not found in:  %s" % xml[a : a + 250].replace("\n", "<br>") )
 
+                    # Abandon
+                    return False
 
-                z = 0
+                # Done with the open tag
+                (node, tag_data, start, node_depth) = stack.pop()
 
-                # For self-closing tags, don't bother looking for descendants...
+                # Did we create a node for it?
+                if (node):
+
+                    # Point the node at the data inside.  If we didn't find any child nodes (or we didn't
+                    # parse for them), the node will (lazily) take the innerXML as raw text data...
+                    node.set_inner_source(xml, start, a)
+
+            # Start tag
+            else:
+
+                # Check to see if this is a self-closing tag ( e.g. <node /> or <node attribute = '1' /> )
+                self_closing = (xml[b - 1] == "/")
+
+                # Get the contents of the tag.  For self-closing tags, let's ditch the closing /
                 if (self_closing):
-                    z = b
+                    s = xml[a + 1 : b - 1].strip()
 
                 else:
+                    s = xml[a + 1 : b].strip()
 
-                    # Find the closing tag for this tag...
-                    z = self.find_tag_close(xml, a, tag_data)
 
-                    # If we couldn't find the close tag, then we'll have to invalidate the entire document
-                    if (z < 0):
+                # Depth of this node, relative to the given parent
+                node_depth = depth
 
-                        # Posterity
-                        valid = False
+                # Assume we'll create a node
+                create = True
 
-                        logn( "xml error", tag_data + ":  could not find close tag (%s)" % a )
-                        logn( "xml error", "not found in:  %s" % xml[a : a + 250].replace("\n", "<br>") )
+                # Nested within another tag?
+                if ( len(stack) > 0 ):
 
-                        # Abandon
-                        return False
+                    # This tag is one level deeper than the open tag
+                    node_depth = 1 + stack[-1][3]
 
-                    # We did indeed find the close tag
-                    else:
+                    # If the open tag didn't get a node, or if it sits at maxdepth, its contents are only text
+                    create = ( stack[-1][0] != None ) and ( (maxdepth < 0) or (stack[-1][3] < maxdepth) )
 
-                        # Get the data inside...
-                        innerXML = xml[b + 1 : z]
 
-                        # (Track that innerXML in a member variable)
-                        # (Please note and excuse the inconsistent casing)
-                        node.innerXml = innerXML
+                # Create a new node?
+                if (create):
 
+                    (tag_data, node) = self.create_node_from_tag_contents(s)
 
-                        # Can we continue to parse?
-                        if ( (maxdepth < 0) or (depth < maxdepth) ):
+                    # Add to the open tag, or to the given parent if we don't have an open tag
+                    if ( len(stack) > 0 ):
 
-                            # Parse the innerXML for children.  Check validity of child node
-                            valid = self.parse_xml(innerXML, node, depth = depth + 1, maxdepth = maxdepth)
+                        # We just created the open tag's node, so it has no lookup tables to invalidate yet
+                        stack[-1][0].nodes.append(node)
+                        node.set_parent( stack[-1][0] )
 
-                            # If the child xml didn't validate, we'll have to abort
-                            if (not valid):
+                    else:
+                        parent.add_node(node)
 
-                                # Too bad!
-                                return False
+                # No; we only need the tag data for matching up the close tag
+                else:
 
-                            # It did validate
-                            else:
+                    (tag_data, node) = (
+                        s.split(" ", 1)[0].strip(),
+                        None
+                    )
 
-                                # If we didn't find any child nodes, take the innerXML as raw text data...
-                                if (len(node.nodes) == 0):
 
-                                    node.innerText = xml_decode( innerXML.strip() )
+                # A node at maxdepth keeps its contents as text.  Like the recursive parser, we find its close tag
+                # by name (counting nested tags of the same name) without validating the markup within.
+                if ( (node != None) and (not self_closing) and (maxdepth >= 0) and (node_depth >= maxdepth) ):
+
+                    # Find the close tag
+                    z = self.find_tag_close(xml, a, tag_data)
+
+                    # If we couldn't find the close tag, then we invalidate the entire document
+                    if (z < 0):
+
+                        logn( "xml error", tag_data + ":  could not find close tag (%s)" % a )
 
-                        # If not, we'll save the remaining contents are simple innerText
-                        else:
+                        # Abandon
+                        return False
 
-                            # Save as text
-                            node.innerText = xml_decode( innerXML.strip() )
+                    # Point the node at the data inside
+                    node.set_inner_source(xml, b + 1, z)
 
+                    # Continue beyond the close tag
+                    b = z
 
+                # Non-self-closing tags remain open until we find their close tag
+                elif (not self_closing):
 
-                #parent.nodes.append(node)
-                parent.add_node(node)
+                    stack.append( [node, tag_data, b + 1, node_depth] )
 
 
+            # Find the next tag
+            a = xml.find("<", b + 1)
 
 
+        # If any tag remains open, then we never found its close tag
+        if ( len(stack) > 0 ):
 
-                # Find the next node...
-                #z = self.find_tag_close(xml, a, tag_type)
+            logn( "xml error", stack[-1][1] + ":  could not find close tag" )
 
-                a = xml.find("<", z + 1)
+            # Invalid
+            return False
 
-                b = self.find_tag_end(xml, a)
+        # Success
+        return True
 
-        return valid
 
     # From the beginning of a tag, find the end of the tag.
     # (We want to skip over any > within attribute strings...)
@@ -1143,6 +1904,300 @@ class XMLParser:
                         start = b
 
 
+# Event-driven xml reader.  Rather than building a tree, the reader walks the markup in order and yields
+# ("start", node, depth) and ("end", node, depth) events.  Callers can stop iterating at any point; when
+# reading from a file, we only read as much of the file as we've needed so far.  This suits partial reads
+# (metadata, titles, etc.) where we only want a handful of values from a potentially large file.
+class XMLReader:
+
+    def __init__(self, chunk_size = 4096):
+
+        # How many bytes to read from a file at a time
+        self.chunk_size = chunk_size
+
+
+    # Iterate events for an xml string
+    def iterate_xml(self, xml):
+
+        # One chunk holds everything
+        return self.iterate_chunks( [xml] )
+
+
+    # Iterate events for an xml file, reading the file a chunk at a time.  The file closes as soon as
+    # we finish (or stop) iterating.
+    def iterate_file(self, filepath):
+
+        # Open file
+        f = open(filepath, "r")
+
+        try:
+
+            # Read chunks on demand
+            for event in self.iterate_chunks( iter( lambda: f.read(self.chunk_size), "" ) ):
+
+                yield event
+
+        finally:
+
+            # Done with the file, whether we read all of it or not
+            f.close()
+
+
+    # Iterate events over a sequence of markup chunks.  Start tags yield a node with tag type, namespace,
+    # and attributes set.  End tags yield that same node; if it had no child nodes, its innerText will
+    # have been set.  Self-closing tags yield both events at once.  Iteration ends early on invalid markup.
+    def iterate_chunks(self, chunks):
+
+        # Make sure we have an iterator
+        chunks = iter(chunks)
+
+        # Markup we've read, along with how far into it we've consumed.  We only trim consumed
+        # markup when we read another chunk, so consuming a tag doesn't copy the rest of the buffer.
+        xml = ""
+        pos = 0
+
+        # Track each open tag as [node, tag data, raw text pieces].  The text pieces become
+        # None once the tag has a child node (and thus only gets text for its leaf children).
+        stack = []
+
+        # Loop until we run out of markup
+        while (True):
+
+            # Find the next tag
+            a = xml.find("<", pos)
+
+            # Any text preceding the next tag (or all remaining text, if we didn't find one) belongs to the open tag
+            text = xml[pos : ] if (a < 0) else xml[pos : a]
+
+            if ( ( len(text) > 0 ) and ( len(stack) > 0 ) and ( stack[-1][2] != None ) ):
+
+                # Save raw text
+                stack[-1][2].append(text)
+
+
+            # Comments and tags must be read in their entirety, so we'll try to find the end of each...
+            result = None
+
+            # No tag in the markup we have?
+            if (a < 0):
+
+                # Consume text
+                pos = len(xml)
+
+            # Skip comments
+            elif ( xml.startswith("<!--", a) ):
+
+                # End of the comment
+                b = xml.find("-->", a + 4)
+
+                # Found the end?
+                if (b >= 0):
+
+                    # Skip it entirely
+                    pos = b + 3
+
+                    # Check again
+                    continue
+
+                # Wait for the end of the comment
+                pos = a
+
+            else:
+
+                # Find the end of the tag, skipping over any > within attribute strings
+                result = XML_TAG_PATTERN.match(xml, a)
+
+                # Wait for the rest of the tag if we haven't read it yet
+                if (not result):
+                    pos = a
+
+
+            # If we couldn't read a complete tag (or comment), we need to read more markup
+            if (not result):
+
+                # Next chunk
+                chunk = next(chunks, None)
+
+                # Out of markup?
+                if (chunk == None):
+
+                    # If anything remains, we have an incomplete tag or comment
+                    if ( pos < len(xml) ):
+
+                        logn( "xml error", "could not find end of tag:  %s" % xml[pos : pos + 250] )
+
+                    # Any open tag never found its close tag
+                    elif ( len(stack) > 0 ):
+
+                        logn( "xml error", stack[-1][1] + ":  could not find close tag" )
+
+                    # Done
+                    return
+
+                # Trim consumed markup, append, and check again
+                xml = xml[pos : ] + chunk
+                pos = 0
+
+                continue
+
+
+            # Position of the closing >
+            b = result.end() - 1
+
+            # Contents of the tag, with whitespace normalized the same way we normalize a full document
+            s = XML_NEWLINE_WHITESPACE_PATTERN.sub( "\n", xml[a + 1 : b] ).replace("\t", "")
+
+            # Consume the tag
+            pos = b + 1
+
+
+            # Close tag?
+            if ( s.startswith("/") ):
+
+                # A close tag must close the most recently opened tag
+                if ( ( len(stack) == 0 ) or ( s[1 : ] != stack[-1][1] ) ):
+
+                    logn( "xml error", "unexpected close tag:  <%s>" % s )
+
+                    # Abandon
+                    return
+
+                # Done with the open tag
+                (node, tag_data, pieces) = stack.pop()
+
+                # Leaf nodes take their inner markup as text
+                if (pieces != None):
+
+                    # Normalize and decode, as with a full parse
+                    node.set_inner_text( xml_decode( XMLParser().normalize_xml( "".join(pieces) ).strip() ) )
+
+                # Nodes with children have no text of their own
+                else:
+                    node.set_inner_text("")
+
+                # Close event
+                yield ( "end", node, 1 + len(stack) )
+
+            # Start tag
+            else:
+
+                # Check to see if this is a self-closing tag ( e.g. <node /> or <node attribute = '1' /> )
+                self_closing = s.endswith("/")
+
+                # For self-closing tags, let's ditch the closing /
+                if (self_closing):
+                    s = s[0 : -1]
+
+                # Create a node for this tag
+                (tag_data, node) = XMLParser().create_node_from_tag_contents( s.strip() )
+
+                # The open tag now has a child node
+                if ( len(stack) > 0 ):
+                    stack[-1][2] = None
+
+
+                # Start event
+                yield ( "start", node, 1 + len(stack) )
+
+                # Self-closing tags close immediately, with no text
+                if (self_closing):
+
+                    node.set_inner_text("")
+
+                    # Close event
+                    yield ( "end", node, 1 + len(stack) )
+
+                # Other tags remain open until we find their close tag
+                else:
+                    stack.append( [node, tag_data, []] )
+
+
+    # Find the inner text of the first node matching each of a given list of keys, stopping as soon as we've found
+    # them all.  get_key(node, depth, ancestors) returns the key a closing node matches (or None), given the list of
+    # the node's open ancestors (outermost first).  Returns a hash of key => inner text for each key we found.
+    # Optionally, returns None when the file has no node at all with a given tag type (required_tag).
+    def find_inner_text_in_file(self, filepath, keys, get_key, required_tag = None):
+
+        # Track results
+        results = {}
+
+        # Have we seen the required tag yet?  (Trivially true without one.)
+        found_required_tag = (required_tag == None)
+
+        # Track the open nodes, to provide each node's ancestors
+        stack = []
+
+        # Get an event iterator for the file
+        events = self.iterate_file(filepath)
+
+        # Loop events
+        for (event, node, depth) in events:
+
+            # Open tag
+            if (event == "start"):
+
+                stack.append(node)
+
+                # Remember when we reach the required tag
+                if (node.tag_type == required_tag):
+
+                    found_required_tag = True
+
+            # Close tag
+            else:
+
+                stack.pop()
+
+                # Does this node match a key we haven't found yet?
+                key = get_key(node, depth, stack)
+
+                if ( ( key in keys ) and ( not (key in results) ) ):
+
+                    # Save inner text
+                    results[key] = node.get_inner_text()
+
+                    # Once we have everything, we're done reading
+                    if ( len(results) == len(keys) ):
+
+                        # Stop reading (closes the file)
+                        events.close()
+
+                        # Return early (we can only match every key after finding the required tag)
+                        return results
+
+        # Never found the required tag?
+        if (not found_required_tag):
+
+            return None
+
+        # Return whatever we found
+        return results
+
+
+    # Find the inner text of the first node with each given id attribute.  Optionally, only
+    # match nodes within (at any depth) a node with a given tag type, returning None when
+    # the file has no such node.
+    def find_inner_text_by_id(self, filepath, ids, ancestor_tag = None):
+
+        return self.find_inner_text_in_file(
+            filepath,
+            ids,
+            lambda node, depth, ancestors: node.get_attribute("id") if ( (ancestor_tag == None) or any( ancestor.tag_type == ancestor_tag for ancestor in ancestors ) ) else None,
+            required_tag = ancestor_tag
+        )
+
+
+    # Find the inner text of the first node with each given tag type.  Optionally, only
+    # match nodes whose parent node has a given tag type.
+    def find_inner_text_by_tag(self, filepath, tags, parent_tag = None):
+
+        return self.find_inner_text_in_file(
+            filepath,
+            tags,
+            lambda node, depth, ancestors: node.tag_type if ( (parent_tag == None) or ( ( len(ancestors) > 0 ) and (ancestors[-1].tag_type == parent_tag) ) ) else None
+        )
+
+
 class XMLList:
     def __init__(self, xml):
         self.collection = {}